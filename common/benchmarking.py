@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for benchmark commands
+"""
+from contextlib import contextmanager
+from math import ceil
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def time_calls(func: Callable[[], object], repeat: int, warmup: int = 1) -> List[float]:
+    """
+    Time repeated calls of a function
+    :param func: function to call, takes no args
+    :param repeat: number of timed calls
+    :param warmup: number of untimed calls to make first
+    :return: duration of each timed call, in seconds
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+
+    return timings
+
+
+def percentile(timings: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile
+    :param timings: measured values
+    :param pct: percentile to get, 0-100
+    :return: value at that percentile
+    """
+    ordered = sorted(timings)
+    rank = max(ceil(pct / 100 * len(ordered)), 1)
+
+    return ordered[rank - 1]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Summarize timings, all values in milliseconds
+    :param timings: measured durations, in seconds
+    :return: summary stats
+    """
+    return {
+        'min': min(timings) * 1000,
+        'p50': percentile(timings, 50) * 1000,
+        'p95': percentile(timings, 95) * 1000,
+        'p99': percentile(timings, 99) * 1000,
+        'max': max(timings) * 1000,
+        'mean': sum(timings) / len(timings) * 1000,
+    }
+
+
+@contextmanager
+def rolled_back(using: str = DEFAULT_DB_ALIAS) -> Iterator[None]:
+    """
+    Run a block in a transaction that always gets rolled back, so seeded benchmark data never sticks around.
+    :param using: db alias
+    """
+    with transaction.atomic(using=using):
+        yield
+
+        transaction.set_rollback(True, using=using)
+
+
+class QueryTimer:
+    """
+    Database execute wrapper that counts queries and adds up the time spent in them. Use it with timed_queries.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: Dict[str, Any]) -> Any:
+        start = perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += perf_counter() - start
+
+
+@contextmanager
+def timed_queries(using: str = DEFAULT_DB_ALIAS) -> Iterator[QueryTimer]:
+    """
+    Count and time the queries run in a block, without needing DEBUG on
+    :param using: db alias
+    :return: timer, filled in as queries run
+    """
+    timer = QueryTimer()
+
+    with connections[using].execute_wrapper(timer):
+        yield timer
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Database backends, with connection pooling. See common.db.pool.
+"""
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL backend with connection pooling. See common.db.pool.
+"""
+from typing import Any, Dict
+
+from django.db.backends.postgresql import base, creation
+
+from common.db.pool import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    """
+    Creates and destroys test databases, closing pooled connections to them first
+    """
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    Database wrapper that checks connections out of a pool and back in, instead of opening and closing them
+    """
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        connection = super().get_new_connection(conn_params)
+
+        # only set when the connection gets opened, so this wrapper may not have opened this one
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+
+        return connection
+
+    def is_connection_healthy(self, connection: Any) -> bool:
+        # psycopg2 knows about connections that broke while in use, without a round trip
+        return not connection.closed and super().is_connection_healthy(connection)
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite backend with connection pooling
+"""
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite backend with connection pooling, mostly for trying out pooling without a database server. See common.db.pool.
+"""
+from django.db.backends.sqlite3 import base, creation
+
+from common.db.pool import PooledDatabaseCreationMixin, PooledDatabaseWrapperMixin
+
+
+class DatabaseCreation(PooledDatabaseCreationMixin, creation.DatabaseCreation):
+    """
+    Creates and destroys test databases, closing pooled connections to them first
+    """
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    Database wrapper that checks connections out of a pool and back in, instead of opening and closing them
+    """
+    creation_class = DatabaseCreation
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Connection pooling for database backends. Django opens a connection for each request and closes it at the end (with
+CONN_MAX_AGE at 0), so pooled backends hand out idle connections when asked to open one, and take them back when asked
+to close one. Each process keeps its own pool per database, bounded by its MAX_SIZE, and shared by its threads.
+
+Configure with a POOL dict in the database's settings, all keys optional:
+    MAX_SIZE: most connections the process can have open, in use or idle (default 10)
+    MAX_LIFETIME: seconds after which a connection gets closed instead of reused (default 1800)
+    TIMEOUT: seconds to wait for a connection to free up, once MAX_SIZE are in use, before giving up (default 10)
+    CHECK_IDLE_AFTER: seconds a connection can sit idle before it gets health checked on checkout (default 10)
+"""
+import os
+import threading
+from functools import partial
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.db.utils import OperationalError
+
+from common.metrics import registry
+
+POOL_DEFAULTS = {
+    'MAX_SIZE': 10,
+    'MAX_LIFETIME': 30 * 60,
+    'TIMEOUT': 10,
+    'CHECK_IDLE_AFTER': 10,
+}
+
+checkout_wait = registry.histogram('db_pool_checkout_seconds', 'Time to get a connection from the pool', ['alias'],
+                                   buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10))
+connections_opened = registry.counter('db_pool_connections_opened_total', 'Pooled connections opened', ['alias'])
+connections_closed = registry.counter('db_pool_connections_closed_total', 'Pooled connections closed',
+                                      ['alias', 'reason'])
+checkout_timeouts = registry.counter('db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection',
+                                     ['alias'])
+
+
+class PoolTimeout(OperationalError):
+    """
+    No pooled connection freed up in time
+    """
+
+
+class PooledConnection:
+    """
+    DB-API connection, and when it was opened and last returned
+    """
+    __slots__ = ('connection', 'opened_at', 'returned_at')
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.opened_at = monotonic()
+        self.returned_at = self.opened_at
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections, safe to share between threads
+    """
+
+    def __init__(self, alias: str, max_size: int, max_lifetime: float, timeout: float,
+                 check_idle_after: float) -> None:
+        self.alias = alias
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_idle_after = check_idle_after
+
+        self._condition = threading.Condition()
+        # connections copied over from the parent process, see _check_pid
+        self._inherited: List[Any] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Start out empty, for this process
+        """
+        self._pid = os.getpid()
+        # idle connections, most recently returned last
+        self._idle: List[PooledConnection] = []
+        self._in_use: Dict[int, PooledConnection] = {}
+        # connections open, in use or idle, plus ones being opened
+        self._size = 0
+
+    def _check_pid(self) -> None:
+        """
+        Start over if this is a forked child. Connections copied over from the parent share its sockets, so they're
+        left open for the parent, and kept referenced so garbage collection doesn't close them either. Call with the
+        condition held.
+        """
+        if os.getpid() != self._pid:
+            self._inherited.extend(pooled.connection for pooled in self._idle + list(self._in_use.values()))
+            self._reset()
+
+    def checkout(self, connect: Callable[[], Any], is_healthy: Callable[[Any], bool]) -> Any:
+        """
+        Get a connection: the most recently returned idle one that's still good, or a new one if the pool isn't full.
+        Otherwise wait for one to be returned.
+        :param connect: opens a new connection
+        :param is_healthy: checks that a connection that's been idle a while still works
+        :return: DB-API connection
+        """
+        start = monotonic()
+
+        while True:
+            pooled = self._acquire(start)
+
+            if pooled is None:
+                pooled = self._open(connect)
+                break
+
+            if self._is_reusable(pooled, is_healthy):
+                break
+
+        with self._condition:
+            self._in_use[id(pooled.connection)] = pooled
+
+        checkout_wait.observe(monotonic() - start, alias=self.alias)
+
+        return pooled.connection
+
+    def _acquire(self, start: float) -> Optional[PooledConnection]:
+        """
+        Take an idle connection, or room to open one, waiting until the timeout if there's neither
+        :param start: when checkout started
+        :return: idle connection, or None if there's room to open one (which is then taken up)
+        """
+        with self._condition:
+            self._check_pid()
+
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = self.timeout - (monotonic() - start)
+
+                if remaining <= 0:
+                    checkout_timeouts.inc(alias=self.alias)
+                    raise PoolTimeout(f'No connection to {self.alias} freed up within {self.timeout}s, all '
+                                      f'{self.max_size} are in use.')
+
+                self._condition.wait(remaining)
+
+    def _open(self, connect: Callable[[], Any]) -> PooledConnection:
+        """
+        Open a connection, in room already taken up for it
+        :param connect: opens a new connection
+        :return: new connection
+        """
+        try:
+            pooled = PooledConnection(connect())
+        except Exception:
+            self._release_room()
+            raise
+
+        connections_opened.inc(alias=self.alias)
+
+        return pooled
+
+    def _is_reusable(self, pooled: PooledConnection, is_healthy: Callable[[Any], bool]) -> bool:
+        """
+        Check an idle connection can be handed out, closing it if not
+        :param pooled: idle connection
+        :param is_healthy: checks that a connection that's been idle a while still works
+        :return: whether it's reusable
+        """
+        now = monotonic()
+
+        if now - pooled.opened_at >= self.max_lifetime:
+            self._close(pooled, 'lifetime')
+            return False
+
+        if now - pooled.returned_at >= self.check_idle_after and not is_healthy(pooled.connection):
+            self._close(pooled, 'unhealthy')
+            return False
+
+        return True
+
+    def checkin(self, connection: Any, reusable: bool = True) -> None:
+        """
+        Return a connection to the pool
+        :param connection: DB-API connection from checkout
+        :param reusable: whether it's in a state to be handed out again, it gets closed if not
+        """
+        with self._condition:
+            self._check_pid()
+            pooled = self._in_use.pop(id(connection), None)
+
+            if pooled is None:
+                # checked out before a fork, so it's the parent's, see _check_pid
+                self._inherited.append(connection)
+                return
+
+        if not reusable:
+            self._close(pooled, 'discarded')
+        elif monotonic() - pooled.opened_at >= self.max_lifetime:
+            self._close(pooled, 'lifetime')
+        else:
+            with self._condition:
+                pooled.returned_at = monotonic()
+                self._idle.append(pooled)
+                self._condition.notify()
+
+    def drain(self) -> None:
+        """
+        Close every idle connection, e.g. before dropping the database they're connected to
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+
+        for pooled in idle:
+            self._close(pooled, 'drained')
+
+    def _close(self, pooled: PooledConnection, reason: str) -> None:
+        """
+        Close a connection and free up its room in the pool
+        :param pooled: connection to close
+        :param reason: why, for metrics
+        """
+        try:
+            pooled.connection.close()
+        except Exception:
+            # it's getting thrown away either way
+            pass
+
+        connections_closed.inc(alias=self.alias, reason=reason)
+        self._release_room()
+
+    def _release_room(self) -> None:
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get what's in the pool right now
+        :return: size, idle and in_use counts
+        """
+        with self._condition:
+            return {'size': self._size, 'idle': len(self._idle), 'in_use': len(self._in_use)}
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, settings_dict: Dict[str, Any]) -> ConnectionPool:
+    """
+    Get the pool for a database, making it if needed. Each database a connection can point at gets its own pool
+    (e.g. tests point connections at a test database).
+    :param alias: database alias
+    :param settings_dict: database settings
+    :return: pool
+    """
+    key = (alias, settings_dict['ENGINE'], settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'],
+           settings_dict['USER'])
+
+    with _pools_lock:
+        if key not in _pools:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            _pools[key] = ConnectionPool(alias, max_size=options['MAX_SIZE'], max_lifetime=options['MAX_LIFETIME'],
+                                         timeout=options['TIMEOUT'], check_idle_after=options['CHECK_IDLE_AFTER'])
+
+        return _pools[key]
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin for a backend's DatabaseWrapper, checking connections out of a pool instead of opening them, and back in
+    instead of closing them
+    """
+
+    def get_pool(self) -> ConnectionPool:
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params: Dict[str, Any]) -> Any:
+        return self.get_pool().checkout(partial(super().get_new_connection, conn_params), self.is_connection_healthy)
+
+    def _close(self) -> None:
+        # a connection closed in the middle of a transaction is in no state to be reused
+        reusable = not self.in_atomic_block
+
+        if reusable:
+            try:
+                # end anything left open, e.g. with AUTOCOMMIT off
+                self.connection.rollback()
+            except self.Database.Error:
+                reusable = False
+
+        self.get_pool().checkin(self.connection, reusable)
+
+    def is_connection_healthy(self, connection: Any) -> bool:
+        """
+        Check a connection still works with a round trip
+        :param connection: DB-API connection
+        :return: whether it works
+        """
+        try:
+            cursor = connection.cursor()
+
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except self.Database.Error:
+            return False
+
+        return True
+
+
+class PooledDatabaseCreationMixin:
+    """
+    Mixin for a backend's DatabaseCreation, closing pooled connections to the test database before it gets dropped
+    """
+
+    def destroy_test_db(self, *args, **kwargs) -> None:
+        self.connection.close()
+        self.connection.get_pool().drain()
+
+        super().destroy_test_db(*args, **kwargs)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Read replica routing. Everything reads from and writes to the primary (default) database, except for read-only views,
+which bind their querysets to a replica with .using(get_read_db(request)). Binding in the view, rather than routing
+every read, keeps anything that reads to then write (forms, bulk operations, get_object before an update) on the
+primary, and keeps lazily evaluated querysets (templates, streamed rows) on the database the view picked.
+
+Replicas lag behind the primary, so a client that just wrote could read its way back to a page that doesn't have its
+change yet. PrimaryPinningMiddleware pins clients to the primary for settings.REPLICA_PIN_SECONDS after each write.
+
+Configure with settings.REPLICA_DATABASES, the aliases in DATABASES of replicas of default. Give each replica
+TEST: {'MIRROR': 'default'}, unless tests should see it as a separate database.
+"""
+import random
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse
+
+# signed cookie marking a client as pinned to the primary, it's only valid for settings.REPLICA_PIN_SECONDS
+PIN_COOKIE_NAME = 'primary_pin'
+PIN_COOKIE_SALT = 'common.db.routers.primary_pin'
+
+
+class ReplicaRouter:
+    """
+    Send writes to the primary, even for objects read from a replica. Reads stay on the database of the object they
+    start from (e.g. following a foreign key of a replica row), and otherwise go to the primary.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        instance = hints.get('instance')
+
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # replicas hold the same rows as the primary
+        return True
+
+
+def is_pinned_to_primary(request: HttpRequest) -> bool:
+    """
+    Check if a client wrote recently enough that it should read from the primary
+    :param request: wsgi or drf request
+    :return: whether it's pinned
+    """
+    pin = request.get_signed_cookie(PIN_COOKIE_NAME, default=None, salt=PIN_COOKIE_SALT,
+                                    max_age=settings.REPLICA_PIN_SECONDS)
+
+    return pin is not None
+
+
+def get_read_db(request: HttpRequest) -> str:
+    """
+    Pick the database a read-only view should read from: one of the replicas, unless there are none or the client is
+    pinned to the primary. The pick is kept on the request, so everything the view reads (including conditional GET
+    checks) comes from the same database.
+    :param request: wsgi or drf request
+    :return: database alias
+    """
+    # drf requests wrap the wsgi request, keep the pick on the one both see
+    request = getattr(request, '_request', request)
+
+    if not hasattr(request, '_read_db'):
+        replicas = settings.REPLICA_DATABASES
+
+        if not replicas or is_pinned_to_primary(request):
+            request._read_db = DEFAULT_DB_ALIAS
+        else:
+            request._read_db = random.choice(replicas)
+
+    return request._read_db
+
+
+def pin_to_primary(response: HttpResponse) -> None:
+    """
+    Pin a client to the primary for settings.REPLICA_PIN_SECONDS, so it reads its own writes
+    :param response: response to the client's write
+    """
+    response.set_signed_cookie(PIN_COOKIE_NAME, '1', salt=PIN_COOKIE_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+                               secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax')
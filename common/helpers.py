@@ -5,16 +5,25 @@ Common helper functions
 from functools import wraps
 from typing import Callable, TypeVar
 
+from django.conf import settings
 from django.contrib import messages
+from django.utils.cache import patch_vary_headers
 from django.utils.translation import ugettext_lazy as _
 
 RT = TypeVar('RT')
 FT = Callable[..., RT]
 
+# Signed cookie marking a browser as already welcomed, until it ends its session. Kept out of the session itself so
+# welcoming doesn't need a session load or save.
+WELCOMED_COOKIE_NAME = 'welcomed'
+WELCOMED_COOKIE_SALT = 'common.helpers.welcomed'
+
 
 def my_awesome_decorator(func: FT) -> FT:
     """
-    Awesome wrapper
+    Awesome wrapper, welcoming visitors once per browser session. After the first visit, the page renders the same
+    every time (no message, no cookie set), so it can be cached. It's marked as varying on cookies, since the first
+    visit's page differs.
     :param func: function to wrap
     :return: wrapped function
     """
@@ -26,7 +35,20 @@ def my_awesome_decorator(func: FT) -> FT:
         :return: return of wrapped function
         """
         request = args[0]
-        messages.info(request, _('Welcome!'))
-        return func(*args, **kwargs)
+        welcome = request.get_signed_cookie(WELCOMED_COOKIE_NAME, default=None, salt=WELCOMED_COOKIE_SALT) is None
+
+        if welcome:
+            messages.info(request, _('Welcome!'))
+
+        response = func(*args, **kwargs)
+
+        if welcome:
+            # no max_age, so it lasts as long as the browser session
+            response.set_signed_cookie(WELCOMED_COOKIE_NAME, '1', salt=WELCOMED_COOKIE_SALT, httponly=True,
+                                       samesite='Lax', secure=settings.SESSION_COOKIE_SECURE)
+
+        patch_vary_headers(response, ['Cookie'])
+
+        return response
 
     return func_wrapper
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+In-process metrics, exposed in the Prometheus text format.
+
+Each process counts in memory. With settings.METRICS_DIR set, each process also flushes its counts to its own file in
+that directory (at most every METRICS_FLUSH_INTERVAL seconds), and a scrape adds up every file there, so pre-forked
+WSGI workers report as one. Files from workers that have exited stay, so their counts aren't lost; clear the directory
+when deploying, before the workers start.
+
+Only counters and histograms are kept, since those add up across processes. Ratios (e.g. cache hit ratio) are left to
+the query side, from their hit and miss counters.
+"""
+import json
+import os
+import threading
+import uuid
+from bisect import bisect_left
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+
+Labels = Tuple[Tuple[str, str], ...]
+Samples = Dict[Tuple[str, Labels], float]
+
+# seconds, from a fast page up to a request timing out
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+def _format_labels(labels: Labels) -> str:
+    """
+    Format labels for the text format
+    :param labels: label names and values
+    :return: {name="value",...}, or nothing if there are no labels
+    """
+    if not labels:
+        return ''
+
+    escaped = (
+        (name, value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')) for name, value in labels
+    )
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value, or bucket bound, for the text format
+    :param value: value
+    :return: value, without a trailing .0 for whole numbers
+    """
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    """
+    Base for metrics, which record samples into their registry
+    """
+    type = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str]) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def key(self, **labels: str) -> Tuple[str, Labels]:
+        """
+        Get the key of one of this metric's samples
+        :param labels: label values
+        :return: sample key
+        """
+        return self.name, self._labels(labels)
+
+    def _labels(self, labels: Dict[str, str]) -> Labels:
+        """
+        Check and order labels
+        :param labels: label values, by name
+        :return: label names and values, in labelnames order
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self, samples: Samples) -> List[str]:
+        """
+        Format this metric's samples
+        :param samples: every sample, from all processes
+        :return: lines of the text format
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+        for (name, labels), value in sorted(samples.items()):
+            if name == self.name:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        return lines
+
+
+class Counter(Metric):
+    """
+    Count that only goes up
+    """
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Add to the count
+        :param amount: how much to add
+        :param labels: label values
+        """
+        self.registry.add({self.key(**labels): amount})
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, counted into buckets
+    """
+    type = 'histogram'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Count a value into its bucket
+        :param value: value observed
+        :param labels: label values
+        """
+        labels = self._labels(labels)
+        # only the smallest bucket the value fits in gets counted here, buckets are made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        bound = _format_value(self.buckets[index]) if index < len(self.buckets) else '+Inf'
+
+        self.registry.add({
+            (f'{self.name}_bucket', labels + (('le', bound),)): 1,
+            (f'{self.name}_sum', labels): value,
+            (f'{self.name}_count', labels): 1,
+        })
+
+    def render(self, samples: Samples) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        bounds = [_format_value(bucket) for bucket in self.buckets] + ['+Inf']
+
+        label_sets = sorted(labels for name, labels in samples if name == f'{self.name}_count')
+
+        for labels in label_sets:
+            cumulative = 0.0
+
+            for bound in bounds:
+                cumulative += samples.get((f'{self.name}_bucket', labels + (('le', bound),)), 0)
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} '
+                             f'{_format_value(cumulative)}')
+
+            lines.append(f'{self.name}_sum{_format_labels(labels)} '
+                         f'{_format_value(samples[(f"{self.name}_sum", labels)])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} '
+                         f'{_format_value(samples[(f"{self.name}_count", labels)])}')
+
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and this process's samples of them
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Samples]] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Start counting from zero, under a new file name
+        """
+        self._samples: Samples = {}
+        self._pid = os.getpid()
+        self._file_name = f'metrics-{self._pid}-{uuid.uuid4().hex}.json'
+        self._last_flush = monotonic()
+
+    def _reset_if_forked(self) -> None:
+        """
+        Start over if this process was forked since counting started, since what got copied over is the parent's to
+        report, under the parent's file name. Call with the lock held, before reading or writing samples.
+        """
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def _register(self, metric: Metric) -> Metric:
+        """
+        Register a metric, or get the one already registered with its name
+        :param metric: metric to register
+        :return: registered metric
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        Register a counter
+        :param name: metric name
+        :param documentation: help text
+        :param labelnames: names of the labels it's counted by
+        :return: counter
+        """
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Register a histogram
+        :param name: metric name
+        :param documentation: help text
+        :param labelnames: names of the labels it's counted by
+        :param buckets: upper bounds of the buckets
+        :return: histogram
+        """
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], Samples]) -> None:
+        """
+        Add a function reporting samples that this process keeps count of itself, e.g. counts too hot to go through
+        add. It's called whenever samples get flushed or collected, and what it returns replaces the samples it names.
+        :param collect: function returning samples
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def _snapshot(self) -> Samples:
+        """
+        Get this process's samples, including those from collectors. Call with the lock held.
+        :return: samples
+        """
+        self._reset_if_forked()
+        samples = dict(self._samples)
+
+        for collect in self._collectors:
+            samples.update(collect())
+
+        return samples
+
+    def add(self, amounts: Samples) -> None:
+        """
+        Add to samples
+        :param amounts: amount to add to each sample
+        """
+        with self._lock:
+            self._reset_if_forked()
+
+            for key, amount in amounts.items():
+                self._samples[key] = self._samples.get(key, 0) + amount
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Write this process's samples to its file in settings.METRICS_DIR, if it's set and the flush interval passed
+        :param force: flush even if the interval hasn't passed
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+
+        if not directory:
+            return
+
+        with self._lock:
+            self._reset_if_forked()
+
+            if not force and monotonic() - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1):
+                return
+
+            self._last_flush = monotonic()
+            path = os.path.join(directory, self._file_name)
+
+            # write then rename, so readers never see a partly written file
+            with open(f'{path}.tmp', 'w') as metrics_file:
+                json.dump([[name, labels, value] for (name, labels), value in self._snapshot().items()], metrics_file)
+
+            os.replace(f'{path}.tmp', path)
+
+    def collect(self) -> Samples:
+        """
+        Add up samples from every process
+        :return: samples
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+
+        if not directory:
+            with self._lock:
+                return self._snapshot()
+
+        # flush checks for a fork first, so a new process never writes over its parent's file
+        self.flush(force=True)
+        samples: Samples = {}
+
+        for file_name in os.listdir(directory):
+            if not file_name.endswith('.json'):
+                continue
+
+            try:
+                with open(os.path.join(directory, file_name)) as metrics_file:
+                    data = json.load(metrics_file)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in data:
+                key = (name, tuple(tuple(label) for label in labels))
+                samples[key] = samples.get(key, 0) + value
+
+        return samples
+
+    def render(self) -> str:
+        """
+        Format every metric in the Prometheus text format
+        :return: exposition text
+        """
+        samples = self.collect()
+
+        with self._lock:
+            metrics: Iterable[Metric] = list(self._metrics.values())
+
+        return '\n'.join(line for metric in metrics for line in metric.render(samples)) + '\n'
+
+
+registry = MetricsRegistry()
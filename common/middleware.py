@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Middleware
+"""
+import json
+import logging
+import random
+from contextlib import ExitStack
+from time import perf_counter
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from common.benchmarking import QueryTimer
+from common.db.routers import pin_to_primary
+from common.metrics import registry
+from common.profiling import PROFILERS, save_profile
+from common.timing import RequestTimings, recording
+
+logger = logging.getLogger(__name__)
+
+# route label for requests that didn't resolve to a view, so unknown paths can't each get a label value of their own
+UNRESOLVED_ROUTE = '<unresolved>'
+
+# method labels, any other method is labelled OTHER
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# methods that don't write anything, RFC 7231 section 4.2.1
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+requests_total = registry.counter('http_requests_total', 'Requests served', ['route', 'method', 'status'])
+request_duration = registry.histogram('http_request_duration_seconds', 'Time to build responses',
+                                      ['route', 'method', 'status'])
+db_queries_total = registry.counter('http_request_db_queries_total', 'Database queries run for requests', ['route'])
+db_query_seconds_total = registry.counter('http_request_db_query_seconds_total',
+                                          'Time spent in database queries for requests', ['route'])
+
+
+class ServerTimingMiddleware:
+    """
+    Record where a sample of requests spend their time: sql (query count and time, on every database), template
+    rendering and DRF serialization (see common.timing), and the total. Sampled requests get a Server-Timing header and
+    a JSON log line on the common.middleware logger.
+
+    settings.SERVER_TIMING_SAMPLE_RATE is the fraction of requests to record, from 0 (none) to 1 (all). The project
+    settings record 1% of requests, and leaving the setting out records none. Put this first in MIDDLEWARE so the
+    total covers the other middleware too.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self.is_sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        query_timer = QueryTimer()
+        start = perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+
+            stack.enter_context(recording(timings))
+
+            response = self.get_response(request)
+
+        timings.add('sql', query_timer.seconds, query_timer.count)
+        timings.add('total', perf_counter() - start)
+
+        response['Server-Timing'] = timings.header()
+
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'streaming': response.streaming,
+            **timings.as_dict(),
+        }))
+
+        return response
+
+    @staticmethod
+    def is_sampled() -> bool:
+        """
+        Decide if a request gets recorded
+        :return: whether to record it
+        """
+        rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0)
+
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class MetricsMiddleware:
+    """
+    Count requests, their latency and their database queries in the metrics registry, by route (the resolved url name,
+    e.g. todo:items:todoitemmodel-list), method and status. See common.metrics.
+
+    Streamed responses are counted once their headers are ready, so their latency doesn't include the streamed body.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        query_timer = QueryTimer()
+        start = perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+
+            response = self.get_response(request)
+
+        duration = perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match else UNRESOLVED_ROUTE
+        method = request.method if request.method in METHODS else 'OTHER'
+        status = str(response.status_code)
+
+        registry.add({
+            requests_total.key(route=route, method=method, status=status): 1,
+            db_queries_total.key(route=route): query_timer.count,
+            db_query_seconds_total.key(route=route): query_timer.seconds,
+        })
+        request_duration.observe(duration, route=route, method=method, status=status)
+        registry.flush()
+
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests, including the view and everything after this in MIDDLEWARE. See common.profiling.
+
+    Staff can profile their own requests by sending an X-Profile header, naming the profiler to use (cprofile or
+    sample), and get the saved profile's name back in an X-Profile-File header. On top of that,
+    settings.PROFILE_SAMPLE_RATE is the fraction of all requests to profile with settings.PROFILE_SAMPLE_PROFILER.
+
+    Has to come after AuthenticationMiddleware, to tell who's staff.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        requested = self.get_requested_profiler(request)
+        profiler_name = requested or self.get_sampled_profiler()
+
+        if profiler_name is None:
+            return self.get_response(request)
+
+        profiler = PROFILERS[profiler_name]()
+        profiler.start()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        match = request.resolver_match
+        name = save_profile(profiler, match.view_name if match else UNRESOLVED_ROUTE)
+
+        if requested:
+            response['X-Profile-File'] = name
+
+        return response
+
+    @staticmethod
+    def get_requested_profiler(request: HttpRequest) -> Optional[str]:
+        """
+        Get the profiler a staff user asked for
+        :param request: wsgi request
+        :return: profiler name, or None if the request didn't ask for one or isn't from staff
+        """
+        requested = request.META.get('HTTP_X_PROFILE')
+
+        if not requested or not request.user.is_staff:
+            return None
+
+        return requested if requested in PROFILERS else 'cprofile'
+
+    @staticmethod
+    def get_sampled_profiler() -> Optional[str]:
+        """
+        Decide if a request gets profiled as part of the sample
+        :return: profiler name, or None if it doesn't
+        """
+        rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+
+        if rate >= 1 or (rate > 0 and random.random() < rate):
+            return settings.PROFILE_SAMPLE_PROFILER
+
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pin clients to the primary database for a while after they write (any successful request with an unsafe method),
+    so the replicas read-only views read from can't hide their own changes from them. See common.db.routers.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+
+        if settings.REPLICA_DATABASES and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(response)
+
+        return response
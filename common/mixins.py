@@ -5,10 +5,12 @@ Common mixins
 from typing import Optional
 
 from django.core.exceptions import PermissionDenied
+from django.db.models import QuerySet
 from django.http import HttpRequest
 from django.utils.translation import ugettext_lazy as _
 
 from common.auth import UserAuthorization
+from common.db.routers import get_read_db
 
 
 class StaffViewAuthorizationMixin:
@@ -40,3 +42,22 @@ class StaffViewAuthorizationMixin:
                                      'system administrators if this is a mistake.'))
 
         return super().dispatch(request, *args, **kwargs)
+
+
+class ReadReplicaMixin:
+    """
+    Reads the view's queryset from a replica on GET and HEAD, see common.db.routers. Other methods, which may write,
+    read from the primary.
+    """
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Bind the queryset to the database this request reads from
+        :return: queryset
+        """
+        queryset = super().get_queryset()
+
+        if self.request.method in ('GET', 'HEAD'):
+            queryset = queryset.using(get_read_db(self.request))
+
+        return queryset
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination helpers
+"""
+from typing import Any, Optional, Sequence
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.utils.translation import ugettext_lazy as _
+
+
+class HasNextPaginator(Paginator):
+    """
+    Paginator that never counts the object list. Each page fetches one extra row to find out if there's a page after
+    it, so a page costs a single LIMIT query rather than that plus a COUNT(*) over everything.
+
+    Since the total is never known, count and num_pages are None, and there's no way to jump to the last page.
+    """
+
+    @property
+    def count(self) -> Optional[int]:
+        """
+        Total number of objects, which this paginator doesn't know
+        :return: None
+        """
+        return None
+
+    @property
+    def num_pages(self) -> Optional[int]:
+        """
+        Total number of pages, which this paginator doesn't know
+        :return: None
+        """
+        return None
+
+    def validate_number(self, number: Any) -> int:
+        """
+        Validate the given 1-based page number. There's no upper bound to check against, so pages past the end only get
+        caught once they come back empty, in page.
+        :param number: page number
+        :return: page number, as an int
+        """
+        if isinstance(number, float) and not number.is_integer():
+            return super().validate_number(number)
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            # let the parent raise its usual PageNotAnInteger
+            return super().validate_number(number)
+
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+
+        return number
+
+    def page(self, number: Any) -> 'HasNextPage':
+        """
+        Fetch a page, plus one row to tell if there's a next one
+        :param number: 1-based page number
+        :return: page
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+
+        if not object_list and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_('That page contains no results'))
+
+        return HasNextPage(object_list[:self.per_page], number, self, has_next)
+
+
+class HasNextPage(Page):
+    """
+    Page of a HasNextPaginator, which knows if there's a next page without knowing how many there are.
+    """
+
+    def __init__(self, object_list: Sequence, number: int, paginator: HasNextPaginator, has_next: bool) -> None:
+        super().__init__(object_list, number, paginator)
+
+        self._has_next = has_next
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def next_page_number(self) -> int:
+        if not self._has_next:
+            raise EmptyPage(_('That page contains no results'))
+
+        return self.number + 1
+
+    def start_index(self) -> int:
+        if not self.object_list:
+            return 0
+
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self) -> int:
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
@@ -0,0 +1,49 @@
+/*
+ * Load lists that were held back from the first render. Each link with a data-deferred-list selector fetches its href
+ * once it scrolls into view (or gets clicked), and swaps the element matching the selector for the one in the fetched
+ * page. If anything goes wrong, the link is left alone, so following it still works.
+ */
+document.querySelectorAll('a[data-deferred-list]').forEach(link => {
+  const selector = link.dataset.deferredList;
+  let loading = false;
+
+  const load = function () {
+    if (loading) {
+      return;
+    }
+    loading = true;
+
+    fetch(link.href, {credentials: 'same-origin'})
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+
+        return response.text();
+      })
+      .then(html => {
+        const loaded = new DOMParser().parseFromString(html, 'text/html').querySelector(selector);
+
+        document.querySelector(selector).replaceWith(document.importNode(loaded, true));
+      })
+      .catch(() => {
+        loading = false;
+      });
+  };
+
+  link.addEventListener('click', event => {
+    event.preventDefault();
+    load();
+  });
+
+  if ('IntersectionObserver' in window) {
+    const observer = new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting)) {
+        observer.disconnect();
+        load();
+      }
+    });
+
+    observer.observe(link);
+  }
+});
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming template responses, for pages that list more rows than should be rendered in memory at once
+"""
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.template import Context
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+# stands in for the rows while the rest of the page gets rendered, so the page can be split around them
+STREAMED_ROWS_MARKER = '<!-- streamed rows -->'
+
+# rows rendered per chunk of the response, and fetched per round trip from the database cursor
+STREAM_CHUNK_SIZE = 1000
+
+
+def render_streaming(request: HttpRequest, template_name: Union[str, List[str]], context: Dict[str, Any],
+                     rows: Iterable, row_template_name: str, row_name: str,
+                     chunk_size: int = STREAM_CHUNK_SIZE) -> HttpResponse:
+    """
+    Render a page that lists rows, streaming the rows instead of building the whole page in memory.
+
+    The page template gets streamed_rows in its context, and has to output it where the rows go instead of looping
+    over object_list itself. Everything before that gets sent right away, then rows are rendered with
+    row_template_name chunk_size at a time, then the rest of the page. Pass a QuerySet.iterator(chunk_size=...) as
+    rows to keep memory use flat, since rows are only ever held one chunk at a time.
+
+    If there turn out to be no rows, the page is rendered normally with an empty object_list, so it can show whatever
+    it usually shows for that.
+    :param request: wsgi request
+    :param template_name: page template, or a list of them to pick from
+    :param context: page template context
+    :param rows: rows to list
+    :param row_template_name: template to render each row with
+    :param row_name: name each row gets in the row template's context
+    :param chunk_size: number of rows to render per chunk of the response
+    :return: streaming response, or a regular one if there are no rows
+    """
+    rows = iter(rows)
+    first_row = next(rows, None)
+
+    if first_row is None:
+        return render(request, template_name, {**context, 'object_list': []})
+
+    page = render_to_string(template_name, {**context, 'streamed_rows': mark_safe(STREAMED_ROWS_MARKER)}, request)
+    head, tail = page.split(STREAMED_ROWS_MARKER, 1)
+
+    response = StreamingHttpResponse(_stream(head, chain([first_row], rows), tail, request, row_template_name,
+                                             row_name, chunk_size))
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+def _stream(head: str, rows: Iterator, tail: str, request: HttpRequest, row_template_name: str, row_name: str,
+            chunk_size: int) -> Iterator[str]:
+    """
+    Yield the page in chunks
+    :param head: page up to the rows
+    :param rows: rows to render
+    :param tail: page after the rows
+    :param request: wsgi request, made available to the row template
+    :param row_template_name: template to render each row with
+    :param row_name: name each row gets in the row template's context
+    :param chunk_size: number of rows to render per chunk
+    :return: page chunks
+    """
+    yield head
+
+    # One context gets reused for every row, which skips running context processors per row
+    template = get_template(row_template_name).template
+    context = Context({'request': request})
+    chunk: List[str] = []
+
+    for row in rows:
+        with context.push(**{row_name: row}):
+            chunk.append(template.render(context))
+
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+
+    yield ''.join(chunk) + tail
+
+
+class StreamingListMixin:
+    """
+    Mixin for list views that streams the object list into the page, see render_streaming. Paginated pages are small
+    enough to render normally, so they are.
+    """
+    stream_row_template_name: Optional[str] = None
+    # name each object gets in the row template's context
+    stream_row_name: str = 'object'
+    stream_chunk_size: int = STREAM_CHUNK_SIZE
+
+    def render_to_response(self, context: Dict[str, Any], **response_kwargs) -> HttpResponse:
+        """
+        Stream the object list, unless the page is paginated
+        :param context: template context
+        :param response_kwargs: kwargs for the response
+        :return: streaming response
+        """
+        if context.get('is_paginated') or not hasattr(self.object_list, 'iterator'):
+            return super().render_to_response(context, **response_kwargs)
+
+        rows = self.object_list.iterator(chunk_size=self.stream_chunk_size)
+
+        return render_streaming(self.request, self.get_template_names(), context, rows, self.stream_row_template_name,
+                                self.stream_row_name, chunk_size=self.stream_chunk_size)
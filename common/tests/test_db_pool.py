@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for database connection pooling
+"""
+import os
+import tempfile
+import threading
+from time import sleep
+from typing import Any
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from common.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self) -> None:
+        self.healthy = True
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def is_healthy(connection: FakeConnection) -> bool:
+    return connection.healthy
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def make_pool(self, **kwargs: Any) -> ConnectionPool:
+        options = {'max_size': 2, 'max_lifetime': 60, 'timeout': 0.05, 'check_idle_after': 60, **kwargs}
+
+        return ConnectionPool('default', **options)
+
+    def test_reuses_returned_connections(self) -> None:
+        pool = self.make_pool()
+
+        first = pool.checkout(FakeConnection, is_healthy)
+        second = pool.checkout(FakeConnection, is_healthy)
+        pool.checkin(first)
+        pool.checkin(second)
+
+        self.assertIs(pool.checkout(FakeConnection, is_healthy), second)
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 1, 'in_use': 1})
+
+    def test_times_out_when_full(self) -> None:
+        pool = self.make_pool(max_size=1)
+        pool.checkout(FakeConnection, is_healthy)
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection, is_healthy)
+
+    def test_waits_for_returned_connection(self) -> None:
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.checkout(FakeConnection, is_healthy)
+
+        def give_back() -> None:
+            sleep(0.05)
+            pool.checkin(connection)
+
+        threading.Thread(target=give_back).start()
+
+        self.assertIs(pool.checkout(FakeConnection, is_healthy), connection)
+
+    def test_replaces_unhealthy_connections(self) -> None:
+        pool = self.make_pool(check_idle_after=0)
+        connection = pool.checkout(FakeConnection, is_healthy)
+        pool.checkin(connection)
+        connection.healthy = False
+
+        replacement = pool.checkout(FakeConnection, is_healthy)
+
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_skips_health_check_for_recently_used_connections(self) -> None:
+        pool = self.make_pool()
+        connection = pool.checkout(FakeConnection, is_healthy)
+        pool.checkin(connection)
+        connection.healthy = False
+
+        self.assertIs(pool.checkout(FakeConnection, is_healthy), connection)
+
+    def test_closes_connections_past_lifetime(self) -> None:
+        pool = self.make_pool(max_lifetime=0)
+        connection = pool.checkout(FakeConnection, is_healthy)
+        pool.checkin(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats(), {'size': 0, 'idle': 0, 'in_use': 0})
+
+    def test_discards_unreusable_connections(self) -> None:
+        pool = self.make_pool()
+        connection = pool.checkout(FakeConnection, is_healthy)
+        pool.checkin(connection, reusable=False)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_failed_connect_frees_room(self) -> None:
+        pool = self.make_pool(max_size=1)
+
+        def broken_connect() -> FakeConnection:
+            raise ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            pool.checkout(broken_connect, is_healthy)
+
+        self.assertIsInstance(pool.checkout(FakeConnection, is_healthy), FakeConnection)
+
+
+class PooledBackendTest(SimpleTestCase):
+
+    def test_close_returns_connection_to_pool(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            connections = ConnectionHandler({
+                'default': {'ENGINE': 'common.db.backends.sqlite3', 'NAME': os.path.join(directory, 'db.sqlite3')},
+            })
+            connection = connections['default']
+
+            connection.ensure_connection()
+            raw_connection = connection.connection
+            connection.close()
+
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+            self.assertIs(connection.connection, raw_connection)
+
+            connection.close()
+            connection.get_pool().drain()
+
+            self.assertEqual(connection.get_pool().stats(), {'size': 0, 'idle': 0, 'in_use': 0})
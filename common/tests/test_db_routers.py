@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for read replica routing
+"""
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from common.db.routers import PIN_COOKIE_NAME, ReplicaRouter, get_read_db, pin_to_primary
+from common.middleware import PrimaryPinningMiddleware
+from todo.models import TodoListModel
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReadDbTest(SimpleTestCase):
+
+    def test_reads_from_replica(self) -> None:
+        request = RequestFactory().get('/')
+
+        self.assertEqual(get_read_db(request), 'replica')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_reads_from_primary_without_replicas(self) -> None:
+        request = RequestFactory().get('/')
+
+        self.assertEqual(get_read_db(request), 'default')
+
+    def test_pinned_clients_read_from_primary(self) -> None:
+        response = HttpResponse()
+        pin_to_primary(response)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = response.cookies[PIN_COOKIE_NAME].value
+
+        self.assertEqual(get_read_db(request), 'default')
+
+    def test_forged_pins_are_ignored(self) -> None:
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = '1'
+
+        self.assertEqual(get_read_db(request), 'replica')
+
+    @override_settings(REPLICA_DATABASES=['replica', 'other_replica'])
+    def test_keeps_pick_for_request(self) -> None:
+        request = RequestFactory().get('/')
+        read_db = get_read_db(request)
+
+        self.assertTrue(all(get_read_db(request) == read_db for _ in range(20)))
+
+
+class ReplicaRouterTest(SimpleTestCase):
+
+    def test_writes_go_to_primary(self) -> None:
+        todo_list = TodoListModel(name='Groceries')
+        todo_list._state.db = 'replica'
+
+        self.assertEqual(ReplicaRouter().db_for_write(TodoListModel, instance=todo_list), 'default')
+
+    def test_reads_follow_instance(self) -> None:
+        todo_list = TodoListModel(name='Groceries')
+        todo_list._state.db = 'replica'
+
+        self.assertEqual(ReplicaRouter().db_for_read(TodoListModel, instance=todo_list), 'replica')
+        self.assertEqual(ReplicaRouter().db_for_read(TodoListModel), 'default')
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_PIN_SECONDS=5)
+class PrimaryPinningMiddlewareTest(SimpleTestCase):
+
+    def get_response(self, method: str, status: int = 200) -> HttpResponse:
+        middleware = PrimaryPinningMiddleware(lambda request: HttpResponse(status=status))
+
+        return middleware(RequestFactory().generic(method, '/'))
+
+    def test_pins_after_writes(self) -> None:
+        for method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+            with self.subTest(method=method):
+                cookie = self.get_response(method).cookies[PIN_COOKIE_NAME]
+
+                self.assertEqual(cookie['max-age'], 5)
+                self.assertTrue(cookie['httponly'])
+
+    def test_does_not_pin_reads_or_failed_writes(self) -> None:
+        self.assertNotIn(PIN_COOKIE_NAME, self.get_response('GET').cookies)
+        self.assertNotIn(PIN_COOKIE_NAME, self.get_response('POST', status=400).cookies)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_does_not_pin_without_replicas(self) -> None:
+        self.assertNotIn(PIN_COOKIE_NAME, self.get_response('POST').cookies)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the metrics registry and endpoint
+"""
+import json
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from common.metrics import MetricsRegistry
+
+
+class MetricsRegistryTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter('requests_total', 'Requests', ['route'])
+        self.latency = self.registry.histogram('latency_seconds', 'Latency', ['route'], buckets=[0.1, 1])
+
+    def test_render(self) -> None:
+        self.requests.inc(route='home')
+        self.requests.inc(2, route='home')
+        self.latency.observe(0.05, route='home')
+        self.latency.observe(0.5, route='home')
+        self.latency.observe(5, route='home')
+
+        self.assertEqual(self.registry.render().splitlines(), [
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{route="home"} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{route="home",le="0.1"} 1',
+            'latency_seconds_bucket{route="home",le="1"} 2',
+            'latency_seconds_bucket{route="home",le="+Inf"} 3',
+            'latency_seconds_sum{route="home"} 5.55',
+            'latency_seconds_count{route="home"} 3',
+        ])
+
+    def test_labels_are_checked(self) -> None:
+        with self.assertRaises(ValueError):
+            self.requests.inc(path='/')
+
+    def test_label_values_are_escaped(self) -> None:
+        self.requests.inc(route='say "hi"\\')
+
+        self.assertIn(r'requests_total{route="say \"hi\"\\"} 1', self.registry.render())
+
+    def test_collectors(self) -> None:
+        self.registry.add_collector(lambda: {self.requests.key(route='cached'): 7})
+
+        self.assertIn('requests_total{route="cached"} 7', self.registry.render())
+
+    def test_adds_up_processes(self) -> None:
+        other_process = MetricsRegistry()
+        other_requests = other_process.counter('requests_total', 'Requests', ['route'])
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.requests.inc(route='home')
+            other_requests.inc(2, route='home')
+            other_requests.inc(route='list')
+            other_process.flush(force=True)
+
+            rendered = self.registry.render()
+
+        self.assertIn('requests_total{route="home"} 3', rendered)
+        self.assertIn('requests_total{route="list"} 1', rendered)
+
+    @skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_forked_process_leaves_parent_file_alone(self) -> None:
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.requests.inc(route='home')
+            self.registry.flush(force=True)
+            parent_file_name, = os.listdir(directory)
+
+            with open(os.path.join(directory, parent_file_name)) as metrics_file:
+                parent_samples = json.load(metrics_file)
+
+            pid = os.fork()
+
+            if pid == 0:
+                # a new worker whose first request is the scrape, before it adds anything
+                self.registry.collect()
+                os._exit(0)
+
+            os.waitpid(pid, 0)
+
+            with open(os.path.join(directory, parent_file_name)) as metrics_file:
+                self.assertEqual(json.load(metrics_file), parent_samples)
+
+            self.assertEqual(len(os.listdir(directory)), 2)
+            self.assertFalse(any(file_name.startswith(f'metrics-{os.getpid()}-') for file_name in os.listdir(directory)
+                                 if file_name != parent_file_name))
+            self.assertIn('requests_total{route="home"} 1', self.registry.render())
+
+    def test_flush_waits_for_interval(self) -> None:
+        other_process = MetricsRegistry()
+        other_requests = other_process.counter('requests_total', 'Requests', ['route'])
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory,
+                                                                           METRICS_FLUSH_INTERVAL=60):
+            other_requests.inc(route='home')
+            other_process.flush()
+
+            self.assertNotIn('requests_total{route="home"}', self.registry.render())
+
+
+class MetricsViewTest(TestCase):
+
+    def test_counts_requests_by_route(self) -> None:
+        self.client.get(reverse('common:home'))
+        self.client.get('/no/such/page/')
+
+        response = self.client.get(reverse('common:metrics'))
+        content = response.content.decode()
+
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertRegex(content, r'http_requests_total\{route="common:home",method="GET",status="200"\} \d+')
+        self.assertRegex(content, r'http_requests_total\{route="<unresolved>",method="GET",status="404"\} \d+')
+        self.assertIn('http_request_duration_seconds_bucket{route="common:home",method="GET",status="200",le="+Inf"}',
+                      content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self) -> None:
+        self.assertEqual(self.client.get(reverse('common:metrics')).status_code, 403)
+
+        response = self.client.get(reverse('common:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
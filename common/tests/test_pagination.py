@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for common pagination
+"""
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.test import SimpleTestCase
+
+from common.pagination import HasNextPaginator
+
+
+class HasNextPaginatorTest(SimpleTestCase):
+
+    def setUp(self) -> None:
+        self.paginator = HasNextPaginator(list(range(25)), 10)
+
+    def test_pages(self) -> None:
+        first = self.paginator.page(1)
+        last = self.paginator.page(3)
+
+        self.assertEqual(list(first), list(range(10)))
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        self.assertEqual(first.next_page_number(), 2)
+        self.assertEqual((first.start_index(), first.end_index()), (1, 10))
+
+        self.assertEqual(list(last), list(range(20, 25)))
+        self.assertFalse(last.has_next())
+        self.assertEqual((last.start_index(), last.end_index()), (21, 25))
+
+    def test_exact_multiple_has_no_next_page(self) -> None:
+        page = HasNextPaginator(list(range(20)), 10).page(2)
+
+        self.assertFalse(page.has_next())
+
+    def test_does_not_count(self) -> None:
+        self.assertIsNone(self.paginator.count)
+        self.assertIsNone(self.paginator.num_pages)
+
+    def test_invalid_pages(self) -> None:
+        with self.assertRaises(EmptyPage):
+            self.paginator.page(4)
+
+        with self.assertRaises(EmptyPage):
+            self.paginator.page(0)
+
+        with self.assertRaises(PageNotAnInteger):
+            self.paginator.page('last')
+
+    def test_empty_first_page(self) -> None:
+        page = HasNextPaginator([], 10).page(1)
+
+        self.assertEqual(list(page), [])
+        self.assertFalse(page.has_other_pages())
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for request profiling
+"""
+import os
+import pstats
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class ProfilingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.staff = get_user_model().objects.create_user(email='staff@example.com', is_staff=True)
+        cls.user = get_user_model().objects.create_user(email='user@example.com')
+
+    def setUp(self) -> None:
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+
+        settings_override = override_settings(PROFILE_DIR=self.profile_dir, PROFILE_KEEP=2, PROFILE_SAMPLE_RATE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_staff_profile_requests(self) -> None:
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse('common:home'), HTTP_X_PROFILE='cprofile')
+        name = response['X-Profile-File']
+
+        self.assertIn('-common_home-', name)
+
+        stats = pstats.Stats(os.path.join(self.profile_dir, name))
+        self.assertTrue(any(function == 'get' for _, _, function in stats.stats))
+
+    def test_sampled_stacks(self) -> None:
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse('common:home'), HTTP_X_PROFILE='sample')
+
+        self.assertTrue(response['X-Profile-File'].endswith('.collapsed'))
+
+    def test_others_cannot_profile(self) -> None:
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('common:home'), HTTP_X_PROFILE='cprofile')
+
+        self.assertFalse(response.has_header('X-Profile-File'))
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_SAMPLE_PROFILER='cprofile')
+    def test_sample_rate(self) -> None:
+        response = self.client.get(reverse('common:home'))
+
+        self.assertFalse(response.has_header('X-Profile-File'))
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+    def test_keeps_newest_profiles(self) -> None:
+        self.client.force_login(self.staff)
+
+        names = [self.client.get(reverse('common:home'), HTTP_X_PROFILE='cprofile')['X-Profile-File']
+                 for _ in range(3)]
+
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), sorted(names[1:]))
+
+    def test_list_and_download(self) -> None:
+        self.client.force_login(self.staff)
+        name = self.client.get(reverse('common:home'), HTTP_X_PROFILE='cprofile')['X-Profile-File']
+
+        response = self.client.get(reverse('common:profiles'))
+        self.assertContains(response, reverse('common:download_profile', args=[name]))
+
+        response = self.client.get(reverse('common:download_profile', args=[name]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{name}"')
+
+        response = self.client.get(reverse('common:download_profile', args=['settings.py']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_are_staff_only(self) -> None:
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get(reverse('common:profiles')).status_code, 302)
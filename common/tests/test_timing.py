@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for request timing instrumentation
+"""
+import json
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from common.timing import RequestTimings, current_timings, recording, timed
+
+
+class RequestTimingsTest(SimpleTestCase):
+
+    def test_nested_blocks_count_once(self) -> None:
+        timings = RequestTimings()
+
+        with recording(timings):
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+
+            with timed('serialize'):
+                pass
+
+        self.assertEqual(timings.counts, {'serialize': 2})
+        self.assertIsNone(current_timings())
+
+    def test_timed_without_recording(self) -> None:
+        with timed('serialize'):
+            pass
+
+        self.assertIsNone(current_timings())
+
+    def test_header(self) -> None:
+        timings = RequestTimings()
+        timings.add('sql', 0.0015, count=3)
+        timings.add('total', 0.01)
+
+        self.assertEqual(timings.header(), 'sql;dur=1.50, total;dur=10.00')
+        self.assertEqual(timings.as_dict(), {'sql_ms': 1.5, 'sql_count': 3, 'total_ms': 10.0, 'total_count': 1})
+
+
+class ServerTimingMiddlewareTest(SimpleTestCase):
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request(self) -> None:
+        with self.assertLogs('common.middleware', 'INFO') as logs:
+            response = self.client.get(reverse('common:home'))
+
+        self.assertRegex(response['Server-Timing'], r'^template;dur=[\d.]+, sql;dur=[\d.]+, total;dur=[\d.]+$')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'common:home')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['sql_count'], 0)
+        self.assertEqual(record['template_count'], 1)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self) -> None:
+        response = self.client.get(reverse('common:home'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -2,9 +2,14 @@
 """
 Tests for common views
 """
+from unittest import skipUnless
+
+from django.conf import settings
 from django.test import TestCase
 from django.urls import reverse_lazy
 
+from common.helpers import WELCOMED_COOKIE_NAME
+
 
 class HomePageTest(TestCase):
 
@@ -12,3 +17,29 @@ class HomePageTest(TestCase):
         response = self.client.get(reverse_lazy('common:home'))
 
         self.assertTemplateUsed(response, 'common/home.html')
+
+
+@skipUnless(settings.VIEW_TYPES == 'CBV', 'only the class-based view welcomes visitors')
+class WelcomeTest(TestCase):
+    url = reverse_lazy('common:home')
+
+    def test_welcomes_once(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertContains(response, 'Welcome!')
+        self.assertIn(WELCOMED_COOKIE_NAME, response.cookies)
+        self.assertEqual(response['Vary'], 'Cookie')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertNotContains(response, 'Welcome!')
+        self.assertEqual(response.cookies, {})
+        self.assertEqual(response['Vary'], 'Cookie')
+
+    def test_forged_cookie_is_ignored(self) -> None:
+        self.client.cookies[WELCOMED_COOKIE_NAME] = '1'
+
+        response = self.client.get(self.url)
+
+        self.assertContains(response, 'Welcome!')
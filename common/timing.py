@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request timing instrumentation. ServerTimingMiddleware starts recording for a sample of requests, and the hooks
+here (the template backend, the serializer mixin and timed) add to whatever the current request is recording. When a
+request isn't being recorded, the hooks cost an attribute lookup.
+"""
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional, Set
+
+from django.template.backends.django import DjangoTemplates, Template
+from rest_framework.fields import empty
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """
+    Durations recorded for one request, by name. Durations can overlap (e.g. sql run while a template renders), so
+    they don't add up to the request's total.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._running: Set[str] = set()
+
+    def add(self, name: str, seconds: float, count: int = 1) -> None:
+        """
+        Record time spent
+        :param name: what the time was spent on
+        :param seconds: time spent
+        :param count: number of times it was done
+        """
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    @contextmanager
+    def measure(self, name: str, count: int = 1) -> Iterator[None]:
+        """
+        Record the time spent in a block. Blocks nested in one with the same name (e.g. a nested serializer) are
+        already counted by the outer one, so they aren't recorded again.
+        :param name: what the time is spent on
+        :param count: number of times it's done in the block
+        """
+        if name in self._running:
+            yield
+            return
+
+        self._running.add(name)
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self._running.discard(name)
+            self.add(name, perf_counter() - start, count)
+
+    def header(self) -> str:
+        """
+        Build a Server-Timing header value
+        :return: header value, durations in ms
+        """
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.seconds.items())
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Flatten for logging
+        :return: <name>_ms and <name>_count for each name
+        """
+        data: Dict[str, Any] = {}
+
+        for name, seconds in self.seconds.items():
+            data[f'{name}_ms'] = round(seconds * 1000, 2)
+            data[f'{name}_count'] = self.counts[name]
+
+        return data
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Get the timings the current request is recording
+    :return: timings, or None if the request isn't being recorded
+    """
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def recording(timings: RequestTimings) -> Iterator[RequestTimings]:
+    """
+    Record timings for the current thread in a block
+    :param timings: timings to add to
+    :return: timings
+    """
+    previous = current_timings()
+    _local.timings = timings
+
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def timed(name: str, count: int = 1) -> Iterator[None]:
+    """
+    Add the time spent in a block to the current request's timings, if it's being recorded
+    :param name: what the time is spent on
+    :param count: number of times it's done in the block
+    """
+    timings = current_timings()
+
+    if timings is None:
+        yield
+        return
+
+    with timings.measure(name, count):
+        yield
+
+
+class TimedTemplate(Template):
+    """
+    Template that records its render time as "template"
+    """
+
+    def render(self, context: Optional[Dict[str, Any]] = None, request: Any = None) -> str:
+        timings = current_timings()
+
+        if timings is None:
+            return super().render(context, request)
+
+        with timings.measure('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend whose templates record their render time. Templates included by others are part of the
+    including template's render. Rows streamed by common.streaming render after the response headers go out, so
+    they're not counted.
+    """
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class TimedSerializerMixin:
+    """
+    Mixin for DRF serializers that records the time spent serializing and validating as "serialize"
+    """
+
+    def to_representation(self, instance: Any) -> Any:
+        timings = current_timings()
+
+        if timings is None:
+            return super().to_representation(instance)
+
+        with timings.measure('serialize'):
+            return super().to_representation(instance)
+
+    def run_validation(self, data: Any = empty) -> Any:
+        timings = current_timings()
+
+        if timings is None:
+            return super().run_validation(data)
+
+        with timings.measure('serialize'):
+            return super().run_validation(data)
@@ -5,7 +5,7 @@ common urls
 from django.conf import settings
 from django.urls import path
 
-from common.views import HomeView, home_view
+from common.views import HomeView, ProfileListView, download_profile_view, home_view, metrics_view
 
 app_name = 'common'
 
@@ -17,3 +17,10 @@ else:
     urlpatterns = [
         path('', home_view, name='home'),
     ]
+
+urlpatterns += [
+    path('metrics', metrics_view, name='metrics'),
+    # alongside the admin, which is where staff already are
+    path('mage/profiles/', ProfileListView.as_view(), name='profiles'),
+    path('mage/profiles/<str:name>', download_profile_view, name='download_profile'),
+]
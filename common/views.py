@@ -3,22 +3,29 @@
 Common Views
 """
 from copy import deepcopy
-from typing import Any, Callable, Dict, TypeVar
+from typing import Any, Callable, Dict, Tuple, TypeVar
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import ForeignKey, QuerySet
 from django.forms import Form
 from django.http import Http404, HttpRequest
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden
 from django.shortcuts import redirect, render
-from django.utils.decorators import classonlymethod
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import classonlymethod, method_decorator
 from django.utils.translation import ugettext_lazy as _
 from django.views import View
+from django.views.decorators.http import require_GET
 from django.views.generic import CreateView, ListView, TemplateView
 from django.views.generic.base import TemplateResponseMixin
 from django.views.generic.edit import FormMixin
 from six import iteritems
 
 from common.helpers import my_awesome_decorator
+from common.metrics import registry
+from common.profiling import get_profile_path, list_profiles
+from common.timing import timed
 
 
 class HomeView(TemplateView):
@@ -48,11 +55,68 @@ def home_view(request: HttpRequest) -> HttpResponse:
     return render(request=request, template_name='common/home.html')
 
 
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Expose metrics for Prometheus to scrape. If settings.METRICS_TOKEN is set, scrapes need it as a bearer token.
+    :param request: wsgi request
+    :return: metrics, in the Prometheus text format
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class ProfileListView(TemplateView):
+    """
+    List saved request profiles, for staff to download. See common.profiling.
+    """
+    template_name = 'common/profiles.html'
+
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        """
+        Add saved profiles to the context
+        :param kwargs: context
+        :return: context
+        """
+        context = super().get_context_data(**kwargs)
+
+        context.update({
+            'title': _('Request profiles'),
+            'profiles': list_profiles(),
+            'profile_dir': settings.PROFILE_DIR,
+        })
+
+        return context
+
+
+@staff_member_required
+def download_profile_view(request: HttpRequest, name: str) -> FileResponse:
+    """
+    Download a saved request profile
+    :param request: wsgi request
+    :param name: profile file name
+    :return: profile file
+    """
+    path = get_profile_path(name)
+
+    if path is None:
+        raise Http404(_('No such profile'))
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
 class ProcessGetFormMixin(FormMixin):
     """
     Mixin to handle form GET submissions. Based on loosely on ProcessFormView.
     """
     http_method_names = ['get', 'head', 'options']
+    # query params that can show up in the query string without meaning the form was submitted, e.g. a page number
+    ignored_query_params: Tuple[str, ...] = ()
 
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
@@ -62,14 +126,33 @@ class ProcessGetFormMixin(FormMixin):
         """
         form = self.get_form()
 
-        if request.GET:
-            if form.is_valid():
+        if self.is_form_submitted():
+            with timed('form'):
+                is_valid = form.is_valid()
+
+            if is_valid:
                 return self.form_valid(form)
             else:
                 return self.form_invalid(form)
 
         return self.render_to_response(self.get_context_data(form=form))
 
+    def get_ignored_query_params(self) -> Tuple[str, ...]:
+        """
+        Get query params that don't count as form data
+        :return: query param names
+        """
+        return self.ignored_query_params
+
+    def is_form_submitted(self) -> bool:
+        """
+        Check if the query string has any form data in it
+        :return: whether the form was submitted
+        """
+        ignored = self.get_ignored_query_params()
+
+        return any(param not in ignored for param in self.request.GET)
+
     def get_form_kwargs(self) -> Dict[str, Any]:
         """
         Get kwargs to instantiate form
@@ -77,7 +160,7 @@ class ProcessGetFormMixin(FormMixin):
         """
         kwargs = super().get_form_kwargs()
 
-        if self.request.GET:
+        if self.is_form_submitted():
             kwargs['data'] = deepcopy(self.request.GET)
 
         return kwargs
@@ -95,9 +178,15 @@ TForm = TypeVar('TForm', bound=Form)
 class FormListView(ProcessGetFormMixin, ListView):
     """
     View to render/process a form and list out model data.
+
+    Set paginate_by to paginate the list. Page links keep the rest of the query string, so paging through search
+    results stays within the search. Use paginator_class = HasNextPaginator to skip the COUNT(*) on every page.
     """
     # boolean indicating if queryset should be retrieved first-time through, i.e. form hasn't been submitted
     retrieve_queryset_first_time: bool = True
+    # query param that asks for the first-time queryset anyway, when retrieve_queryset_first_time is False. Templates
+    # get a link with it (load_queryset_url) so the list can be loaded once the user scrolls to it or asks for it.
+    load_queryset_param: str = 'load'
 
     def setup(self, request: HttpRequest, *args, **kwargs) -> None:
         """
@@ -107,29 +196,38 @@ class FormListView(ProcessGetFormMixin, ListView):
         super().setup(request, *args, **kwargs)
 
         self.form: TForm
+        self.queryset_deferred = False
+
+    def get_ignored_query_params(self) -> Tuple[str, ...]:
+        """
+        Page numbers and load requests aren't form data
+        :return: query param names
+        """
+        return super().get_ignored_query_params() + (self.page_kwarg, self.load_queryset_param)
 
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
-        Set up initial object list, which can be filtered later if need be.
+        Set up initial object list, which can be filtered later if need be. If the initial object list isn't wanted
+        first-time through, an empty one is used instead, which doesn't hit the database.
         :param request: wsgi request
         :return: template with form, and possibly a queryset
         """
-        if self.retrieve_queryset_first_time:
+        if self.retrieve_queryset_first_time or self.load_queryset_param in request.GET or self.is_form_submitted():
             self.object_list = self.get_queryset()
 
             self.check_for_empty_queryset()
+        else:
+            self.object_list = self.get_queryset().none()
+            self.queryset_deferred = True
 
         return super().get(request, *args, **kwargs)
 
     def form_valid(self, form: TForm) -> HttpResponse:
         """
-        Retrieves/filters the object list upon successful form submission.
+        Filters the object list upon successful form submission.
         :param form: validated form
         :return: template with form and list of data
         """
-        if not self.retrieve_queryset_first_time:
-            self.object_list = self.get_queryset()
-
         self.form = form
         self.object_list = self.filter_queryset()
 
@@ -140,6 +238,21 @@ class FormListView(ProcessGetFormMixin, ListView):
 
         return self.render_to_response(context)
 
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        """
+        Add what templates need to build page links and load deferred lists
+        :param kwargs: kwargs for template context
+        :return: template context
+        """
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+
+        kwargs['page_query_string'] = query.urlencode()
+        kwargs['queryset_deferred'] = self.queryset_deferred
+        kwargs['load_queryset_url'] = f'?{self.load_queryset_param}=1'
+
+        return super().get_context_data(**kwargs)
+
     def filter_queryset(self) -> QuerySet:
         """
         Filters queryset based on form data. Really just a hook for children to modify and enable filtering.
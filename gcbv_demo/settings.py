@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -52,16 +53,21 @@ THIRD_PARTY_APPS = [
 PROJECT_APPS = [
     'common.apps.CommonConfig',
     'todo.apps.TodoConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    'common.middleware.ServerTimingMiddleware',
+    'common.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'common.middleware.PrimaryPinningMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,9 +86,65 @@ REST_FRAMEWORK = {
 
 ROOT_URLCONF = 'gcbv_demo.urls'
 
+# Keep messages in a cookie only. The default falls back to the session when they don't fit, which can mean a session
+# load and save (a db write) on pages that otherwise wouldn't touch the db. Messages here are all short.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Fraction of requests (0 to 1) to record sql, template and serializer timings for, see ServerTimingMiddleware
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0.01))
+
+# Directory each process writes its metrics to, so they can be added up across workers. Unset, each process only
+# reports its own. See common.metrics.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Most often, in seconds, each process writes its metrics to METRICS_DIR
+METRICS_FLUSH_INTERVAL = 1
+# Bearer token needed to scrape /metrics, or None to leave it open
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Where request profiles get saved, and how many of the newest to keep. See common.profiling.
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'gcbv_demo_profiles'))
+PROFILE_KEEP = 50
+# Fraction of requests (0 to 1) to profile, besides those staff ask for, and the profiler (cprofile or sample) to use
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_PROFILER = 'sample'
+
+# Background jobs, see jobs.queue. Workers run_jobs starts by default, and how often they check for jobs once idle.
+JOBS_CONCURRENCY = int(os.environ.get('JOBS_CONCURRENCY', 4))
+JOBS_POLL_INTERVAL = 1
+# Seconds a worker gets to finish a job before it gets run again, unless its task says otherwise
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+# Seconds to wait before retrying a failed job, doubling with each attempt up to the max
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+
+# Where files uploaded for import get saved, with their progress. See todo.importer.
+IMPORT_DIR = os.environ.get('IMPORT_DIR', os.path.join(tempfile.gettempdir(), 'gcbv_demo_imports'))
+# Processes each import validates rows in, while it saves them, or 0 to validate them inline. The default leaves a core
+# for saving.
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', (os.cpu_count() or 1) - 1))
+# Seconds a list's search document can lag behind edits to it, so a burst of edits gets it rebuilt once
+SEARCH_REFRESH_DELAY = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'common.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, with render times recorded for Server-Timing
+        'BACKEND': 'common.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -105,14 +167,53 @@ WSGI_APPLICATION = 'gcbv_demo.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql, with connections kept in a pool between requests, see common.db.pool
+        'ENGINE': 'common.db.backends.postgresql',
         'NAME': 'postgres',
         'USER': 'postgres',
         'HOST': 'db',
         'PORT': 5432,
+        'POOL': {
+            # per process, so workers times this needs to fit in the server's max_connections
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': 30 * 60,
+            'TIMEOUT': 10,
+            'CHECK_IDLE_AFTER': 10,
+        },
     }
 }
 
+# Writes go to default, and read-only views read from a replica, see common.db.routers
+DATABASE_ROUTERS = ['common.db.routers.ReplicaRouter']
+
+# Aliases in DATABASES of read-only replicas of default, e.g. ['replica']
+REPLICA_DATABASES = []
+
+# Seconds a client reads from default after writing, so replica lag can't hide its own changes from it
+REPLICA_PIN_SECONDS = 5
+
+# Caches
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered todo list table rows. Keys change whenever a list does, so stale rows are never read again, they just
+    # get evicted. LocMemCache evicts least recently used entries once it's full.
+    'todo_rows': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todo-rows',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Cache alias to cache todo list table rows in, or None to not cache them
+TODO_ROW_CACHE = 'todo_rows'
+
 AUTH_USER_MODEL = 'authtools.User'
 
 # Password validation
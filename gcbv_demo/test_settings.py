@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Settings for running the tests, which manage.py test uses unless DJANGO_SETTINGS_MODULE says otherwise
+"""
+from gcbv_demo.settings import *  # noqa: F401,F403
+from gcbv_demo.settings import DATABASES
+
+# A replica on the same server, as a test database of its own (test_replica), rather than a mirror of default, so the
+# replica tests can leave it behind the primary on purpose. It isn't in REPLICA_DATABASES, tests that read from it
+# opt in.
+DATABASES['replica'] = {**DATABASES['default'], 'NAME': 'replica'}
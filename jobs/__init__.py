@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+App to run heavy operations in the background, see jobs.queue
+"""
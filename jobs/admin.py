@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+admin config for jobs app
+"""
+from typing import Any, Dict, Optional
+
+from django.contrib import admin, messages
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from jobs.models import Job
+from jobs.queue import get_queue_stats
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Jobs, with the queue's depth and throughput above the list
+    """
+    list_display = ('__str__', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'locked_by', 'locked_until', 'last_error', 'created', 'started_at', 'finished_at')
+    actions = ['run_again']
+
+    def changelist_view(self, request: HttpRequest, extra_context: Optional[Dict[str, Any]] = None) -> HttpResponse:
+        """
+        Add queue stats to the list page
+        :param request: wsgi request
+        :param extra_context: template context
+        :return: list page
+        """
+        extra_context = {**(extra_context or {}), 'queue_stats': get_queue_stats()}
+
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def run_again(self, request: HttpRequest, queryset: QuerySet) -> None:
+        """
+        Queue finished jobs to run again, with all their attempts
+        :param request: wsgi request
+        :param queryset: selected jobs
+        """
+        queued = queryset.filter(status__in=[Job.SUCCEEDED, Job.FAILED]).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+
+        self.message_user(request, _(f'Queued {queued} jobs to run again.'), messages.SUCCESS)
+
+    run_again.short_description = _('Run selected finished jobs again')
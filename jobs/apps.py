@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Config for jobs app
+"""
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    """
+    Jobs app config
+    """
+    name = 'jobs'
+
+    def ready(self) -> None:
+        """
+        Register the tasks in each app's jobs module
+        """
+        autodiscover_modules('jobs')
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Queue a background job
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import TASKS, enqueue
+
+
+class Command(BaseCommand):
+    """
+    Queues a job for run_jobs to pick up, e.g. from cron
+    """
+    help = 'Queue a job running a registered task.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('name', help='task name, e.g. todo.repair_todo_list_counts')
+        parser.add_argument('--kwargs', default='{}', help='JSON object of kwargs to call the task with')
+        parser.add_argument('--priority', type=int, help="priority, instead of the task's default")
+        parser.add_argument('--delay', type=float, default=0, help='seconds to wait before running it')
+
+    def handle(self, *args, **options) -> None:
+        if options['name'] not in TASKS:
+            raise CommandError(f"No task is registered as {options['name']}. Tasks: {', '.join(sorted(TASKS))}")
+
+        try:
+            kwargs = json.loads(options['kwargs'])
+        except ValueError as error:
+            raise CommandError(f'--kwargs is not valid JSON: {error}')
+
+        if not isinstance(kwargs, dict):
+            raise CommandError('--kwargs needs to be a JSON object.')
+
+        job = enqueue(options['name'], priority=options['priority'], delay=options['delay'], **kwargs)
+
+        self.stdout.write(f'Queued {job}.')
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Run queued background jobs
+"""
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    """
+    Runs a pool of workers claiming and running jobs, see jobs.queue. Threads suit jobs that mostly wait on the
+    database, processes suit ones that keep Python busy. SIGINT/SIGTERM stop the workers once their current jobs are
+    done.
+    """
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--concurrency', type=int, default=settings.JOBS_CONCURRENCY,
+                            help='number of workers, each running one job at a time')
+        parser.add_argument('--processes', action='store_true', help='run workers in processes instead of threads')
+        parser.add_argument('--interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='seconds to wait before checking again, once no jobs are ready')
+        parser.add_argument('--burst', action='store_true', help='stop once no jobs are ready')
+        parser.add_argument('--max-jobs', type=int, help='jobs for each worker to run before stopping')
+
+    def handle(self, *args, **options) -> None:
+        concurrency = options['concurrency']
+        worker_options = {'interval': options['interval'], 'burst': options['burst'], 'max_jobs': options['max_jobs']}
+
+        if options['processes']:
+            stop = multiprocessing.Event()
+            # forked workers shouldn't share the parent's connections
+            connections.close_all()
+            workers = [multiprocessing.Process(target=work, args=(number, stop), kwargs=worker_options,
+                                               name=f'jobs-worker-{number}') for number in range(concurrency)]
+        elif concurrency > 1:
+            stop = threading.Event()
+            workers = [threading.Thread(target=work, args=(number, stop), kwargs=worker_options,
+                                        name=f'jobs-worker-{number}') for number in range(concurrency)]
+        else:
+            stop = threading.Event()
+            workers = []
+
+        def handle_signal(signum, frame) -> None:
+            stop.set()
+
+        previous_handlers = {signum: signal.signal(signum, handle_signal) for signum in (signal.SIGINT, signal.SIGTERM)}
+
+        try:
+            if workers:
+                for worker in workers:
+                    worker.start()
+
+                for worker in workers:
+                    worker.join()
+
+                self.stdout.write(f'Stopped {len(workers)} workers.')
+            else:
+                ran = work(0, stop, **worker_options)
+
+                self.stdout.write(f'Ran {ran} jobs.')
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
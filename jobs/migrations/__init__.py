@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Migrations for jobs app
+"""
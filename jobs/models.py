@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+models for jobs app
+"""
+import json
+from typing import Any, Dict
+
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A call to a registered task, run by the run_jobs command. See jobs.queue.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (QUEUED, _('queued')),
+        (RUNNING, _('running')),
+        (SUCCEEDED, _('succeeded')),
+        (FAILED, _('failed')),
+    )
+
+    # name the task was registered under
+    name = models.CharField(max_length=200)
+    # JSON object of keyword arguments to call the task with
+    kwargs = models.TextField(default='{}')
+    # higher runs first
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # not run before this, pushed back after each failed attempt
+    run_at = models.DateTimeField(default=timezone.now)
+    # which worker is running it, and until when. Running jobs whose lock expires get run again.
+    locked_by = models.CharField(max_length=200, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = [
+            # backs workers looking for the next job to run
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_ready_idx'),
+            # backs counting recently finished jobs, for throughput
+            models.Index(fields=['finished_at', 'status'], name='job_finished_idx'),
+        ]
+
+    def get_kwargs(self) -> Dict[str, Any]:
+        return json.loads(self.kwargs)
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
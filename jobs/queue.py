@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Background job queue, kept in the database, so there's nothing to run besides it and the run_jobs workers.
+
+Tasks are functions registered with @task, in a jobs module of any installed app (see JobsConfig.ready). enqueue adds
+a Job calling one, which a worker claims, runs, and marks succeeded or failed. Failed attempts are retried after an
+exponential backoff, up to the task's max_attempts. A claimed job is locked for the task's timeout. If the worker
+doesn't finish it by then (e.g. it died), the job is run again, so tasks need to be safe to rerun.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED where the database has it (Postgres), so they never wait on
+each other. Elsewhere (SQLite) they claim with a conditional UPDATE instead, and move on to the next job if another
+worker got there first.
+"""
+import json
+import logging
+import random
+import traceback
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from common.metrics import registry
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+jobs_total = registry.counter('jobs_total', 'Jobs attempted, by how the attempt ended', ['name', 'status'])
+job_duration = registry.histogram('job_duration_seconds', 'Time to run job attempts', ['name'],
+                                  buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+
+# number of candidates to try, before giving up on a claim, where claims are conditional updates
+CLAIM_CANDIDATES = 10
+
+
+class Task:
+    """
+    Function that can be run as a job, with the defaults for its jobs
+    """
+
+    def __init__(self, func: Callable[..., Any], name: str, priority: int, max_attempts: int,
+                 timeout: Optional[float]) -> None:
+        """
+        :param func: function to run, called with the job's kwargs
+        :param name: name jobs refer to it by
+        :param priority: default priority of its jobs, higher runs first
+        :param max_attempts: times to try a job before marking it failed
+        :param timeout: seconds a worker gets to finish a job before it gets run again, defaults to
+            settings.JOBS_VISIBILITY_TIMEOUT
+        """
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def __call__(self, **kwargs: Any) -> Any:
+        return self.func(**kwargs)
+
+    def get_timeout(self) -> float:
+        return settings.JOBS_VISIBILITY_TIMEOUT if self.timeout is None else self.timeout
+
+    def enqueue(self, priority: Optional[int] = None, delay: float = 0, **kwargs: Any) -> Job:
+        """
+        Queue a job running this task
+        :param priority: priority, instead of the task's default
+        :param delay: seconds to wait before running it
+        :param kwargs: kwargs to call the task with, which need to be JSON serializable
+        :return: queued job
+        """
+        return Job.objects.create(name=self.name, kwargs=json.dumps(kwargs, sort_keys=True),
+                                  priority=self.priority if priority is None else priority,
+                                  max_attempts=self.max_attempts, run_at=timezone.now() + timedelta(seconds=delay))
+
+
+TASKS: Dict[str, Task] = {}
+
+
+def task(name: str, priority: int = 0, max_attempts: int = 3,
+         timeout: Optional[float] = None) -> Callable[[Callable[..., Any]], Task]:
+    """
+    Register a function as a task, see Task for the options
+    :param name: name jobs refer to it by, namespaced by app, e.g. todo.purge_todo_list
+    :return: decorator
+    """
+
+    def decorator(func: Callable[..., Any]) -> Task:
+        TASKS[name] = Task(func, name, priority=priority, max_attempts=max_attempts, timeout=timeout)
+
+        return TASKS[name]
+
+    return decorator
+
+
+def enqueue(name: str, priority: Optional[int] = None, delay: float = 0, **kwargs: Any) -> Job:
+    """
+    Queue a job running a task, by name. See Task.enqueue.
+    :param name: task name
+    :return: queued job
+    """
+    if name not in TASKS:
+        raise LookupError(f'No task is registered as {name}.')
+
+    return TASKS[name].enqueue(priority=priority, delay=delay, **kwargs)
+
+
+def claim_job(worker: str) -> Optional[Job]:
+    """
+    Claim the next job that's ready to run: highest priority first, then the one that's been ready the longest
+    :param worker: name of the worker claiming it
+    :return: claimed job, or None if none are ready
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+
+    if connections[Job.objects.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = ready.select_for_update(skip_locked=True).first()
+
+            if job is not None:
+                Job.objects.filter(pk=job.pk).update(**_claim_values(job.name, worker, now))
+
+    else:
+        job = None
+
+        for pk, name in ready.values_list('pk', 'name')[:CLAIM_CANDIDATES]:
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**_claim_values(name, worker, now)):
+                job = Job(pk=pk)
+                break
+
+    if job is not None:
+        job.refresh_from_db()
+
+    return job
+
+
+def _claim_values(name: str, worker: str, now: datetime) -> Dict[str, Any]:
+    """
+    Build the values that mark a job claimed
+    :param name: task name
+    :param worker: name of the worker claiming it
+    :param now: time of the claim
+    :return: values to update the job with
+    """
+    timeout = TASKS[name].get_timeout() if name in TASKS else settings.JOBS_VISIBILITY_TIMEOUT
+
+    return {
+        'status': Job.RUNNING,
+        'attempts': F('attempts') + 1,
+        'locked_by': worker,
+        'locked_until': now + timedelta(seconds=timeout),
+        'started_at': now,
+    }
+
+
+def requeue_abandoned_jobs() -> int:
+    """
+    Queue running jobs again once their lock expires, or mark them failed if that was their last attempt
+    :return: number of jobs queued again
+    """
+    now = timezone.now()
+    abandoned = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+
+    abandoned.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_until=None, finished_at=now,
+        last_error='The worker running the last attempt did not finish it in time.',
+    )
+
+    return abandoned.update(status=Job.QUEUED, locked_by='', locked_until=None, run_at=now)
+
+
+def get_retry_delay(attempts: int) -> float:
+    """
+    Work out how long to wait before retrying a job: settings.JOBS_RETRY_BACKOFF, doubling with each attempt up to
+    settings.JOBS_RETRY_BACKOFF_MAX, less up to half of it, so jobs that failed together don't all retry together
+    :param attempts: attempts made so far
+    :return: seconds
+    """
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX)
+
+    return delay * random.uniform(0.5, 1)
+
+
+def run_job(job: Job) -> str:
+    """
+    Run a claimed job, and record how it went. If the job's lock expired and it was claimed again meanwhile, the
+    outcome is left to the newer attempt.
+    :param job: job from claim_job
+    :return: status the job ended up with
+    """
+    start = perf_counter()
+
+    try:
+        if job.name not in TASKS:
+            raise LookupError(f'No task is registered as {job.name}.')
+
+        TASKS[job.name](**job.get_kwargs())
+    except Exception:
+        logger.exception('Job %s failed, attempt %s of %s', job, job.attempts, job.max_attempts)
+
+        values = {'last_error': traceback.format_exc()}
+
+        if job.attempts < job.max_attempts and job.name in TASKS:
+            values.update(status=Job.QUEUED, run_at=timezone.now() + timedelta(seconds=get_retry_delay(job.attempts)))
+        else:
+            values.update(status=Job.FAILED, finished_at=timezone.now())
+    else:
+        values = {'status': Job.SUCCEEDED, 'finished_at': timezone.now()}
+
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by, attempts=job.attempts).update(
+        locked_by='', locked_until=None, **values
+    )
+
+    outcome = 'retried' if values['status'] == Job.QUEUED else values['status']
+    jobs_total.inc(name=job.name, status=outcome)
+    job_duration.observe(perf_counter() - start, name=job.name)
+
+    return values['status']
+
+
+def get_queue_stats(windows: Sequence[int] = (5, 60)) -> Dict[str, Any]:
+    """
+    Sum up the queue: how many jobs are in each status, how many are ready to run and how long the oldest of those
+    has waited, and how many finished over the last few minutes
+    :param windows: minutes to count finished jobs over
+    :return: depth (jobs per status), ready, oldest_ready_seconds, and throughput (finished jobs per window)
+    """
+    now = timezone.now()
+
+    depth = dict.fromkeys((status for status, _ in Job.STATUS_CHOICES), 0)
+    depth.update(Job.objects.order_by().values_list('status').annotate(count=Count('pk')))
+
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(count=Count('pk'),
+                                                                             oldest=Min('run_at'))
+
+    throughput = []
+    for minutes in windows:
+        finished = Job.objects.filter(finished_at__gte=now - timedelta(minutes=minutes)).aggregate(
+            succeeded=Count('pk', filter=Q(status=Job.SUCCEEDED)),
+            failed=Count('pk', filter=Q(status=Job.FAILED)),
+        )
+        finished['minutes'] = minutes
+        finished['per_minute'] = (finished['succeeded'] + finished['failed']) / minutes
+        throughput.append(finished)
+
+    return {
+        'depth': depth,
+        'ready': ready['count'],
+        'oldest_ready_seconds': (now - ready['oldest']).total_seconds() if ready['oldest'] else None,
+        'throughput': throughput,
+    }
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for jobs app
+"""
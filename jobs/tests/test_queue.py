@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the background job queue
+"""
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_job, enqueue, get_retry_delay, requeue_abandoned_jobs, run_job, task
+
+calls = []
+calls_lock = threading.Lock()
+
+
+@task('jobs_tests.record')
+def record(value: int) -> None:
+    with calls_lock:
+        calls.append(value)
+
+
+@task('jobs_tests.fail', max_attempts=2)
+def fail() -> None:
+    raise ValueError('broken')
+
+
+class QueueTest(TestCase):
+
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_claims_highest_priority_first(self) -> None:
+        enqueue('jobs_tests.record', value=1)
+        urgent = enqueue('jobs_tests.record', priority=10, value=2)
+        enqueue('jobs_tests.record', priority=20, delay=60, value=3)
+
+        job = claim_job('worker')
+
+        self.assertEqual(job.pk, urgent.pk)
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.RUNNING, 1, 'worker'))
+
+        self.assertEqual(run_job(job), Job.SUCCEEDED)
+        self.assertEqual(calls, [2])
+
+    def test_unknown_tasks_cannot_be_queued(self) -> None:
+        with self.assertRaises(LookupError):
+            enqueue('jobs_tests.missing')
+
+    @override_settings(JOBS_RETRY_BACKOFF=10)
+    def test_retries_with_backoff(self) -> None:
+        job = enqueue('jobs_tests.fail')
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertEqual(run_job(claim_job('worker')), Job.QUEUED)
+
+        job.refresh_from_db()
+        self.assertGreaterEqual(job.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertIsNone(claim_job('worker'))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertEqual(run_job(claim_job('worker')), Job.FAILED)
+
+        job.refresh_from_db()
+        self.assertIn('ValueError: broken', job.last_error)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOBS_RETRY_BACKOFF=10, JOBS_RETRY_BACKOFF_MAX=60)
+    def test_backoff_doubles_up_to_max(self) -> None:
+        self.assertTrue(5 <= get_retry_delay(1) <= 10)
+        self.assertTrue(20 <= get_retry_delay(3) <= 40)
+        self.assertTrue(30 <= get_retry_delay(10) <= 60)
+
+    def test_requeues_abandoned_jobs(self) -> None:
+        job = enqueue('jobs_tests.record', value=1)
+        last_try = enqueue('jobs_tests.fail')
+        claim_job('worker')
+        claim_job('worker')
+        Job.objects.filter(pk=last_try.pk).update(attempts=2)
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(requeue_abandoned_jobs(), 1)
+
+        job.refresh_from_db()
+        last_try.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.QUEUED, ''))
+        self.assertEqual(last_try.status, Job.FAILED)
+
+    def test_late_finish_leaves_newer_attempt_alone(self) -> None:
+        enqueue('jobs_tests.record', value=1)
+        abandoned = claim_job('slow worker')
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        requeue_abandoned_jobs()
+        claim_job('other worker')
+
+        run_job(abandoned)
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, 'other worker', 2))
+
+    def test_admin_shows_queue_stats(self) -> None:
+        enqueue('jobs_tests.record', value=1)
+        run_job(claim_job('worker'))
+        enqueue('jobs_tests.record', value=2)
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', password=None)
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('admin:jobs_job_changelist'))
+
+        self.assertEqual(response.context['queue_stats']['depth'][Job.QUEUED], 1)
+        self.assertEqual(response.context['queue_stats']['throughput'][0]['succeeded'], 1)
+        self.assertContains(response, 'Throughput')
+
+    def test_enqueue_command(self) -> None:
+        call_command('enqueue_job', 'jobs_tests.record', kwargs='{"value": 1}', priority=5, stdout=StringIO())
+
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.get_kwargs(), job.priority), ('jobs_tests.record', {'value': 1}, 5))
+
+        with self.assertRaises(CommandError):
+            call_command('enqueue_job', 'jobs_tests.missing', stdout=StringIO())
+
+
+class RunJobsTest(TransactionTestCase):
+
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_runs_jobs_until_none_are_ready(self) -> None:
+        for value in range(3):
+            enqueue('jobs_tests.record', value=value)
+
+        call_command('run_jobs', concurrency=1, burst=True, stdout=StringIO())
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 3)
+
+    @skipUnless(connection.features.has_select_for_update_skip_locked,
+                'in-memory SQLite test databases lock whole tables across threads')
+    def test_workers_run_each_job_once(self) -> None:
+        for value in range(30):
+            enqueue('jobs_tests.record', value=value)
+
+        call_command('run_jobs', concurrency=3, burst=True, interval=0, stdout=StringIO())
+
+        self.assertEqual(sorted(calls), list(range(30)))
+        self.assertFalse(Job.objects.exclude(status=Job.SUCCEEDED).exists())
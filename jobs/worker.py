@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Worker loop for the run_jobs command, run in threads or processes
+"""
+import logging
+import multiprocessing.synchronize
+import os
+import socket
+import threading
+from time import monotonic
+from typing import Optional, Union
+
+from django.db import DatabaseError, close_old_connections, connections
+
+from common.metrics import registry
+from jobs.queue import claim_job, requeue_abandoned_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+# seconds between checks for abandoned jobs, per worker
+REQUEUE_INTERVAL = 10
+
+# threading.Event, or multiprocessing.Event for workers in processes
+StopEvent = Union[threading.Event, multiprocessing.synchronize.Event]
+
+
+def get_worker_name(number: int) -> str:
+    """
+    Name a worker uniquely across hosts and processes, which jobs it claims are locked by
+    :param number: worker's number within its process
+    :return: name
+    """
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def work(number: int, stop: StopEvent, interval: float, burst: bool = False,
+         max_jobs: Optional[int] = None) -> int:
+    """
+    Claim and run jobs until told to stop. The job running when stop is set gets finished first. Database errors
+    (e.g. while the database restarts) get logged, and the worker carries on after waiting the interval.
+    :param number: worker's number within its process
+    :param stop: event to stop on
+    :param interval: seconds to wait before checking again, once no jobs are ready
+    :param burst: stop once no jobs are ready, rather than waiting for more
+    :param max_jobs: stop after running this many jobs
+    :return: number of jobs run
+    """
+    worker = get_worker_name(number)
+    ran = 0
+    last_requeue = None
+
+    try:
+        while not stop.is_set() and (max_jobs is None or ran < max_jobs):
+            close_old_connections()
+
+            try:
+                if last_requeue is None or monotonic() - last_requeue >= REQUEUE_INTERVAL:
+                    requeue_abandoned_jobs()
+                    last_requeue = monotonic()
+
+                job = claim_job(worker)
+
+                if job is not None:
+                    run_job(job)
+            except DatabaseError:
+                # a job whose outcome didn't get recorded is run again once its lock expires
+                logger.exception('Worker %s lost touch with the job queue', worker)
+                stop.wait(interval)
+                continue
+
+            if job is None:
+                if burst:
+                    break
+
+                stop.wait(interval)
+                continue
+
+            ran += 1
+            registry.flush()
+    finally:
+        # each thread has connections of its own
+        connections.close_all()
+        registry.flush(force=True)
+
+    return ran
@@ -6,7 +6,9 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gcbv_demo.settings')
+    # the tests get a replica database of their own, see gcbv_demo.test_settings
+    settings_module = 'gcbv_demo.test_settings' if sys.argv[1:2] == ['test'] else 'gcbv_demo.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk create/update/delete of todo items
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.db import connection, transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+
+from todo.models import TodoItemModel, TodoListModel, deferred_todo_list_touches, item_count_deltas, \
+    touch_todo_lists
+from todo.serializers import TodoItemSerializer
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+class BulkTodoItemOperations:
+    """
+    Validates and applies a batch of mixed item operations. Every operation gets validated through TodoItemSerializer
+    first, and the batch is only applied if all of them are valid. Writes then happen in one transaction, using
+    bulk_create/bulk_update and a single delete, and each affected list's last_updated and counters are updated once
+    (marking its search document stale in the same UPDATE).
+
+    Operations look like:
+        {"op": "create", "data": {"todo_list": 1, "text": "milk", "completed": false}}
+        {"op": "update", "pk": 3, "data": {"completed": true}}
+        {"op": "delete", "pk": 4}
+
+    Updates are partial, so they only need to send the fields that changed.
+    """
+    max_operations = 1000
+
+    def __init__(self, operations: Any, context: Optional[Dict[str, Any]] = None) -> None:
+        self.operations = operations
+        self.context = context or {}
+        self.results: List[Dict[str, Any]] = []
+        self.errors: Optional[Dict[str, Any]] = None
+
+        self._serializers: List[Optional[TodoItemSerializer]] = []
+        self._instances: Dict[int, TodoItemModel] = {}
+        self._todo_lists: Dict[int, TodoListModel] = {}
+
+    def is_valid(self) -> bool:
+        """
+        Validate every operation. Per-operation problems end up in results, problems with the batch itself in errors.
+        :return: whether the whole batch is valid
+        """
+        if not isinstance(self.operations, list) or not self.operations:
+            self.errors = {'operations': [_('Expected a non-empty list of operations.')]}
+            return False
+
+        if len(self.operations) > self.max_operations:
+            message = _('Batches are limited to %(max)s operations.') % {'max': self.max_operations}
+            self.errors = {'operations': [message]}
+            return False
+
+        pks = [self._get_pk(operation) for operation in self.operations]
+        # items of lists pending deletion are gone as far as the api is concerned, like in TodoItemViewSet
+        items = TodoItemModel.objects.filter(todo_list__pending_deletion=False)
+        self._instances = items.in_bulk([pk for pk in pks if pk is not None])
+        self._todo_lists = TodoListModel.objects.in_bulk(self._get_todo_list_pks())
+
+        seen_pks: Set[int] = set()
+        for operation in self.operations:
+            serializer, errors = self._validate_operation(operation, seen_pks)
+
+            self._serializers.append(serializer)
+            self.results.append(self._result(operation, status.HTTP_400_BAD_REQUEST, errors=errors) if errors else None)
+
+        self._check_unique_together()
+
+        return not any(self.results)
+
+    @staticmethod
+    def _get_pk(operation: Any) -> Optional[int]:
+        """
+        Get the item pk an operation refers to. Anything but an integer (lists, objects, booleans) can't be one.
+        :param operation: operation, as sent
+        :return: pk, or None if the operation doesn't have a usable one
+        """
+        pk = operation.get('pk') if isinstance(operation, dict) else None
+
+        return pk if isinstance(pk, int) and not isinstance(pk, bool) else None
+
+    def _get_todo_list_pks(self) -> Set[int]:
+        """
+        Collect the lists operations refer to, so they can all be loaded with one query
+        :return: list pks
+        """
+        todo_list_pks = set()
+
+        for operation in self.operations:
+            data = operation.get('data') if isinstance(operation, dict) else None
+
+            try:
+                todo_list_pks.add(int(data['todo_list']))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                continue
+
+        return todo_list_pks
+
+    def _validate_operation(self, operation: Any, seen_pks: Set[int]) \
+            -> Tuple[Optional[TodoItemSerializer], Optional[Dict[str, Any]]]:
+        """
+        Validate a single operation
+        :param operation: operation to validate
+        :param seen_pks: pks already used by earlier operations in the batch
+        :return: serializer for the operation (if it has one) and errors (if any)
+        """
+        if not isinstance(operation, dict) or operation.get('op') not in (CREATE, UPDATE, DELETE):
+            return None, {'op': [_('Expected one of: %(ops)s.') % {'ops': ', '.join((CREATE, UPDATE, DELETE))}]}
+
+        # lists get looked up in the ones loaded for the whole batch
+        context = {**self.context, 'preloaded': {'todo_list': self._todo_lists}}
+
+        if operation['op'] == CREATE:
+            serializer = TodoItemSerializer(data=operation.get('data'), context=context)
+        else:
+            pk = self._get_pk(operation)
+
+            if pk is None or pk not in self._instances:
+                return None, {'pk': [_('Not found.')]}
+
+            if pk in seen_pks:
+                return None, {'pk': [_('Each item can only be used by one operation in a batch.')]}
+
+            seen_pks.add(pk)
+
+            if operation['op'] == DELETE:
+                return None, None
+
+            serializer = TodoItemSerializer(self._instances[pk], data=operation.get('data'), partial=True,
+                                            context=context)
+
+        # uniqueness gets checked for the whole batch at once in _check_unique_together
+        serializer.validators = []
+
+        if not serializer.is_valid():
+            return serializer, serializer.errors
+
+        return serializer, None
+
+    def _check_unique_together(self) -> None:
+        """
+        Check (todo_list, text) stays unique, both within the batch and against existing items, with a single query.
+        """
+        pairs: Dict[Tuple[int, str], int] = {}
+        for index, serializer in enumerate(self._serializers):
+            if serializer is None or self.results[index]:
+                continue
+
+            pair = self._final_pair(serializer)
+
+            if pair in pairs:
+                self.results[index] = self._duplicate_result(self.operations[index])
+            else:
+                pairs[pair] = index
+
+        if not pairs:
+            return
+
+        existing = TodoItemModel.objects.filter(
+            todo_list_id__in={todo_list_pk for todo_list_pk, _text in pairs},
+            text__in={text for _todo_list_pk, text in pairs},
+        ).exclude(
+            # items being updated or deleted by this batch won't keep their current values
+            pk__in=[self._get_pk(operation) for operation in self.operations if isinstance(operation, dict)
+                    and operation.get('op') in (UPDATE, DELETE) and self._get_pk(operation) in self._instances]
+        ).values_list('todo_list_id', 'text')
+
+        for pair in existing:
+            if pair in pairs:
+                self.results[pairs[pair]] = self._duplicate_result(self.operations[pairs[pair]])
+
+    @staticmethod
+    def _final_pair(serializer: TodoItemSerializer) -> Tuple[int, str]:
+        """
+        Get the (todo_list, text) an item will end up with
+        :param serializer: validated serializer
+        :return: todo list pk and text
+        """
+        data = serializer.validated_data
+        instance = serializer.instance
+
+        todo_list = data['todo_list'].pk if 'todo_list' in data else instance.todo_list_id
+        text = data['text'] if 'text' in data else instance.text
+
+        return todo_list, text
+
+    def _duplicate_result(self, operation: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the result for an operation that would break (todo_list, text) uniqueness
+        :param operation: failed operation
+        :return: result
+        """
+        errors = {'non_field_errors': [_('The fields todo_list, text must make a unique set.')]}
+
+        return self._result(operation, status.HTTP_400_BAD_REQUEST, errors=errors)
+
+    def save(self) -> None:
+        """
+        Apply a validated batch. Deletes run first, so their (todo_list, text) pairs are free for later operations.
+        """
+        assert self.errors is None and self._serializers and not any(self.results), \
+            'is_valid() must be called, and return True, before save().'
+
+        creates, updates, deletes = [], [], []
+        for operation, serializer in zip(self.operations, self._serializers):
+            if operation['op'] == CREATE:
+                creates.append(TodoItemModel(**serializer.validated_data))
+            elif operation['op'] == UPDATE:
+                updates.append(serializer)
+            else:
+                deletes.append(self._instances[operation['pk']])
+
+        with transaction.atomic(), deferred_todo_list_touches():
+            if deletes:
+                TodoItemModel.objects.filter(pk__in=[item.pk for item in deletes]).delete()
+                touch_todo_lists(*{item.todo_list_id for item in deletes}, reindex=True,
+                                 count_deltas=item_count_deltas([(item.todo_list_id, item.completed)
+                                                                 for item in deletes], []))
+
+            if updates:
+                self._bulk_update(updates)
+
+            if creates:
+                self._bulk_create(creates)
+                touch_todo_lists(*{item.todo_list_id for item in creates}, reindex=True,
+                                 count_deltas=item_count_deltas([], [(item.todo_list_id, item.completed)
+                                                                     for item in creates]))
+
+        created = iter(creates)
+        for index, operation in enumerate(self.operations):
+            if operation['op'] == CREATE:
+                self.results[index] = self._result(operation, status.HTTP_201_CREATED, instance=next(created))
+            elif operation['op'] == UPDATE:
+                self.results[index] = self._result(operation, status.HTTP_200_OK,
+                                                   instance=self._instances[operation['pk']])
+            else:
+                self.results[index] = self._result(operation, status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def _bulk_update(serializers: List[TodoItemSerializer]) -> None:
+        """
+        Apply validated updates with a single bulk_update of the columns that changed, and touch the lists the changed
+        items were and are in. Items left as they were aren't written at all.
+        :param serializers: validated update serializers
+        """
+        fields = set()
+        changed_items = []
+
+        for serializer in serializers:
+            instance = serializer.instance
+            old_list_pk, old_text, old_completed = instance.todo_list_id, instance.text, instance.completed
+            changed = TodoItemSerializer.get_changed_fields(instance, serializer.validated_data)
+
+            if not changed:
+                continue
+
+            for attr in changed:
+                setattr(instance, attr, serializer.validated_data[attr])
+
+            fields.update(changed)
+            changed_items.append(instance)
+
+            reindex = old_list_pk != instance.todo_list_id or old_text != instance.text
+            count_deltas = item_count_deltas([(old_list_pk, old_completed)],
+                                             [(instance.todo_list_id, instance.completed)])
+            touch_todo_lists(old_list_pk, instance.todo_list_id, reindex=reindex, count_deltas=count_deltas)
+
+        if changed_items:
+            TodoItemModel.objects.bulk_update(changed_items, sorted(fields))
+
+    @staticmethod
+    def _bulk_create(items: List[TodoItemModel]) -> None:
+        """
+        Insert new items with a single bulk_create, and make sure they all end up with pks.
+        :param items: new items
+        """
+        TodoItemModel.objects.bulk_create(items)
+
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # (todo_list, text) is unique, so it can be used to look the new pks up.
+            created = TodoItemModel.objects.filter(
+                todo_list_id__in={item.todo_list_id for item in items},
+                text__in={item.text for item in items},
+            ).values_list('todo_list_id', 'text', 'pk')
+            pks = {(todo_list_pk, text): pk for todo_list_pk, text, pk in created}
+
+            for item in items:
+                item.pk = pks[(item.todo_list_id, item.text)]
+
+    def _result(self, operation: Any, status_code: int, instance: Optional[TodoItemModel] = None,
+                errors: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build the result of one operation
+        :param operation: operation the result is for
+        :param status_code: http status the operation would have gotten as its own request
+        :param instance: item to serialize into the result, if any
+        :param errors: validation errors, if any
+        :return: result
+        """
+        result = {
+            'op': operation.get('op') if isinstance(operation, dict) else None,
+            'status': status_code,
+        }
+
+        if instance is not None:
+            result['data'] = TodoItemSerializer(instance, context=self.context).data
+
+        if errors is not None:
+            result['errors'] = errors
+
+        return result
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Conditional GET support for todo list pages and the items api. Every item change bumps its list's last_updated, so
+that (with the list pk) is enough to tell if anything a client already has went stale.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Optional
+
+from django.http import HttpRequest
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from common.db.routers import get_read_db
+from todo.models import TodoListModel
+
+
+def get_todo_list_last_updated(request: HttpRequest, pk: Optional[str]) -> Optional[datetime]:
+    """
+    Look up when a todo list was last updated, with a single query on the primary key that only reads that column.
+    The result is kept on the request, since both the ETag and Last-Modified get built from it. It's read from the same
+    database as the rest of the page, so the ETag matches what the page shows (see common.db.routers).
+    :param request: request the lookup is for
+    :param pk: todo list pk, as it came in the url or query string
+    :return: when the list was last updated, or None if there's no such list
+    """
+    if pk is None or not str(pk).isdigit():
+        return None
+
+    cache = request.__dict__.setdefault('_todo_list_last_updated', {})
+
+    if pk not in cache:
+        queryset = TodoListModel.objects.using(get_read_db(request)).filter(pk=pk)
+        cache[pk] = queryset.values_list('last_updated', flat=True).first()
+
+    return cache[pk]
+
+
+def todo_list_etag(request: HttpRequest, pk: int, **kwargs) -> Optional[str]:
+    """
+    ETag for a todo list's page
+    :param request: wsgi request
+    :param pk: todo list pk
+    :return: etag, or None if there's no such list
+    """
+    last_updated = get_todo_list_last_updated(request, pk)
+
+    if last_updated is None:
+        return None
+
+    return f'"{pk}-{last_updated.timestamp()}"'
+
+
+def todo_list_last_modified(request: HttpRequest, pk: int, **kwargs) -> Optional[datetime]:
+    """
+    Last-Modified for a todo list's page
+    :param request: wsgi request
+    :param pk: todo list pk
+    :return: when the list was last updated, or None if there's no such list
+    """
+    return get_todo_list_last_updated(request, pk)
+
+
+def todo_items_etag(request: HttpRequest, *args, **kwargs) -> Optional[str]:
+    """
+    ETag for a page of the items api filtered by todo_list. Each page and each representation of it is its own
+    resource, so the query string and Accept header go into the tag too.
+    :param request: wsgi or drf request
+    :return: etag, or None if the items aren't filtered by a todo list that exists
+    """
+    pk = request.GET.get('todo_list')
+    last_updated = get_todo_list_last_updated(request, pk)
+
+    if last_updated is None:
+        return None
+
+    variant = f"{request.META.get('QUERY_STRING', '')}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(variant.encode()).hexdigest()
+
+    return f'"{pk}-{last_updated.timestamp()}-{digest}"'
+
+
+def todo_items_last_modified(request: HttpRequest, *args, **kwargs) -> Optional[datetime]:
+    """
+    Last-Modified for a page of the items api filtered by todo_list
+    :param request: wsgi or drf request
+    :return: when the list was last updated, or None if the items aren't filtered by a todo list that exists
+    """
+    return get_todo_list_last_updated(request, request.GET.get('todo_list'))
+
+
+def revalidated(etag_func: Callable, last_modified_func: Callable) -> Callable[[Callable], Callable]:
+    """
+    Build a decorator that answers conditional GETs with a 304 before the view runs, and makes clients check back
+    every time before reusing what they have (Cache-Control: no-cache), rather than guessing how long it stays fresh.
+    :param etag_func: computes the ETag, see django.views.decorators.http.condition
+    :param last_modified_func: computes Last-Modified, see django.views.decorators.http.condition
+    :return: view decorator
+    """
+    conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(func: Callable) -> Callable:
+        conditional_func = conditional(func)
+
+        @wraps(func)
+        def inner(request: HttpRequest, *args, **kwargs):
+            response = conditional_func(request, *args, **kwargs)
+
+            if response.has_header('ETag'):
+                patch_cache_control(response, no_cache=True)
+
+            return response
+
+        return inner
+
+    return decorator
+
+
+todo_list_condition = revalidated(todo_list_etag, todo_list_last_modified)
+todo_items_condition = revalidated(todo_items_etag, todo_items_last_modified)
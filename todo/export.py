@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Export every todo list with its items, as JSONL or CSV. Exports are generated a piece at a time from a single query
+joining lists to their items, read through a server-side cursor, so memory use stays flat however much there is.
+
+JSONL has a line per list, its items nested in it:
+    {"id": 1, "name": "...", "created": "...", "last_updated": "...", "items": [{"id": 1, "text": "...", ...}]}
+CSV has a row per item, with its list's columns repeated, and a row with empty item columns for lists without items.
+"""
+import csv
+import json
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from todo.models import TodoListModel
+
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_COLUMNS = ['list_id', 'list_name', 'list_created', 'list_last_updated', 'item_id', 'item_text', 'item_completed']
+
+# rows fetched per round trip from the database cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# bytes to collect before handing them on, so writes and compression don't happen a row at a time
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# (list id, name, created, last_updated, item id, text, completed), the item columns None for lists without items
+ExportRow = Tuple
+
+
+def get_export_rows(using: Optional[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[ExportRow]:
+    """
+    Read every list and item, lists in pk order, each one's items in pk order right after it. Lists pending deletion
+    are left out.
+    :param using: database to read from
+    :param chunk_size: rows fetched per round trip
+    :return: rows
+    """
+    queryset = TodoListModel.objects.using(using).order_by('pk', 'todoitemmodel__id').values_list(
+        'pk', 'name', 'created', 'last_updated', 'todoitemmodel__id', 'todoitemmodel__text',
+        'todoitemmodel__completed',
+    )
+
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def render_jsonl(rows: Iterator[ExportRow]) -> Iterator[str]:
+    """
+    Render rows as JSONL, a line per list. Lines are rendered an item at a time, so one huge list doesn't end up in
+    memory either.
+    :param rows: rows from get_export_rows
+    :return: pieces of the export
+    """
+    current_list = None
+
+    for list_pk, name, created, last_updated, item_pk, text, completed in rows:
+        if list_pk != current_list:
+            if current_list is not None:
+                yield ']}\n'
+
+            current_list = list_pk
+            first_item = True
+            head = json.dumps({'id': list_pk, 'name': name, 'created': created.isoformat(),
+                               'last_updated': last_updated.isoformat()})
+            yield f'{head[:-1]}, "items": ['
+
+        if item_pk is not None:
+            yield ('' if first_item else ', ') + json.dumps({'id': item_pk, 'text': text, 'completed': completed})
+            first_item = False
+
+    if current_list is not None:
+        yield ']}\n'
+
+
+class _Line:
+    """
+    File-like object csv.writer can write a line to, to take it back right after
+    """
+
+    def __init__(self) -> None:
+        self.value = ''
+
+    def write(self, value: str) -> None:
+        self.value = value
+
+
+def render_csv(rows: Iterator[ExportRow]) -> Iterator[str]:
+    """
+    Render rows as CSV, with a header row
+    :param rows: rows from get_export_rows
+    :return: pieces of the export
+    """
+    line = _Line()
+    writer = csv.writer(line)
+
+    writer.writerow(CSV_COLUMNS)
+    yield line.value
+
+    for list_pk, name, created, last_updated, item_pk, text, completed in rows:
+        writer.writerow([list_pk, name, created.isoformat(), last_updated.isoformat(), item_pk, text, completed])
+        yield line.value
+
+
+RENDERERS = {
+    'jsonl': render_jsonl,
+    'csv': render_csv,
+}
+
+
+def export_todo_lists(export_format: str, compress: bool = False, using: Optional[str] = None,
+                      chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Export every list and its items
+    :param export_format: jsonl or csv
+    :param compress: whether to gzip the export, as it's generated
+    :param using: database to read from
+    :param chunk_size: rows fetched per round trip from the database
+    :return: export, in pieces of about EXPORT_BUFFER_SIZE bytes (less when compressed)
+    """
+    pieces = RENDERERS[export_format](get_export_rows(using, chunk_size))
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer: List[str] = []
+    buffered = 0
+
+    def flush() -> bytes:
+        data = ''.join(buffer).encode()
+        buffer.clear()
+
+        return compressor.compress(data) if compressor else data
+
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+
+        if buffered >= EXPORT_BUFFER_SIZE:
+            buffered = 0
+            data = flush()
+
+            # the compressor holds on to what it's given until it has enough to compress
+            if data:
+                yield data
+
+    data = flush()
+
+    if compressor:
+        data += compressor.flush()
+
+    if data:
+        yield data
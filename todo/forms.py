@@ -13,12 +13,14 @@ class SearchListsForm(forms.Form):
     Form to search for existing lists.
     """
     name = forms.CharField(label=_('list name'), required=True)
+    search_items = forms.BooleanField(label=_('also search item text'), required=False)
 
 
 class TodoListForm(forms.ModelForm):
     """
     Form to create and edit todo lists
     """
+    PENDING_DELETION_MESSAGE = _('A list with this name is being deleted, try again in a little while.')
 
     class Meta:
         """
@@ -27,6 +29,19 @@ class TodoListForm(forms.ModelForm):
         model = TodoListModel
         fields = ['name']
 
+    def clean_name(self) -> str:
+        """
+        The usual unique check only sees lists that aren't pending deletion, but their names stay taken until they're
+        purged.
+        :return: name
+        """
+        name = self.cleaned_data['name']
+
+        if TodoListModel.all_objects.filter(name=name, pending_deletion=True).exists():
+            raise forms.ValidationError(self.PENDING_DELETION_MESSAGE)
+
+        return name
+
 
 class TodoItemForm(forms.ModelForm):
     """
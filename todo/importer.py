@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+Import todo lists and their items from JSONL or CSV, in the formats todo.export writes. Lists are matched by name,
+and created if they don't exist yet. Items already in their list are skipped.
+
+The input is read a batch of rows at a time. Rows get parsed and validated in a pool of processes, by the same field
+rules as TodoListForm and TodoItemSerializer, while earlier batches get saved. Each batch is saved in one transaction:
+duplicate items in the batch are dropped in memory, the rest are inserted in one go (with COPY on Postgres, otherwise
+bulk_create), skipping ones already in the database, and the lists they went into get their counters bumped by
+what was inserted and their search documents marked stale, in an UPDATE or so per batch, however big the lists get.
+
+After each batch, progress is saved to a checkpoint file, and invalid rows are appended to an errors file (a JSONL
+line each, with the row number and what's wrong with it). An interrupted import picks up after the last checkpoint.
+A batch that got saved without its checkpoint gets saved again, which only skips what's already there (though its
+invalid rows get reported again).
+"""
+import csv
+import gzip
+import io
+import json
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import django
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from todo.forms import TodoListForm
+from todo.models import TodoItemModel, TodoListModel, item_count_deltas, touch_todo_lists
+from todo.serializers import TodoItemSerializer
+
+IMPORT_FORMATS = ('jsonl', 'csv')
+
+# rows read, validated and saved at a time
+IMPORT_BATCH_SIZE = 5000
+
+# (row number, raw row): a JSONL line, or a CSV row's fields by column
+RawRow = Tuple[int, Any]
+
+# (row number, list name, item text, item completed), the item values None for a list without items
+ImportRow = Tuple[int, str, Optional[str], Optional[bool]]
+
+# (row number, errors by field)
+RowError = Tuple[int, Dict[str, List[str]]]
+
+
+def read_rows(stream: TextIO, import_format: str, skip: int = 0) -> Iterator[RawRow]:
+    """
+    Read raw rows, leaving parsing to validate_rows. CSV gets split into fields here, since quoted fields can span
+    lines.
+    :param stream: input, opened in text mode (with newline='' for CSV)
+    :param import_format: jsonl or csv
+    :param skip: number of rows to skip, e.g. ones a previous run already imported
+    :return: numbered rows, numbered from 1
+    """
+    if import_format == 'csv':
+        rows: Iterable[Any] = csv.DictReader(stream)
+    else:
+        rows = (line for line in stream if line.strip())
+
+    for number, row in enumerate(rows, start=1):
+        if number > skip:
+            yield number, row
+
+
+class RowValidator:
+    """
+    Parses and validates raw rows by TodoListForm's and TodoItemSerializer's field rules. Uniqueness is left to
+    saving, which skips items that already exist, rather than checking every row against the database.
+    """
+
+    def __init__(self) -> None:
+        self.name_field = TodoListForm.base_fields['name']
+        serializer_fields = TodoItemSerializer().fields
+        self.text_field = serializer_fields['text']
+        self.completed_field = serializer_fields['completed']
+
+    def validate_name(self, name: Any) -> str:
+        """
+        Validate a list name
+        :param name: list name
+        :return: validated name
+        """
+        try:
+            return self.name_field.clean(name)
+        except ValidationError as error:
+            raise serializers.ValidationError(error.messages)
+
+    def validate_item(self, text: Any, completed: Any) -> Tuple[str, bool]:
+        """
+        Validate an item's fields
+        :param text: item text
+        :param completed: item completed flag
+        :return: validated text and completed
+        """
+        errors = {}
+        values = {}
+
+        for name, field, value in (('text', self.text_field, text), ('completed', self.completed_field, completed)):
+            try:
+                values[name] = field.run_validation(value)
+            except serializers.ValidationError as error:
+                errors[name] = error.detail
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return values['text'], values['completed']
+
+    def validate_jsonl(self, number: int, line: str, rows: List[ImportRow], errors: List[RowError]) -> None:
+        """
+        Validate a JSONL line: a list, with its items nested. An invalid list rejects the line, an invalid item just
+        that item.
+        """
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            errors.append((number, {'line': [str(_('Not valid JSON: %(error)s') % {'error': error})]}))
+            return
+
+        if not isinstance(record, dict) or not isinstance(record.get('items', []), list):
+            errors.append((number, {'line': [str(_('Expected an object, with a list of items.'))]}))
+            return
+
+        try:
+            name = self.validate_name(record.get('name'))
+        except serializers.ValidationError as error:
+            errors.append((number, {'name': [str(message) for message in error.detail]}))
+            return
+
+        items = record.get('items', [])
+
+        if not items:
+            rows.append((number, name, None, None))
+
+        item_errors = {}
+
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise serializers.ValidationError({'item': [_('Expected an object.')]})
+
+                text, completed = self.validate_item(item.get('text', empty), item.get('completed', empty))
+            except serializers.ValidationError as error:
+                for field, messages in error.detail.items():
+                    item_errors[f'items[{index}].{field}'] = [str(message) for message in messages]
+            else:
+                rows.append((number, name, text, completed))
+
+        if item_errors:
+            errors.append((number, item_errors))
+
+    def validate_csv(self, number: int, row: Dict[str, Any], rows: List[ImportRow], errors: List[RowError]) -> None:
+        """
+        Validate a CSV row: an item, with its list's name. Rows with no item text or completed are lists without
+        items.
+        """
+        row_errors = {}
+
+        try:
+            name = self.validate_name(row.get('list_name'))
+        except serializers.ValidationError as error:
+            row_errors['list_name'] = [str(message) for message in error.detail]
+
+        text = row.get('item_text') or empty
+        completed = row.get('item_completed') or empty
+
+        if text is empty and completed is empty:
+            item = (None, None)
+        else:
+            try:
+                item = self.validate_item(text, completed)
+            except serializers.ValidationError as error:
+                row_errors.update({f'item_{field}': [str(message) for message in messages]
+                                   for field, messages in error.detail.items()})
+
+        if row_errors:
+            errors.append((number, row_errors))
+        else:
+            rows.append((number, name, *item))
+
+
+_validator: Optional[RowValidator] = None
+
+
+def validate_rows(import_format: str, raw_rows: List[RawRow]) -> Tuple[List[ImportRow], List[RowError]]:
+    """
+    Parse and validate a batch of raw rows. Run in the pool's processes, so it needs to be importable from here.
+    :param import_format: jsonl or csv
+    :param raw_rows: rows from read_rows
+    :return: valid rows, and errors of the invalid ones
+    """
+    global _validator
+
+    if _validator is None:
+        _validator = RowValidator()
+
+    rows: List[ImportRow] = []
+    errors: List[RowError] = []
+    validate = _validator.validate_csv if import_format == 'csv' else _validator.validate_jsonl
+
+    for number, raw_row in raw_rows:
+        validate(number, raw_row, rows, errors)
+
+    return rows, errors
+
+
+def insert_items(items: Dict[Tuple[int, str], bool]) -> None:
+    """
+    Insert items, skipping any that exist by now. On Postgres they're copied into a temporary table first, which is a
+    lot less work for both ends than building and parsing INSERTs, then inserted from there in one go.
+    :param items: completed flag of each item, by list pk and text
+    """
+    connection = connections[TodoItemModel.objects.db]
+
+    if connection.vendor != 'postgresql':
+        TodoItemModel.objects.bulk_create(
+            [TodoItemModel(todo_list_id=pk, text=text, completed=completed) for (pk, text), completed in items.items()],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        return
+
+    rows = io.StringIO()
+    csv.writer(rows).writerows((pk, text, completed) for (pk, text), completed in items.items())
+    rows.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TEMPORARY TABLE import_items (todo_list_id integer, text text, completed boolean)')
+        cursor.copy_expert('COPY import_items FROM STDIN WITH (FORMAT csv)', rows)
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(TodoItemModel._meta.db_table)} '
+                       '(todo_list_id, text, completed) SELECT * FROM import_items ON CONFLICT DO NOTHING')
+        cursor.execute('DROP TABLE import_items')
+
+
+class InlineExecutor(Executor):
+    """
+    Executor running everything right away in this process, for imports without a pool
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+
+        return future
+
+
+class TodoListImport:
+    """
+    An import of one input, see the module docs. Progress is kept in summary: rows read, lists and items created,
+    items skipped as duplicates (in the input, or already in the database) and rows with errors.
+    """
+
+    def __init__(self, import_format: str, checkpoint_path: Optional[str] = None, errors_path: Optional[str] = None,
+                 workers: int = 0, batch_size: int = IMPORT_BATCH_SIZE) -> None:
+        """
+        :param import_format: jsonl or csv
+        :param checkpoint_path: file to save progress to, and resume from if it exists
+        :param errors_path: file to append invalid rows to
+        :param workers: processes to validate rows in, or 0 to validate them in this one
+        :param batch_size: rows to read, validate and save at a time
+        """
+        if import_format not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown format {import_format}, use one of: {', '.join(IMPORT_FORMATS)}")
+
+        self.import_format = import_format
+        self.checkpoint_path = checkpoint_path
+        self.errors_path = errors_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.summary = {'rows': 0, 'lists_created': 0, 'items_created': 0, 'duplicates': 0, 'errors': 0}
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                self.summary.update(json.load(checkpoint_file))
+
+    def run(self, stream: TextIO) -> Dict[str, int]:
+        """
+        Import everything after the checkpoint
+        :param stream: input, opened in text mode (with newline='' for CSV)
+        :return: summary
+        """
+        batches = self._batches(read_rows(stream, self.import_format, skip=self.summary['rows']))
+
+        if self.workers:
+            # forked processes shouldn't share the parent's connections
+            connections.close_all()
+            executor: Executor = ProcessPoolExecutor(self.workers, initializer=django.setup)
+        else:
+            executor = InlineExecutor()
+
+        pending: Deque[Tuple[int, Future]] = deque()
+
+        with executor:
+            for last_row, raw_rows in batches:
+                pending.append((last_row, executor.submit(validate_rows, self.import_format, raw_rows)))
+
+                # keep the pool busy while a batch saves, without reading ahead more than that
+                if len(pending) > max(self.workers, 1):
+                    self._save(*pending.popleft())
+
+            while pending:
+                self._save(*pending.popleft())
+
+        return self.summary
+
+    def _batches(self, raw_rows: Iterator[RawRow]) -> Iterator[Tuple[int, List[RawRow]]]:
+        """
+        Group rows into batches
+        :param raw_rows: rows from read_rows
+        :return: number of each batch's last row, and its rows
+        """
+        batch: List[RawRow] = []
+
+        for raw_row in raw_rows:
+            batch.append(raw_row)
+
+            if len(batch) >= self.batch_size:
+                yield batch[-1][0], batch
+                batch = []
+
+        if batch:
+            yield batch[-1][0], batch
+
+    def _save(self, last_row: int, validated: Future) -> None:
+        """
+        Save a validated batch, then checkpoint it
+        :param last_row: number of the batch's last row
+        :param validated: validate_rows result
+        """
+        rows, errors = validated.result()
+
+        with transaction.atomic():
+            errors.extend(self._save_rows(rows))
+
+        self.summary['rows'] = last_row
+        self.summary['errors'] += len(errors)
+
+        if errors and self.errors_path:
+            with open(self.errors_path, 'a') as errors_file:
+                for number, row_errors in sorted(errors, key=lambda error: error[0]):
+                    errors_file.write(json.dumps({'row': number, 'errors': row_errors}) + '\n')
+
+        if self.checkpoint_path:
+            partial_path = f'{self.checkpoint_path}.partial'
+
+            with open(partial_path, 'w') as checkpoint_file:
+                json.dump(self.summary, checkpoint_file)
+
+            os.replace(partial_path, self.checkpoint_path)
+
+    def _save_rows(self, rows: List[ImportRow]) -> List[RowError]:
+        """
+        Save valid rows: create missing lists, insert items that aren't duplicates, and update the lists they went
+        into. Call in a transaction.
+        :param rows: valid rows
+        :return: errors of rows that couldn't be saved
+        """
+        errors: List[RowError] = []
+        list_pks, created_pks = self._get_list_pks({row[1] for row in rows})
+
+        # first one of each (list, text) pair wins, OrderedDict keeps them in input order
+        items: Dict[Tuple[int, str], bool] = OrderedDict()
+
+        for number, name, text, completed in rows:
+            if list_pks[name] is None:
+                errors.append((number, {'list_name': [str(TodoListForm.PENDING_DELETION_MESSAGE)]}))
+            elif text is not None and (list_pks[name], text) not in items:
+                items[list_pks[name], text] = completed
+            elif text is not None:
+                self.summary['duplicates'] += 1
+
+        existing = TodoItemModel.objects.filter(todo_list_id__in={pk for pk, text in items},
+                                                text__in={text for pk, text in items})
+
+        for pair in existing.values_list('todo_list_id', 'text').iterator():
+            if items.pop(pair, None) is not None:
+                self.summary['duplicates'] += 1
+
+        if items:
+            insert_items(items)
+            self.summary['items_created'] += len(items)
+
+        # Items and lists went in without model saves, so bump the lists' counters by what this batch added (existing
+        # items were filtered out above) and leave their search documents to the background refresh. Recounting or
+        # reindexing here would re-read every item imported into a list so far, on every batch.
+        count_deltas = item_count_deltas([], [(pk, completed) for (pk, text), completed in items.items()])
+        touch_todo_lists(*created_pks, *count_deltas, reindex=True, count_deltas=count_deltas)
+
+        return errors
+
+    def _get_list_pks(self, names: Iterable[str]) -> Tuple[Dict[str, Optional[int]], List[int]]:
+        """
+        Look up lists by name, creating the ones that don't exist
+        :param names: list names
+        :return: pk of each list (None for lists pending deletion), and pks of the ones created
+        """
+        names = set(names)
+        lists = TodoListModel.all_objects.filter(name__in=names)
+        found = {name: None if pending else pk for name, pk, pending in
+                 lists.values_list('name', 'pk', 'pending_deletion')}
+        missing = names - set(found)
+
+        if missing:
+            TodoListModel.objects.bulk_create([TodoListModel(name=name) for name in missing], ignore_conflicts=True)
+            # A name can also have been taken by a list created elsewhere in the meantime, which may even be pending
+            # deletion already, so this looks at every list, like the lookup above.
+            created = {name: None if pending else pk for name, pk, pending in
+                       TodoListModel.all_objects.filter(name__in=missing).values_list('name', 'pk', 'pending_deletion')}
+
+            found.update(created)
+            created_pks = [pk for pk in created.values() if pk is not None]
+            self.summary['lists_created'] += len(created_pks)
+        else:
+            created_pks = []
+
+        return found, created_pks
+
+
+def get_import_format(path: str) -> str:
+    """
+    Tell an input's format from its file name
+    :param path: input path, e.g. todo-lists.csv.gz
+    :return: jsonl or csv
+    """
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+
+    return 'csv' if name.endswith('.csv') else 'jsonl'
+
+
+def open_import(path: str) -> TextIO:
+    """
+    Open an input for reading rows, gunzipping it on the fly if its name ends in .gz
+    :param path: input path
+    :return: text stream
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+
+    return open(path, encoding='utf-8', newline='')
+
+
+def get_progress_paths(path: str) -> Tuple[str, str]:
+    """
+    Name the checkpoint and errors files of an input uploaded for a background import
+    :param path: input path
+    :return: checkpoint path, errors path
+    """
+    return f'{path}.checkpoint', f'{path}.errors.jsonl'
+
+
+def read_progress(path: str, max_errors: int = 100) -> Dict[str, Any]:
+    """
+    Read how far a background import got
+    :param path: input path
+    :param max_errors: most errors to read, from the start of the errors file
+    :return: summary (empty until the first batch is saved), and errors
+    """
+    checkpoint_path, errors_path = get_progress_paths(path)
+    progress: Dict[str, Any] = {'summary': {}, 'errors': []}
+
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            progress['summary'] = json.load(checkpoint_file)
+
+    if os.path.exists(errors_path):
+        with open(errors_path) as errors_file:
+            # a line still being written has no newline yet
+            progress['errors'] = [json.loads(line) for line in islice(errors_file, max_errors) if line.endswith('\n')]
+
+    return progress
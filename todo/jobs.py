@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Background jobs for todo app, see jobs.queue
+"""
+from typing import Dict
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+
+from jobs.queue import task
+from todo.importer import TodoListImport, get_progress_paths, open_import
+from todo.models import TodoItemModel, TodoListModel, refresh_search_documents
+
+
+@task('todo.purge_todo_list', timeout=60 * 60)
+def purge_todo_list(pk: int, chunk_size: int = 1000) -> int:
+    """
+    Delete a list pending deletion, its items a chunk at a time. Each chunk is its own short transaction, with a plain
+    DELETE (items have nothing cascading from them), so locks are only held for a chunk's rows. Safe to run for the
+    same list from more than one worker, or again after being interrupted.
+    :param pk: pk of list to delete
+    :param chunk_size: number of items to delete per transaction
+    :return: number of items deleted
+    """
+    items = TodoItemModel.objects.filter(todo_list_id=pk)
+    deleted = 0
+
+    while True:
+        chunk = list(items.order_by('id').values_list('id', flat=True)[:chunk_size])
+
+        if not chunk:
+            break
+
+        # items of a list on its way out don't touch it or its search document
+        deleted += TodoItemModel.objects.filter(id__in=chunk).delete()[0]
+
+    TodoListModel.all_objects.filter(pk=pk, pending_deletion=True).delete()
+
+    return deleted
+
+
+@task('todo.repair_todo_list_counts', timeout=60 * 60)
+def repair_todo_list_counts() -> None:
+    """
+    Recount lists whose item counters drifted, see the repair_todo_list_counts command
+    """
+    call_command('repair_todo_list_counts')
+
+
+@task('todo.rebuild_search_documents', timeout=60 * 60)
+def rebuild_search_documents() -> None:
+    """
+    Rebuild every list's search document, see the rebuild_search_documents command
+    """
+    call_command('rebuild_search_documents')
+
+
+@task('todo.refresh_search_documents', timeout=60 * 60)
+def refresh_stale_search_documents(batch_size: int = 500) -> int:
+    """
+    Rebuild the search documents of lists marked stale, see todo.models.schedule_search_refresh. A list's flag is
+    cleared in the same transaction as its rebuild, before its items are read, so an edit that lands during the
+    rebuild marks it stale again rather than getting lost.
+    :param batch_size: number of lists to rebuild per transaction
+    :return: number of lists rebuilt
+    """
+    stale = TodoListModel.all_objects.filter(search_stale=True)
+    rebuilt = 0
+
+    while True:
+        pks = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+
+        if not pks:
+            break
+
+        with transaction.atomic():
+            stale.filter(pk__in=pks).update(search_stale=False)
+            refresh_search_documents(*pks)
+
+        rebuilt += len(pks)
+
+    return rebuilt
+
+
+@task('todo.import_todo_lists', timeout=60 * 60)
+def import_todo_lists(path: str, import_format: str) -> Dict[str, int]:
+    """
+    Import an uploaded file, see todo.importer. A retried job picks up from its checkpoint.
+    :param path: input path
+    :param import_format: jsonl or csv
+    :return: import summary
+    """
+    checkpoint_path, errors_path = get_progress_paths(path)
+    todo_list_import = TodoListImport(import_format, checkpoint_path=checkpoint_path, errors_path=errors_path,
+                                      workers=settings.IMPORT_WORKERS)
+
+    with open_import(path) as stream:
+        return todo_list_import.run(stream)
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Management commands for todo app
+"""
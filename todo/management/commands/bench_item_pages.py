@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark page number vs cursor pagination of the items api
+"""
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from common.benchmarking import rolled_back, summarize, time_calls
+from todo.models import TodoItemModel
+from todo.pagination import TodoItemPagination
+from todo.seeding import seed_todo_lists
+
+
+class Command(BaseCommand):
+    """
+    Seeds one big list and times fetching pages at increasing depths with both pagination modes. Seeded data is rolled
+    back at the end.
+    """
+    help = 'Compare page number and cursor pagination latency of the items api as page depth grows.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--items', type=int, default=100000, help='number of items to seed in the list')
+        parser.add_argument('--depths', default='1,10,100,1000,5000', help='comma separated page numbers to time')
+        parser.add_argument('--repeat', type=int, default=20, help='timed requests per page')
+
+    def handle(self, *args, **options) -> None:
+        client = Client(HTTP_HOST='localhost')
+        paginator = TodoItemPagination()
+        page_size = paginator.page_size
+        url = reverse('todo:items:todoitemmodel-list')
+
+        with rolled_back():
+            list_pk = seed_todo_lists(1, options['items'], prefix='bench_item_pages')[0]
+            item_pks = list(TodoItemModel.objects.filter(todo_list_id=list_pk).order_by('id')
+                            .values_list('id', flat=True))
+
+            self.stdout.write(f"{'page':>8} {'mode':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+
+            for depth in (int(depth) for depth in options['depths'].split(',')):
+                offset = (depth - 1) * page_size
+
+                if offset >= len(item_pks):
+                    self.stdout.write(f'{depth:>8} skipped, the list only has {len(item_pks)} items')
+                    continue
+
+                cursor = paginator.encode_cursor((list_pk, item_pks[offset - 1])) if offset else ''
+
+                for mode, query in (('page', f'page={depth}'), ('cursor', f'cursor={cursor}')):
+                    timings = time_calls(lambda: client.get(f'{url}?todo_list={list_pk}&{query}'),
+                                         repeat=options['repeat'])
+                    stats = summarize(timings)
+
+                    self.stdout.write(f"{depth:>8} {mode:>8} {stats['p50']:>10.2f} {stats['p95']:>10.2f} "
+                                      f"{stats['p99']:>10.2f}")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark reading items through TodoItemSerializer vs straight from rows
+"""
+from time import perf_counter
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from common.benchmarking import rolled_back, summarize, time_calls
+from todo.models import TodoItemModel
+from todo.pagination import TodoItemPagination
+from todo.seeding import seed_todo_lists
+from todo.serializers import TODO_ITEM_ROW_COLUMNS, TodoItemSerializer, serialize_todo_item_rows
+from todo.views import TodoItemViewSet
+
+
+class Command(BaseCommand):
+    """
+    Seeds one big list, then times items api pages and the serialization of every item in the list both ways. Seeded
+    data is rolled back at the end.
+    """
+    help = 'Compare items api latency and serialization throughput with and without the values_list read path.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--items', type=int, default=20000, help='number of items to seed in the list')
+        parser.add_argument('--repeat', type=int, default=200, help='timed requests per mode')
+
+    def handle(self, *args, **options) -> None:
+        client = Client(HTTP_HOST='localhost')
+        url = reverse('todo:items:todoitemmodel-list')
+
+        with rolled_back():
+            list_pk = seed_todo_lists(1, options['items'], prefix='bench_item_reads')[0]
+            items = TodoItemModel.objects.filter(todo_list_id=list_pk)
+
+            self.stdout.write(f"page of {TodoItemPagination.page_size or 'all'} items")
+            self.stdout.write(f"{'mode':>12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+
+            for mode, read_rows in (('serializer', False), ('rows', True)):
+                with patch.object(TodoItemViewSet, 'read_rows', read_rows):
+                    stats = summarize(time_calls(lambda: client.get(url, {'todo_list': list_pk, 'cursor': ''}),
+                                                 repeat=options['repeat']))
+
+                self.stdout.write(f"{mode:>12} {stats['p50']:>10.2f} {stats['p95']:>10.2f} {stats['p99']:>10.2f}")
+
+            self.stdout.write(f"\nall {options['items']} items, query included")
+
+            for mode, serialize in (
+                    ('serializer', lambda: TodoItemSerializer(items, many=True).data),
+                    ('rows', lambda: serialize_todo_item_rows(items.values_list(*TODO_ITEM_ROW_COLUMNS.values()))),
+            ):
+                start = perf_counter()
+                serialize()
+                seconds = perf_counter() - start
+
+                self.stdout.write(f'{mode:>12} {seconds * 1000:>10.2f} ms {options["items"] / seconds:>12.0f} items/s')
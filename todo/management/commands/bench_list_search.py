@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark searching todo lists by name
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from common.benchmarking import rolled_back, summarize, time_calls
+from todo.models import TodoListModel
+from todo.search import has_trigram_support, search_lists_by_name
+from todo.seeding import seed_todo_lists
+
+
+class Command(BaseCommand):
+    """
+    Seeds lists and times the ranked name search against a plain unranked icontains scan. Seeded data is rolled back
+    at the end.
+    """
+    help = 'Time ranked todo list name search over seeded lists.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--lists', type=int, default=1000000, help='number of lists to seed')
+        parser.add_argument('--terms', default='list 123456,99999,4242', help='comma separated search terms')
+        parser.add_argument('--limit', type=int, default=50, help='results to fetch per search, like one page')
+        parser.add_argument('--repeat', type=int, default=20, help='timed searches per term')
+
+    def handle(self, *args, **options) -> None:
+        with rolled_back():
+            seed_todo_lists(options['lists'], prefix='bench_list_search')
+
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {TodoListModel._meta.db_table}')
+
+            self.stdout.write(f"trigram index: {'yes' if has_trigram_support(connection.alias) else 'no'}")
+            self.stdout.write(f"{'term':>16} {'query':>10} {'matches':>8} {'p50 ms':>10} {'p95 ms':>10}")
+
+            limit = options['limit']
+
+            for term in options['terms'].split(','):
+                queries = (
+                    ('icontains', lambda: list(TodoListModel.objects.filter(name__icontains=term)[:limit])),
+                    ('ranked', lambda: list(search_lists_by_name(TodoListModel.objects.all(), term)[:limit])),
+                )
+
+                for name, query in queries:
+                    matches = len(query())
+                    stats = summarize(time_calls(query, repeat=options['repeat']))
+
+                    self.stdout.write(f"{term:>16} {name:>10} {matches:>8} {stats['p50']:>10.2f} "
+                                      f"{stats['p95']:>10.2f}")
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark rendering the todo list table with and without the row cache
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from common.benchmarking import rolled_back, summarize, time_calls
+from todo.models import TodoListModel
+from todo.row_cache import get_row_cache, stats
+from todo.seeding import seed_todo_lists
+
+
+class Command(BaseCommand):
+    """
+    Seeds lists and times rendering list_table.html for them with row caching off, with a cold cache and with a warm
+    one. Only rendering gets timed, the lists are loaded once up front. Seeded data is rolled back at the end.
+    """
+    help = 'Time rendering the todo list table with and without the row cache.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--lists', type=int, default=1000, help='number of lists to seed and render')
+        parser.add_argument('--repeat', type=int, default=20, help='timed renders per mode')
+
+    def handle(self, *args, **options) -> None:
+        cache = get_row_cache()
+
+        if cache is None:
+            raise CommandError('Row caching is turned off, set TODO_ROW_CACHE to a cache alias to benchmark it.')
+
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+
+        with rolled_back():
+            seed_todo_lists(options['lists'], prefix='bench_list_table')
+            todo_lists = list(TodoListModel.objects.filter(name__startswith='bench_list_table'))
+            context = {'object_list': todo_lists, 'request': request}
+
+            def render() -> str:
+                return render_to_string('todo/list_table.html', context)
+
+            with override_settings(TODO_ROW_CACHE=None):
+                uncached = summarize(time_calls(render, repeat=options['repeat']))
+
+            def render_cold() -> str:
+                cache.clear()
+                return render()
+
+            cold = summarize(time_calls(render_cold, repeat=options['repeat']))
+
+            stats.reset()
+            warm = summarize(time_calls(render, repeat=options['repeat']))
+
+            self.stdout.write(f"{'mode':>10} {'p50 ms':>10} {'p95 ms':>10}")
+            for mode, timings in (('no cache', uncached), ('cold', cold), ('warm', warm)):
+                self.stdout.write(f"{mode:>10} {timings['p50']:>10.2f} {timings['p95']:>10.2f}")
+
+            self.stdout.write(f'warm cache stats: {stats.as_dict()}')
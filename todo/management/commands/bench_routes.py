@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark every route, under both class-based and function-based views
+"""
+import io
+import json
+from contextlib import contextmanager, redirect_stdout
+from importlib import import_module, reload
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, clear_url_caches, get_resolver, reverse
+
+from common.benchmarking import rolled_back, summarize, timed_queries
+from todo.models import TodoItemModel, refresh_search_documents
+from todo.seeding import seed_todo_lists
+
+VIEW_TYPES = ('CBV', 'FBV')
+
+# url confs that pick their routes based on VIEW_TYPES, reloaded in this order when it changes
+VIEW_TYPE_URLCONFS = ('common.urls', 'todo.urls')
+
+# namespaces of the routes to benchmark
+NAMESPACES = ('common', 'todo')
+
+# Query strings to request routes with, on top of requesting them bare. {list} is the pk of a seeded list.
+VARIANTS = {
+    'todo:items:todoitemmodel-list': ['todo_list={list}', 'todo_list={list}&cursor='],
+    'todo:list_and_filter_todo_lists': ['load=1', 'name=list+1'],
+    'todo:list_todo_lists': ['name=list+1'],
+    'todo:search_lists_api': ['q=item'],
+}
+
+Endpoint = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+@contextmanager
+def view_types(mode: str) -> Iterator[None]:
+    """
+    Route requests to class-based or function-based views for the length of the block
+    :param mode: CBV or FBV
+    """
+    try:
+        with override_settings(VIEW_TYPES=mode):
+            _reload_urlconfs()
+
+            yield
+    finally:
+        _reload_urlconfs()
+
+
+def _reload_urlconfs() -> None:
+    """
+    Re-import the url confs so they pick their routes again, and drop the cached resolvers built from them
+    """
+    # todo.urls announces which view types it's using when it gets imported
+    with redirect_stdout(io.StringIO()):
+        for urlconf in VIEW_TYPE_URLCONFS + (settings.ROOT_URLCONF,):
+            reload(import_module(urlconf))
+
+    clear_url_caches()
+
+
+def named_routes(resolver: URLResolver, namespace: str = '') -> Iterator[Tuple[str, URLPattern]]:
+    """
+    Walk a resolver for every named route
+    :param resolver: url resolver to walk
+    :param namespace: namespace prefix of the resolver's routes
+    :return: full route names and their patterns
+    """
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from named_routes(pattern, f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}', pattern
+
+
+class Command(BaseCommand):
+    """
+    Seeds lists and items, then requests every named route in the common and todo url confs (with a few query string
+    variants, and a bulk api POST) under each view type. Requests run in-process through the test client, so this
+    measures the django side only. Seeded data is rolled back at the end.
+    """
+    help = 'Time every route under class-based and function-based views, optionally writing the results as JSON.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--lists', type=int, default=200, help='number of lists to seed')
+        parser.add_argument('--items', type=int, default=50, help='number of items to seed per list')
+        parser.add_argument('--requests', type=int, default=50, help='timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='untimed requests per endpoint, made first')
+        parser.add_argument('--modes', default=','.join(VIEW_TYPES), help='comma separated view types to run')
+        parser.add_argument('--label', default='', help='label for this run in the JSON output, e.g. a commit')
+        parser.add_argument('--json', dest='json_path', help="file to write JSON results to, '-' for stdout")
+
+    def handle(self, *args, **options) -> None:
+        modes = options['modes'].split(',')
+
+        for mode in modes:
+            if mode not in VIEW_TYPES:
+                raise CommandError(f"Unknown view type {mode}, expected one of: {', '.join(VIEW_TYPES)}")
+
+        results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+        # the test client's host, since ALLOWED_HOSTS isn't relaxed for it outside of tests
+        with rolled_back(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            list_pks = seed_todo_lists(options['lists'], options['items'], prefix='bench_routes')
+
+            if not list_pks:
+                raise CommandError('Seed at least one list.')
+
+            refresh_search_documents(*list_pks)
+
+            # a list from the middle, so it's not a best or worst case for anything
+            list_pk = list_pks[len(list_pks) // 2]
+            item_pk = TodoItemModel.objects.filter(todo_list_id=list_pk).values_list('pk', flat=True).first()
+
+            for mode in modes:
+                with view_types(mode):
+                    results[mode] = {
+                        label: self.measure(method, url, body, options['requests'], options['warmup'])
+                        for label, (method, url, body) in self.endpoints(list_pk, item_pk)
+                    }
+
+        report = {
+            'label': options['label'],
+            'vendor': connection.vendor,
+            'lists': options['lists'],
+            'items_per_list': options['items'],
+            'requests': options['requests'],
+            'results': results,
+        }
+
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.write_table(results)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as json_file:
+                json.dump(report, json_file, indent=2)
+
+    @staticmethod
+    def endpoints(list_pk: int, item_pk: Optional[int]) -> Iterator[Tuple[str, Endpoint]]:
+        """
+        Build the requests to time, from the routes currently in place
+        :param list_pk: pk of a seeded list, for routes that take one
+        :param item_pk: pk of one of its items, for item routes
+        :return: labels, and the method, url and body of each request
+        """
+        for name, pattern in named_routes(get_resolver()):
+            if name.split(':')[0] not in NAMESPACES:
+                continue
+
+            params = set(pattern.pattern.regex.groupindex)
+            if params - {'pk'}:
+                # format suffix routes, they're the same views
+                continue
+
+            actions = getattr(pattern.callback, 'actions', None)
+            if actions is not None and 'get' not in actions:
+                continue
+
+            if item_pk is None and name.startswith('todo:items:') and params:
+                continue
+
+            kwargs = {'pk': item_pk if name.startswith('todo:items:') else list_pk} if params else {}
+            url = reverse(name, kwargs=kwargs)
+
+            yield f'GET {name}', ('GET', url, None)
+
+            for query in VARIANTS.get(name, []):
+                query = query.format(list=list_pk)
+
+                yield f'GET {name}?{query}', ('GET', f'{url}?{query}', None)
+
+        if item_pk is not None:
+            body = {'operations': [{'op': 'update', 'pk': item_pk, 'data': {'completed': True}}]}
+
+            yield 'POST todo:items:todoitemmodel-bulk', ('POST', reverse('todo:items:todoitemmodel-bulk'), body)
+
+    @staticmethod
+    def measure(method: str, url: str, body: Optional[Dict[str, Any]], requests: int, warmup: int) -> Dict[str, Any]:
+        """
+        Time requests to one endpoint
+        :param method: http method
+        :param url: url to request
+        :param body: json body, for POSTs
+        :param requests: number of timed requests
+        :param warmup: number of untimed requests to make first
+        :return: latency percentiles (ms), throughput (requests per second), queries and sql time (ms) per request,
+            and the status codes seen
+        """
+        client = Client()
+
+        def request() -> HttpResponse:
+            if method == 'POST':
+                response = client.post(url, data=json.dumps(body), content_type='application/json')
+            else:
+                response = client.get(url)
+
+            if response.streaming:
+                # streamed pages do their rendering, and most of their queries, while they're read
+                b''.join(response.streaming_content)
+
+            return response
+
+        for _ in range(warmup):
+            request()
+
+        timings: List[float] = []
+        statuses = set()
+
+        with timed_queries() as timer:
+            for _ in range(requests):
+                start = perf_counter()
+                statuses.add(request().status_code)
+                timings.append(perf_counter() - start)
+
+        stats = summarize(timings)
+
+        return {
+            'status': sorted(statuses),
+            'p50': stats['p50'],
+            'p95': stats['p95'],
+            'p99': stats['p99'],
+            'rps': len(timings) / sum(timings),
+            'queries': timer.count / requests,
+            'sql_ms': timer.seconds * 1000 / requests,
+        }
+
+    def write_table(self, results: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+        """
+        Write results as a table
+        :param results: results per view type, per endpoint
+        """
+        width = max(len(label) for endpoints in results.values() for label in endpoints)
+
+        self.stdout.write(f"{'mode':<4} {'endpoint':<{width}} {'status':>7} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'req/s':>8} {'queries':>8} {'sql ms':>8}")
+
+        for mode, endpoints in results.items():
+            for label, result in endpoints.items():
+                status = ','.join(str(code) for code in result['status'])
+
+                self.stdout.write(f"{mode:<4} {label:<{width}} {status:>7} {result['p50']:>8.2f} "
+                                  f"{result['p95']:>8.2f} {result['p99']:>8.2f} {result['rps']:>8.1f} "
+                                  f"{result['queries']:>8.1f} {result['sql_ms']:>8.2f}")
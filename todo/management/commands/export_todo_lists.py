@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Export todo lists and their items
+"""
+import sys
+
+from django.core.management.base import BaseCommand
+
+from todo.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_todo_lists
+
+
+class Command(BaseCommand):
+    """
+    Writes every list and its items out as JSONL or CSV, streamed straight from a database cursor, so memory use
+    stays flat however much there is. See todo.export.
+    """
+    help = 'Export every todo list and its items as JSONL or CSV.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='jsonl', help='export format')
+        parser.add_argument('--gzip', action='store_true', help='gzip the export')
+        parser.add_argument('--output', default='-', help='file to write the export to, or - for stdout')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='number of rows to fetch per round trip from the database')
+        parser.add_argument('--database', default=None, help='database to read from')
+
+    def handle(self, *args, **options) -> None:
+        chunks = export_todo_lists(options['format'], options['gzip'], using=options['database'],
+                                   chunk_size=options['chunk_size'])
+
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+
+        self.stdout.write(f"Exported to {options['output']}.")
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Import todo lists and their items
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, TodoListImport, get_import_format, open_import
+
+
+class Command(BaseCommand):
+    """
+    Reads lists and items from JSONL or CSV, as written by export_todo_lists, validating rows in a pool of processes
+    and inserting them in batches. With --checkpoint, an interrupted import picks up where it left off when run again.
+    See todo.importer.
+    """
+    help = 'Import todo lists and their items from JSONL or CSV.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('path', help='file to import, gunzipped on the fly if it ends in .gz')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, default=None,
+                            help='import format, by default told from the file name')
+        parser.add_argument('--workers', type=int, default=settings.IMPORT_WORKERS,
+                            help='number of processes to validate rows in, or 0 to validate them in this one')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='number of rows to validate and save at a time')
+        parser.add_argument('--checkpoint', default=None, help='file to save progress to, and resume from')
+        parser.add_argument('--errors', default=None, help='file to append invalid rows to, as JSONL')
+
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size needs to be at least 1.')
+
+        todo_list_import = TodoListImport(options['format'] or get_import_format(options['path']),
+                                          checkpoint_path=options['checkpoint'], errors_path=options['errors'],
+                                          workers=options['workers'], batch_size=options['batch_size'])
+
+        try:
+            with open_import(options['path']) as stream:
+                summary = todo_list_import.run(stream)
+        except OSError as error:
+            raise CommandError(error)
+
+        self.stdout.write(json.dumps(summary))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Delete todo lists marked for deletion
+"""
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from todo.jobs import purge_todo_list
+from todo.models import TodoListModel
+
+
+class Command(BaseCommand):
+    """
+    Works through the lists marked for deletion (see TodoListModel.mark_for_deletion), in pk order. Marking a list
+    queues a job that deletes it, so this is for deleting lists without run_jobs, or any whose jobs gave up. A list
+    whose purge got interrupted just gets picked up again. With --loop, keeps checking for newly marked lists instead
+    of stopping once there are none.
+    """
+    help = 'Delete todo lists marked for deletion, and their items, in chunks.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of items to delete per transaction')
+        parser.add_argument('--loop', action='store_true', help='keep checking for lists to delete')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='seconds to wait before checking again, once there are no lists left to delete')
+
+    def handle(self, *args, **options) -> None:
+        while True:
+            pks = list(TodoListModel.all_objects.filter(pending_deletion=True).order_by('pk')
+                       .values_list('pk', flat=True))
+
+            for pk in pks:
+                deleted = purge_todo_list(pk=pk, chunk_size=options['chunk_size'])
+
+                self.stdout.write(f'Deleted list {pk} and {deleted} items.')
+
+            if not options['loop']:
+                break
+
+            if not pks:
+                sleep(options['interval'])
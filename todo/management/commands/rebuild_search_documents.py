@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Rebuild todo list search documents
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from todo.models import TodoListModel, refresh_search_documents
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds search documents from scratch, in batches of lists. Needed once for lists that existed before search
+    documents did, or for lists created in bulk without going through model saves.
+    """
+    help = 'Rebuild the full-text search documents of todo lists.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--batch-size', type=int, default=500, help='number of lists to rebuild per transaction')
+
+    def handle(self, *args, **options) -> None:
+        pks = list(TodoListModel.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                refresh_search_documents(*pks[start:start + batch_size])
+
+        self.stdout.write(f'Rebuilt search documents for {len(pks)} lists.')
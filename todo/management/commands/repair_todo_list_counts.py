@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Check and repair todo list item counters
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from todo.models import TodoListModel
+
+
+class Command(BaseCommand):
+    """
+    Counts every list's items and compares that to its item_count/completed_count. The counters are maintained as
+    items change, but writes that skip model saves and the bulk endpoint (raw SQL, QuerySet.update, bulk_create
+    elsewhere) can make them drift. Drifted lists get recounted in batches, unless --check is passed.
+    """
+    help = 'Find todo lists whose item counters drifted from their items, and recount them.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--check', action='store_true', help='only report drifted lists, without fixing them')
+        parser.add_argument('--batch-size', type=int, default=500, help='number of lists to recount per transaction')
+
+    def handle(self, *args, **options) -> None:
+        drifted = TodoListModel.objects.with_actual_counts().exclude(
+            item_count=F('actual_item_count'), completed_count=F('actual_completed_count'),
+        ).order_by('pk').values_list('pk', 'name', 'item_count', 'actual_item_count', 'completed_count',
+                                     'actual_completed_count')
+
+        pks = []
+        for pk, name, item_count, actual_item_count, completed_count, actual_completed_count in drifted.iterator():
+            pks.append(pk)
+
+            self.stdout.write(f'{name} (pk {pk}): {item_count} items, {completed_count} completed recorded, '
+                              f'{actual_item_count} items, {actual_completed_count} completed counted')
+
+        if options['check'] or not pks:
+            self.stdout.write(f'{len(pks)} lists have drifted counters.')
+            return
+
+        batch_size = options['batch_size']
+
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                TodoListModel.objects.filter(pk__in=pks[start:start + batch_size]).recount()
+
+        self.stdout.write(f'Recounted {len(pks)} lists.')
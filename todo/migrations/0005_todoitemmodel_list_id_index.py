@@ -0,0 +1,16 @@
+# Generated by Django 2.2.28 on 2026-10-17 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0004_todoitemmodel_completed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todoitemmodel',
+            index=models.Index(fields=['todo_list', 'id'], name='todo_item_list_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-17 19:40
+
+from django.db import migrations
+
+INDEX_NAME = 'todo_list_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor) -> None:
+    """
+    Add a pg_trgm GIN index backing name__icontains. Only Postgres has it, and the extension has to be available.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # icontains compares UPPER("name"::text), so the index has to be on the same expression to get used.
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON todo_todolistmodel '
+                          f'USING gin ((UPPER(name::text)) gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor) -> None:
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0005_todoitemmodel_list_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
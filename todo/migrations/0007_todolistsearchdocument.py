@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-17 19:24
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDEX_NAME = 'todo_search_vector_idx'
+
+
+def create_search_vector_index(apps, schema_editor) -> None:
+    """
+    Add a GIN index on the search vector. Only Postgres fills search vectors in, so only Postgres gets the index.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON todo_todolistsearchdocument '
+                              f'USING gin (search_vector)')
+
+
+def drop_search_vector_index(apps, schema_editor) -> None:
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0006_todolistmodel_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoListSearchDocument',
+            fields=[
+                ('todo_list',
+                 models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                      related_name='search_document', serialize=False, to='todo.TodoListModel')),
+                ('document', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_vector_index, drop_search_vector_index),
+    ]
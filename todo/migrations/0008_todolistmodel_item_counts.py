@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-17 20:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_items(apps, schema_editor) -> None:
+    """
+    Fill in the counters for lists that already have items
+    """
+    TodoListModel = apps.get_model('todo', 'TodoListModel')
+    TodoItemModel = apps.get_model('todo', 'TodoItemModel')
+
+    items = TodoItemModel.objects.filter(todo_list=OuterRef('pk')).order_by().values('todo_list')
+    item_count = items.annotate(count=Count('pk')).values('count')
+    completed_count = items.filter(completed=True).annotate(count=Count('pk')).values('count')
+
+    TodoListModel.objects.update(
+        item_count=Coalesce(Subquery(item_count, output_field=models.IntegerField()), 0),
+        completed_count=Coalesce(Subquery(completed_count, output_field=models.IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0007_todolistsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolistmodel',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='todolistmodel',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_items, migrations.RunPython.noop),
+    ]
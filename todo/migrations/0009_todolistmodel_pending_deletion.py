@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-17 20:40
+
+import django.db.models.manager
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0008_todolistmodel_item_counts'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='todolistmodel',
+            options={'base_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='todolistmodel',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='todolistmodel',
+            name='pending_deletion',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='todolistmodel',
+            index=models.Index(condition=models.Q(pending_deletion=True), fields=['pending_deletion'],
+                               name='todo_list_pending_deletion_idx'),
+        ),
+    ]
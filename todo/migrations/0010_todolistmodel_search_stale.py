@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('todo', '0009_todolistmodel_pending_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolistmodel',
+            name='search_stale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='todolistmodel',
+            index=models.Index(condition=models.Q(search_stale=True), fields=['search_stale'],
+                               name='todo_list_search_stale_idx'),
+        ),
+    ]
@@ -2,10 +2,108 @@
 """
 models for todo app
 """
-from django.db import models
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from time import monotonic
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
+from jobs.queue import enqueue
+
+# text search config used for search documents
+SEARCH_CONFIG = 'english'
+
+# Postgres caps a tsvector at 1MB, so really long lists only get the start of their items indexed
+SEARCH_DOCUMENT_MAX_LENGTH = 500000
+
+# pks of lists whose touches and reindexes are being held back by deferred_todo_list_touches, per thread
+_deferred_touches = threading.local()
+
+# when this process last queued a search document refresh, see schedule_search_refresh
+_search_refresh_queued_at: Optional[float] = None
+
+# changes to a list's (item_count, completed_count)
+CountDelta = Tuple[int, int]
+
+
+class TodoListQuerySet(models.QuerySet):
+    """
+    Queryset for todo lists
+    """
+
+    def touch(self, items: int = 0, completed: int = 0, search_stale: bool = False) -> int:
+        """
+        Bump last_updated with a single targeted UPDATE, without loading the lists or rewriting their other columns.
+        Item counters get adjusted in the same UPDATE, relative to whatever is in the row at the time, so concurrent
+        changes don't overwrite each other.
+        :param items: change to item_count
+        :param completed: change to completed_count
+        :param search_stale: whether to mark the lists' search documents for rebuilding too
+        :return: number of lists touched
+        """
+        values = {'last_updated': timezone.now()}
+
+        if search_stale:
+            values['search_stale'] = True
+
+        if items:
+            values['item_count'] = models.F('item_count') + items
+
+        if completed:
+            values['completed_count'] = models.F('completed_count') + completed
+
+        return self.update(**values)
+
+    def with_actual_counts(self) -> 'TodoListQuerySet':
+        """
+        Annotate lists with their item counters as counted from the items table, as actual_item_count and
+        actual_completed_count. That's a subquery per list, so it's for checking the counters, not for listings.
+        :return: annotated queryset
+        """
+        return self.annotate(**{f'actual_{field}': expression for field, expression in _counted_items().items()})
+
+    def recount(self) -> int:
+        """
+        Reset item counters to what the items table says, with a single UPDATE
+        :return: number of lists recounted
+        """
+        return self.update(**_counted_items())
+
+
+class TodoListManager(models.Manager.from_queryset(TodoListQuerySet)):
+    """
+    Manager for todo lists, leaving out lists pending deletion
+    """
+
+    def get_queryset(self) -> TodoListQuerySet:
+        return super().get_queryset().filter(pending_deletion=False)
+
+
+def _counted_items() -> Dict[str, models.Expression]:
+    """
+    Build expressions counting a list's items, to compare or reset the counters with
+    :return: expressions for item_count and completed_count
+    """
+    items = TodoItemModel.objects.filter(todo_list=models.OuterRef('pk')).order_by().values('todo_list')
+
+    def count(queryset: models.QuerySet) -> models.Expression:
+        counted = queryset.annotate(count=models.Count('pk')).values('count')
+
+        return Coalesce(models.Subquery(counted, output_field=models.IntegerField()), 0)
+
+    return {
+        'item_count': count(items),
+        'completed_count': count(items.filter(completed=True)),
+    }
+
 
 class TodoListModel(models.Model):
     """
@@ -14,6 +112,65 @@ class TodoListModel(models.Model):
     name = models.CharField(verbose_name=_('list name'), max_length=200, unique=True)
     created = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # Maintained as items change, so listings can show them without counting. repair_todo_list_counts fixes drift.
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    completed_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set by mark_for_deletion. Pending lists are left out of objects, so they're gone as far as users can tell, until
+    # they get deleted for real in the background.
+    pending_deletion = models.BooleanField(default=False, editable=False)
+    # Set when the name or items change, so the search document gets rebuilt in the background (see
+    # schedule_search_refresh), once for a burst of changes instead of on every one of them.
+    search_stale = models.BooleanField(default=False, editable=False)
+
+    objects = TodoListManager()
+    # every list, including ones pending deletion
+    all_objects = TodoListQuerySet.as_manager()
+
+    class Meta:
+        # so items can still get to their list while it's pending deletion
+        base_manager_name = 'all_objects'
+        indexes = [
+            # backs purge_todo_lists looking for lists to delete, without indexing every other list
+            models.Index(fields=['pending_deletion'], condition=models.Q(pending_deletion=True),
+                         name='todo_list_pending_deletion_idx'),
+            # backs the search document refresh looking for stale lists
+            models.Index(fields=['search_stale'], condition=models.Q(search_stale=True),
+                         name='todo_list_search_stale_idx'),
+        ]
+
+    # Annotated by full_text_search_lists. The default saves templates an expensive failed lookup on every other list.
+    headline: Optional[str] = None
+
+    def save(self, **kwargs) -> None:
+        """
+        Keep the search document in line with the name, marking it stale in the same write
+        :param kwargs: kwargs to pass on to regular save
+        """
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or 'name' in update_fields
+
+        if reindex:
+            self.search_stale = True
+
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_stale'}
+
+        super().save(**kwargs)
+
+        if reindex:
+            schedule_search_refresh()
+
+    def mark_for_deletion(self) -> None:
+        """
+        Hide the list right away, and queue a job deleting it (see todo.jobs.purge_todo_list). Deleting a list with
+        many items in one go loads every item pk and deletes them all in one long transaction, which the job does in
+        chunks instead.
+        """
+        with transaction.atomic():
+            TodoListModel.all_objects.filter(pk=self.pk).update(pending_deletion=True)
+            enqueue('todo.purge_todo_list', pk=self.pk)
+
+        self.pending_deletion = True
 
     def get_absolute_url(self) -> str:
         """
@@ -37,18 +194,250 @@ class TodoItemModel(models.Model):
     class Meta:
         ordering = ('id',)
         unique_together = ('todo_list', 'text')
+        indexes = [
+            # backs keyset pagination of a list's items
+            models.Index(fields=['todo_list', 'id'], name='todo_item_list_id_idx'),
+        ]
+
+    # fields whose loaded values get remembered, since their lists' search documents and counters depend on them
+    tracked_fields = ('todo_list_id', 'text', 'completed')
+
+    @classmethod
+    def from_db(cls, db, field_names, values) -> 'TodoItemModel':
+        """
+        Remember the loaded values that the parent list cares about, so saves can tell what changed.
+        """
+        instance = super().from_db(db, field_names, values)
+
+        instance._loaded_values = {field: instance.__dict__[field] for field in cls.tracked_fields
+                                   if field in instance.__dict__}
+
+        return instance
 
     def save(self, **kwargs) -> 'TodoItemModel':
         """
-        Ensure we save TodoListModel for last_edited field
+        Ensure we touch TodoListModel for last_updated field and counters, and mark its search document stale when the
+        text it's built from changes
         :param kwargs: kwargs to pass on to regular save
         :return: saved instance
         """
+        adding = self._state.adding
+        loaded = getattr(self, '_loaded_values', {})
+        update_fields = kwargs.get('update_fields')
+
         instance = super().save(**kwargs)
 
-        self.todo_list.save()
+        if adding:
+            touch_todo_lists(self.todo_list_id, reindex=True,
+                             count_deltas={self.todo_list_id: (1, int(self.completed))})
+
+            self._loaded_values = {field: getattr(self, field) for field in self.tracked_fields}
+        else:
+            # fields left out of update_fields didn't get written, so the row still has the loaded values for them
+            new = {field: getattr(self, field) if self._is_saved_field(field, update_fields)
+                   else loaded.get(field, getattr(self, field)) for field in self.tracked_fields}
+            old = {field: loaded.get(field, new[field]) for field in self.tracked_fields}
+
+            count_deltas = item_count_deltas([(old['todo_list_id'], old['completed'])],
+                                             [(new['todo_list_id'], new['completed'])])
+            reindex = old['todo_list_id'] != new['todo_list_id'] or old['text'] != new['text']
+
+            touch_todo_lists(old['todo_list_id'], new['todo_list_id'], reindex=reindex, count_deltas=count_deltas)
+
+            self._loaded_values = new
 
         return instance
 
+    @staticmethod
+    def _is_saved_field(field: str, update_fields: Optional[Iterable[str]]) -> bool:
+        """
+        Check if a save writes a field
+        :param field: field name or attname
+        :param update_fields: update_fields passed to save
+        :return: whether the field gets written
+        """
+        return update_fields is None or bool({field, field.replace('_id', '')} & set(update_fields))
+
+    def delete(self, **kwargs):
+        """
+        Ensure we touch TodoListModel for last_updated field and counters, and mark its search document stale
+        :param kwargs: kwargs to pass on to regular delete
+        :return: number of deleted objects
+        """
+        deleted = super().delete(**kwargs)
+
+        touch_todo_lists(self.todo_list_id, reindex=True,
+                         count_deltas={self.todo_list_id: (-1, -int(self.completed))})
+
+        return deleted
+
     def __str__(self) -> str:
         return self.text
+
+
+class TodoListSearchDocument(models.Model):
+    """
+    Full-text search document for a todo list, built from its name and the text of its items. Rebuilt in the
+    background after either changes, see schedule_search_refresh.
+    """
+    todo_list = models.OneToOneField(TodoListModel, primary_key=True, on_delete=models.CASCADE,
+                                     related_name='search_document')
+    document = models.TextField(blank=True)
+    # Only filled in on Postgres, where it's backed by a GIN index. Other databases search the document directly.
+    search_vector = SearchVectorField(null=True)
+
+    def __str__(self) -> str:
+        return str(self.todo_list_id)
+
+
+def refresh_search_documents(*pks: int) -> None:
+    """
+    Rebuild the search documents of todo lists. The name is weighted above the item text on Postgres, so matching a
+    list by name ranks higher than matching one of its items.
+    :param pks: pks of lists to rebuild
+    """
+    names: Dict[int, str] = dict(TodoListModel.objects.filter(pk__in=pks).values_list('pk', 'name'))
+
+    if not names:
+        return
+
+    texts: Dict[int, List[str]] = defaultdict(list)
+    items = TodoItemModel.objects.filter(todo_list_id__in=names).order_by('todo_list_id', 'id')
+    for todo_list_pk, text in items.values_list('todo_list_id', 'text').iterator():
+        texts[todo_list_pk].append(text)
+
+    is_postgres = connections[TodoListSearchDocument.objects.db].vendor == 'postgresql'
+
+    for todo_list_pk, name in names.items():
+        item_text = '\n'.join(texts[todo_list_pk])[:SEARCH_DOCUMENT_MAX_LENGTH]
+        values = {'document': f'{name}\n{item_text}' if item_text else name}
+
+        if is_postgres:
+            values['search_vector'] = (
+                SearchVector(models.Value(name, output_field=models.TextField()), config=SEARCH_CONFIG, weight='A')
+                + SearchVector(models.Value(item_text, output_field=models.TextField()), config=SEARCH_CONFIG,
+                               weight='B')
+            )
+
+        if not TodoListSearchDocument.objects.filter(todo_list_id=todo_list_pk).update(**values):
+            TodoListSearchDocument.objects.create(todo_list_id=todo_list_pk, **values)
+
+
+def item_count_deltas(removed: Iterable[Tuple[int, bool]], added: Iterable[Tuple[int, bool]]) \
+        -> Dict[int, CountDelta]:
+    """
+    Work out how lists' counters change when items leave and join them
+    :param removed: (todo list pk, completed) of items leaving lists, or the state items were in before an update
+    :param added: (todo list pk, completed) of items joining lists, or the state items are in after an update
+    :return: (item_count, completed_count) changes per list pk, leaving out lists that end up unchanged
+    """
+    deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+
+    for sign, items in ((-1, removed), (1, added)):
+        for todo_list_pk, completed in items:
+            deltas[todo_list_pk][0] += sign
+            deltas[todo_list_pk][1] += sign * int(completed)
+
+    return {pk: (items, completed) for pk, (items, completed) in deltas.items() if items or completed}
+
+
+def touch_todo_lists(*pks: int, reindex: bool = False, count_deltas: Optional[Dict[int, CountDelta]] = None) -> None:
+    """
+    Bump last_updated on todo lists. Inside deferred_todo_list_touches, the touches get held back and merged instead.
+    :param pks: pks of lists to touch
+    :param reindex: whether the lists' search documents need rebuilding too, which marks them stale in the same
+        UPDATE
+    :param count_deltas: changes to make to lists' (item_count, completed_count), by list pk. Those lists get
+        touched too.
+    """
+    count_deltas = count_deltas or {}
+    pending = getattr(_deferred_touches, 'pks', None)
+
+    if pending is not None:
+        pending.update(pks)
+
+        for pk, (items, completed) in count_deltas.items():
+            pending_items, pending_completed = _deferred_touches.count_deltas.get(pk, (0, 0))
+            _deferred_touches.count_deltas[pk] = (pending_items + items, pending_completed + completed)
+
+        if reindex:
+            _deferred_touches.reindex_pks.update(pks)
+    else:
+        _apply_touches(set(pks), count_deltas, set(pks) if reindex else set())
+
+
+def _apply_touches(pks: Iterable[int], count_deltas: Dict[int, CountDelta], stale_pks: Iterable[int]) -> None:
+    """
+    Touch lists, adjusting their counters and marking their search documents stale as it goes. Lists getting the
+    same adjustment share an UPDATE, so plain touches still only take one.
+    :param pks: pks of lists to touch
+    :param count_deltas: changes to make to lists' (item_count, completed_count), by list pk
+    :param stale_pks: pks of lists whose search documents need rebuilding
+    """
+    stale_pks = set(stale_pks)
+    groups: Dict[Tuple[CountDelta, bool], List[int]] = defaultdict(list)
+
+    for pk in set(pks) | set(count_deltas) | stale_pks:
+        groups[count_deltas.get(pk, (0, 0)), pk in stale_pks].append(pk)
+
+    for ((items, completed), search_stale), group in groups.items():
+        TodoListModel.objects.filter(pk__in=group).touch(items=items, completed=completed, search_stale=search_stale)
+
+    if stale_pks:
+        schedule_search_refresh()
+
+
+def schedule_search_refresh() -> None:
+    """
+    Queue a todo.refresh_search_documents job, once the current transaction commits, to rebuild the search documents
+    of stale lists. The job runs settings.SEARCH_REFRESH_DELAY seconds after it's queued, and a process doesn't queue
+    another one until then, since the one that's waiting to run picks up every list marked stale before it does. That
+    way a burst of edits to a list costs one rebuild, rather than one per edit.
+    """
+    transaction.on_commit(_queue_search_refresh)
+
+
+def _queue_search_refresh() -> None:
+    """
+    Queue the refresh job for schedule_search_refresh, unless this process already has one waiting to run
+    """
+    global _search_refresh_queued_at
+
+    now = monotonic()
+
+    if _search_refresh_queued_at is not None and now - _search_refresh_queued_at < settings.SEARCH_REFRESH_DELAY:
+        return
+
+    _search_refresh_queued_at = now
+    enqueue('todo.refresh_search_documents', delay=settings.SEARCH_REFRESH_DELAY)
+
+
+@contextmanager
+def deferred_todo_list_touches() -> Iterator[None]:
+    """
+    Hold back list touches made in the block and apply them all when it exits, so N item writes to a list only cost
+    one parent update (adjusting its counters by the net change, and marking its search document stale). Used inside
+    transaction.atomic(), those updates are the last statements before the commit, which keeps the locks on the parent
+    rows as short as possible. Nested blocks leave the flushing to the outermost one, and nothing gets flushed if the
+    block raises.
+    """
+    if getattr(_deferred_touches, 'pks', None) is not None:
+        yield
+        return
+
+    _deferred_touches.pks = set()
+    _deferred_touches.count_deltas = {}
+    _deferred_touches.reindex_pks = set()
+
+    try:
+        yield
+
+        pks = _deferred_touches.pks
+        count_deltas = _deferred_touches.count_deltas
+        reindex_pks = _deferred_touches.reindex_pks
+    finally:
+        _deferred_touches.pks = None
+        _deferred_touches.count_deltas = None
+        _deferred_touches.reindex_pks = None
+
+    _apply_touches(pks, {pk: delta for pk, delta in count_deltas.items() if delta != (0, 0)}, reindex_pks)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination for the todo api
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Position = Tuple[int, int]
+
+
+class TodoItemPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Sending the cursor query param (it can be left empty to get the first page) switches to keyset pagination on
+    ``(todo_list_id, id)``. Keyset pages skip the COUNT(*) and never use an OFFSET, so a deep page costs the same as
+    the first one.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    # fields the keyset is built on, these need to uniquely identify a row
+    keyset_fields = ('todo_list_id', 'id')
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> Optional[List[Any]]:
+        """
+        Paginate by page number, or by cursor if the client asked for it.
+        :param queryset: queryset to paginate
+        :param request: drf request
+        :param view: view doing the pagination
+        :return: page of results
+        """
+        self.use_cursor = self.cursor_query_param in request.query_params
+
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+
+        return self.paginate_keyset(queryset, request.query_params[self.cursor_query_param],
+                                    base_url=request.build_absolute_uri())
+
+    def paginate_keyset(self, queryset: QuerySet, cursor: str, base_url: str) -> List[Any]:
+        """
+        Retrieve one keyset page, fetching a single extra row to find out if there is a page after it.
+        :param queryset: queryset to paginate
+        :param cursor: opaque cursor from a previous page, empty for the first page
+        :param base_url: url the next/previous links get built from
+        :return: page of results
+        """
+        self.use_cursor = True
+        self.base_url = remove_query_param(base_url, self.page_query_param)
+        self.display_page_controls = False
+
+        page_size = self.page_size
+        if hasattr(self, 'request'):
+            page_size = self.get_page_size(self.request)
+
+        reverse, position = self.decode_cursor(cursor)
+
+        list_field, id_field = self.keyset_fields
+
+        if reverse:
+            queryset = queryset.order_by(f'-{list_field}', f'-{id_field}')
+        else:
+            queryset = queryset.order_by(list_field, id_field)
+
+        if position is not None:
+            lookup = 'lt' if reverse else 'gt'
+            list_pk, item_pk = position
+
+            queryset = queryset.filter(
+                Q(**{f'{list_field}__{lookup}': list_pk}) | Q(**{list_field: list_pk, f'{id_field}__{lookup}': item_pk})
+            )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+
+        self.next_position = None
+        self.previous_position = None
+
+        if results:
+            if reverse:
+                self.next_position = self.get_position(results[-1])
+                self.previous_position = self.get_position(results[0]) if has_more else None
+            else:
+                self.next_position = self.get_position(results[-1]) if has_more else None
+                self.previous_position = self.get_position(results[0]) if position is not None else None
+
+        return results
+
+    def get_position(self, obj: Any) -> Position:
+        """
+        Get the keyset values of a row.
+        :param obj: model instance, or named row
+        :return: keyset values
+        """
+        return tuple(getattr(obj, field) for field in self.keyset_fields)
+
+    def encode_cursor(self, position: Position, reverse: bool = False) -> str:
+        """
+        Build an opaque cursor pointing at a keyset position.
+        :param position: keyset values of the row to start after (or before, in reverse)
+        :param reverse: whether the cursor walks backwards
+        :return: cursor string
+        """
+        raw = f"{'p' if reverse else 'n'}:{position[0]}:{position[1]}"
+
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> Tuple[bool, Optional[Position]]:
+        """
+        Parse a cursor built by encode_cursor
+        :param cursor: cursor string, empty for the first page
+        :return: whether the cursor walks backwards and the keyset position, if any
+        """
+        if not cursor:
+            return False, None
+
+        try:
+            raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+            direction, list_pk, item_pk = raw.split(':')
+
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+
+            return direction == 'p', (int(list_pk), int(item_pk))
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.use_cursor:
+            return super().get_next_link()
+
+        if self.next_position is None:
+            return None
+
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.use_cursor:
+            return super().get_previous_link()
+
+        if self.previous_position is None:
+            return None
+
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.previous_position, reverse=True))
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        """
+        Cursor pages leave out the count, since skipping the COUNT(*) is the point of them.
+        :param data: serialized page
+        :return: paginated response
+        """
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
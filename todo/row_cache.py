@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Fragment cache for rendered table rows. Rows are keyed by the object's pk and last_updated, so any change to the
+object moves it to a new key, and nothing ever needs deleting.
+"""
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.utils import timezone, translation
+
+from common.metrics import Samples, registry
+
+
+class RowCacheStats:
+    """
+    Hit/miss counters for the row cache, for this process. They're reported as todo_row_cache_lookups_total in the
+    metrics registry, which adds them up across processes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        """
+        Count a lookup
+        :param hit: whether the row was in the cache
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self) -> None:
+        """
+        Zero the counters
+        """
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def reset_after_fork(self) -> None:
+        """
+        Start a forked process (e.g. a preforked worker) from zero, with a lock of its own. Otherwise it'd report its
+        parent's lookups as its own, and the registry would count them once per process. The lock may have been held by
+        another thread of the parent at the fork, so it isn't used here.
+        """
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Get the counters, and the hit ratio
+        :return: hits, misses and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+            }
+
+
+stats = RowCacheStats()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=stats.reset_after_fork)
+
+row_cache_lookups = registry.counter('todo_row_cache_lookups_total', 'Todo list table row cache lookups', ['result'])
+
+
+def _collect_row_cache_lookups() -> Samples:
+    """
+    Report this process's row cache stats to the metrics registry. Rows are looked up far too often to count each one
+    in the registry itself.
+    :return: lookup counts
+    """
+    counts = stats.as_dict()
+
+    return {
+        row_cache_lookups.key(result='hit'): counts['hits'],
+        row_cache_lookups.key(result='miss'): counts['misses'],
+    }
+
+
+registry.add_collector(_collect_row_cache_lookups)
+
+
+def get_row_cache() -> Optional[BaseCache]:
+    """
+    Get the cache rows are kept in, see the TODO_ROW_CACHE setting
+    :return: cache, or None if row caching is turned off
+    """
+    alias = getattr(settings, 'TODO_ROW_CACHE', None)
+
+    return caches[alias] if alias else None
+
+
+def row_cache_key(obj: Any, vary_on: Iterable[Any] = ()) -> str:
+    """
+    Build the cache key of a row. Rendered dates and text depend on the active language and time zone, so those are
+    part of it.
+    :param obj: model instance the row is for, it needs a last_updated
+    :param vary_on: anything else the row's markup depends on
+    :return: cache key
+    """
+    parts = [obj._meta.label_lower, obj.pk, obj.last_updated.timestamp(), translation.get_language(),
+             timezone.get_current_timezone_name(), *vary_on]
+
+    # hashed, since cache backends check keys character by character
+    return f"row:{hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()}"
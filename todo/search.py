@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Search helpers for todo lists
+"""
+import re
+from typing import Any, List
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, QuerySet, TextField, Value, When
+from django.db.models.functions import Length
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from todo.models import SEARCH_CONFIG
+
+# control characters ts_headline wraps matches in, they can't show up in user input that makes it through a form
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+# number of characters to keep on each side of a match, for snippets built in python
+SNIPPET_RADIUS = 60
+
+
+def has_trigram_support(using: str) -> bool:
+    """
+    Check if a database can use pg_trgm. The answer is cached on the connection, so this only queries once.
+    :param using: db alias
+    :return: whether pg_trgm is installed
+    """
+    connection = connections[using]
+
+    if connection.vendor != 'postgresql':
+        return False
+
+    if not hasattr(connection, 'has_pg_trgm'):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            connection.has_pg_trgm = cursor.fetchone() is not None
+
+    return connection.has_pg_trgm
+
+
+def search_lists_by_name(queryset: QuerySet, name: str) -> QuerySet:
+    """
+    Filter todo lists down to the ones whose name contains the search term, best matches first.
+
+    On Postgres with pg_trgm, the substring match is served by the trigram GIN index on UPPER(name) (which is what
+    icontains compares against) and results are ranked by trigram similarity. Anywhere else, the same filter runs as
+    a plain scan and results are ranked exact match, then prefix match, then shortest name.
+    :param queryset: todo lists queryset
+    :param name: search term
+    :return: filtered and ranked queryset, with a similarity annotation
+    """
+    queryset = queryset.filter(name__icontains=name)
+
+    if has_trigram_support(queryset.db):
+        # imported here since it only makes sense on Postgres
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return queryset.annotate(similarity=TrigramSimilarity('name', name)).order_by('-similarity', 'name', 'pk')
+
+    similarity = Case(
+        When(name__iexact=name, then=Value(1.0)),
+        When(name__istartswith=name, then=Value(0.75)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )
+
+    return queryset.annotate(similarity=similarity).order_by('-similarity', Length('name'), 'name', 'pk')
+
+
+class Headline(Func):
+    """
+    ts_headline, marking matches with HIGHLIGHT_START/HIGHLIGHT_STOP so they can be turned into html after escaping
+    """
+    function = 'ts_headline'
+    output_field = TextField()
+
+    def __init__(self, expression: Any, query: Any, **extra) -> None:
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2, MaxWords=20, MinWords=5'
+
+        super().__init__(Value(SEARCH_CONFIG), expression, query, Value(options), **extra)
+
+
+def full_text_search_lists(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Find todo lists whose name or item text matches a query, using their search documents. Results are annotated with
+    a rank (best first) and a headline to build snippets from, see snippet_html.
+
+    On Postgres this is a tsquery against the GIN indexed search_vector, ranked with ts_rank and highlighted by
+    ts_headline. Anywhere else every word has to show up somewhere in the document, and lists matching by name rank
+    first.
+    :param queryset: todo lists queryset
+    :param query: search query, as typed by the user
+    :return: matching lists, best match first
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+
+        return queryset.filter(search_document__search_vector=search_query).annotate(
+            rank=SearchRank(F('search_document__search_vector'), search_query),
+            headline=Headline(F('search_document__document'), search_query),
+        ).order_by('-rank', 'pk')
+
+    for word in query.split():
+        queryset = queryset.filter(search_document__document__icontains=word)
+
+    rank = Case(When(name__icontains=query, then=Value(1.0)), default=Value(0.5), output_field=FloatField())
+
+    return queryset.annotate(rank=rank, headline=F('search_document__document')).order_by('-rank', 'pk')
+
+
+def snippet_html(headline: str, query: str) -> str:
+    """
+    Turn a headline into an html snippet with matches wrapped in <mark>. Headlines that didn't come from ts_headline
+    get trimmed down to the text around the first match, and highlighted here.
+    :param headline: headline annotation from full_text_search_lists
+    :param query: search query the headline is for
+    :return: escaped html snippet
+    """
+    if HIGHLIGHT_START not in headline:
+        headline = _highlight(headline, query.split())
+
+    html = escape(headline).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+    return mark_safe(' … '.join(line.strip() for line in html.splitlines() if line.strip()))
+
+
+def _highlight(document: str, words: List[str]) -> str:
+    """
+    Cut a snippet out of a document around the first matching word, and mark every match in it.
+    :param document: full search document
+    :param words: words to match, case-insensitively
+    :return: snippet, with matches marked
+    """
+    if not words:
+        return document[:SNIPPET_RADIUS * 2]
+
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    match = pattern.search(document)
+    start = max(match.start() - SNIPPET_RADIUS, 0) if match else 0
+    snippet = document[start:start + SNIPPET_RADIUS * 2]
+
+    return pattern.sub(lambda found: f'{HIGHLIGHT_START}{found.group(0)}{HIGHLIGHT_STOP}', snippet)
+
+
+def search_lists(queryset: QuerySet, name: str, search_items: bool = False) -> QuerySet:
+    """
+    Run the search the search lists form asked for
+    :param queryset: todo lists queryset
+    :param name: search term
+    :param search_items: whether to search item text too, rather than just list names
+    :return: matching lists, best match first
+    """
+    if search_items:
+        return full_text_search_lists(queryset, name)
+
+    return search_lists_by_name(queryset, name)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Seed todo data in bulk, for benchmarks
+"""
+from typing import List
+
+from todo.models import TodoItemModel, TodoListModel
+
+
+def seed_todo_lists(list_count: int, items_per_list: int = 0, prefix: str = 'seeded',
+                    batch_size: int = 5000) -> List[int]:
+    """
+    Bulk create todo lists and their items. Skips model saves, so this is only meant for throwaway data.
+    :param list_count: number of lists to create
+    :param items_per_list: number of items to create in each list
+    :param prefix: prefix for list names, needs to be unique to this seeding
+    :param batch_size: number of rows to build in memory at a time
+    :return: pks of created lists, in creation order
+    """
+    # every third item is completed, see below
+    counts = {'item_count': items_per_list, 'completed_count': (items_per_list + 2) // 3}
+
+    for start in range(0, list_count, batch_size):
+        numbers = range(start, min(start + batch_size, list_count))
+
+        # left to bulk_create, each backend splits inserts into the biggest batches it can take
+        TodoListModel.objects.bulk_create(
+            [TodoListModel(name=f'{prefix} list {number}', **counts) for number in numbers]
+        )
+
+    # not every backend hands back pks from bulk_create, so look them up
+    list_pks = list(TodoListModel.objects.filter(name__startswith=f'{prefix} list ').order_by('id')
+                    .values_list('id', flat=True))
+
+    items = []
+    for list_pk in list_pks:
+        for number in range(items_per_list):
+            items.append(TodoItemModel(todo_list_id=list_pk, text=f'item {number}', completed=number % 3 == 0))
+
+            if len(items) >= batch_size:
+                TodoItemModel.objects.bulk_create(items)
+                items = []
+
+    if items:
+        TodoItemModel.objects.bulk_create(items)
+
+    return list_pks
@@ -2,15 +2,47 @@
 """
 Serializers for todo models
 """
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 
-from todo.models import TodoItemModel
+from common.timing import TimedSerializerMixin, timed
+from todo.models import TodoItemModel, TodoListModel
+from todo.search import snippet_html
 
 
-class TodoItemSerializer(serializers.ModelSerializer):
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that can look instances up in ones loaded up front, instead of with a query per value. They
+    get passed in the serializer context as {'preloaded': {field name: {pk: instance}}}, and anything not in there
+    doesn't exist, as far as the field is concerned. Without them, it's a regular PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data: Any) -> Any:
+        preloaded = self.context.get('preloaded', {}).get(self.field_name)
+
+        if preloaded is None:
+            return super().to_internal_value(data)
+
+        try:
+            pk = int(data)
+        except (TypeError, ValueError, OverflowError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+
+        return preloaded[pk]
+
+
+class TodoItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for TodoItemModel
     """
+    # so todo_list can be looked up in lists loaded up front, see BulkTodoItemOperations
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
 
     class Meta:
         """
@@ -18,3 +50,119 @@ class TodoItemSerializer(serializers.ModelSerializer):
         """
         model = TodoItemModel
         fields = ['pk', 'todo_list', 'text', 'completed']
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs) -> None:
+        """
+        :param fields: names of the fields to keep, for sparse fieldsets, or None to keep them all
+        """
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def run_validators(self, value: Dict[str, Any]) -> None:
+        """
+        Skip the (todo_list, text) uniqueness check, a query, for updates leaving both as they are
+        :param value: validated data
+        """
+        validators = self.validators
+
+        if self.instance is not None and not set(self.get_changed_fields(self.instance, value)) & {'todo_list', 'text'}:
+            self.validators = [validator for validator in validators
+                               if not isinstance(validator, UniqueTogetherValidator)]
+
+        try:
+            super().run_validators(value)
+        finally:
+            self.validators = validators
+
+    def update(self, instance: TodoItemModel, validated_data: Dict[str, Any]) -> TodoItemModel:
+        """
+        Only write the columns that changed. When nothing did, nothing gets written and the list isn't touched.
+        :param instance: item to update
+        :param validated_data: validated data
+        :return: updated item
+        """
+        changed = self.get_changed_fields(instance, validated_data)
+
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+
+        if changed:
+            instance.save(update_fields=changed)
+
+        return instance
+
+    @staticmethod
+    def get_changed_fields(instance: TodoItemModel, validated_data: Dict[str, Any]) -> List[str]:
+        """
+        Find the fields an update changes. Lists get compared by pk, so the item's current list doesn't get loaded.
+        :param instance: item being updated
+        :param validated_data: validated data
+        :return: names of fields whose values differ from the item's
+        """
+        changed = []
+
+        for field, value in validated_data.items():
+            model_field = instance._meta.get_field(field)
+
+            if model_field.is_relation:
+                current, value = getattr(instance, model_field.attname), getattr(value, 'pk', value)
+            else:
+                current = getattr(instance, field)
+
+            if current != value:
+                changed.append(field)
+
+        return changed
+
+
+# TodoItemSerializer's fields, and the columns serialize_todo_item_rows reads them from
+TODO_ITEM_ROW_COLUMNS = OrderedDict([
+    ('pk', 'id'),
+    ('todo_list', 'todo_list_id'),
+    ('text', 'text'),
+    ('completed', 'completed'),
+])
+
+
+def serialize_todo_item_rows(rows: Iterable[Any], fields: Optional[List[str]] = None) -> List[OrderedDict]:
+    """
+    Read-only shortcut for TodoItemSerializer(items, many=True, fields=fields).data, for rows of the fields' columns
+    from TODO_ITEM_ROW_COLUMNS, in the same order. None of its fields transform their values on the way out, so the
+    columns are passed through as they are, without a model instance or a field's to_representation per value.
+    :param rows: item rows, any columns after the fields' get left out
+    :param fields: fields in the rows, or None for all of them
+    :return: serialized items, the same as the serializer's
+    """
+    rows = list(rows)
+    fields = list(TODO_ITEM_ROW_COLUMNS) if fields is None else fields
+
+    # counted per item, like the serializer's to_representation
+    with timed('serialize', count=len(rows)):
+        return [OrderedDict(zip(fields, row)) for row in rows]
+
+
+class TodoListSearchResultSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for todo lists found by full-text search
+    """
+    url = serializers.CharField(source='get_absolute_url', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.SerializerMethodField()
+
+    class Meta:
+        """
+        Define model and fields
+        """
+        model = TodoListModel
+        fields = ['pk', 'name', 'url', 'rank', 'snippet']
+
+    def get_snippet(self, todo_list: TodoListModel) -> str:
+        """
+        Build the highlighted snippet for a search result
+        :param todo_list: search result, with a headline annotation
+        :return: html snippet
+        """
+        return snippet_html(todo_list.headline, self.context.get('query', ''))
@@ -4,13 +4,24 @@ let headers = {
   'X-CSRFToken': csrftoken
 };
 
+// how long edits wait for more edits before they're sent, in ms
+const writeDelay = 400;
+
 var app = new Vue({
   delimiters: ['[[', ']]'],
   el: '#app',
   data: {
     todoItems: null,
+    nextItemsUrl: null,
+    loadingItems: false,
+    moreItemsVisible: false,
     newItem: {},
-    errors: []
+    errors: [],
+    // changed fields waiting to be sent, by item pk
+    pendingChanges: {},
+    writeTimer: null,
+    // the last write sent, so the next one goes after it and edits land in order
+    lastWrite: Promise.resolve()
   },
   methods: {
     addItem: function () {
@@ -40,23 +51,128 @@ var app = new Vue({
           this.newItem = {};
         })
     },
-    updateCompletion: function (item) {
-      let url = `${todoItemListApiUrl}${item.pk}/`;
+    queueChange: function (item, field) {
+      const changes = this.pendingChanges[item.pk] || {};
+
+      if (field === 'text' && !item.text.length) {
+        // items need some text, so an emptied input only gets sent once something is typed into it again
+        delete changes.text;
+      } else {
+        // later edits of the same field replace earlier ones
+        changes[field] = item[field];
+      }
+
+      this.pendingChanges[item.pk] = changes;
+      this.scheduleChanges();
+    },
+    scheduleChanges: function () {
+      // the wait starts over with every edit
+      clearTimeout(this.writeTimer);
+      this.writeTimer = setTimeout(() => this.sendChanges(), writeDelay);
+    },
+    sendChanges: function (keepalive = false) {
+      clearTimeout(this.writeTimer);
+
+      const changes = Object.entries(this.pendingChanges).filter(([pk, data]) => Object.keys(data).length);
+      this.pendingChanges = {};
+
+      if (!changes.length) {
+        return this.lastWrite;
+      }
+
+      // one item gets a PATCH of just what changed, several get a single bulk request
+      let request;
+      if (changes.length === 1) {
+        const [pk, data] = changes[0];
+        request = {url: `${todoItemListApiUrl}${pk}/`, method: 'PATCH', body: data};
+      } else {
+        const operations = changes.map(([pk, data]) => ({op: 'update', pk: Number(pk), data: data}));
+        request = {url: todoItemBulkApiUrl, method: 'POST', body: {operations: operations}};
+      }
+
+      this.lastWrite = this.lastWrite
+        .then(() => fetch(request.url, {
+          method: request.method,
+          body: JSON.stringify(request.body),
+          headers: headers,
+          keepalive: keepalive
+        }))
+        .then(response => response.json().then(data => {
+          if (!response.ok) {
+            this.showWriteErrors(data);
+            this.requeueValidChanges(changes, data);
+          }
+        }))
+        .catch(() => {
+          this.errors.push('Your changes could not be saved, please try again.');
+        });
+
+      return this.lastWrite;
+    },
+    requeueValidChanges: function (changes, data) {
+      // bulk requests are all or nothing, so the changes that were fine get sent again, without the ones that weren't
+      if (!data.results) {
+        return;
+      }
+
+      changes.forEach(([pk, changed], index) => {
+        if (data.results[index] === null) {
+          // anything edited since then is newer
+          this.pendingChanges[pk] = Object.assign(changed, this.pendingChanges[pk]);
+        }
+      });
+
+      this.scheduleChanges();
+    },
+    showWriteErrors: function (data) {
+      // bulk responses have a result per operation, a PATCH has the errors themselves
+      const results = data.results ? data.results.filter(result => result && result.errors)
+        : [{errors: data.errors || data}];
 
+      for (const result of results) {
+        for (const [field, messages] of Object.entries(result.errors || {})) {
+          this.errors.push(`${field}: ${[].concat(messages).join(' ')}`);
+        }
+      }
+    },
+    showItems: function (page) {
+      // items added here while later pages were still to load come back in them, and the copy already shown wins
+      const shown = new Set((this.todoItems || []).map(item => item.pk));
+
+      this.todoItems = (this.todoItems || []).concat(page.results.filter(item => !shown.has(item.pk)));
+      this.nextItemsUrl = page.next;
+    },
+    loadItems: function (url) {
+      this.loadingItems = true;
+
+      // no-cache revalidates with the server, which answers with a 304 if the list hasn't changed since last time
       fetch(url, {
-        method: 'put',
-        body: JSON.stringify(item),
-        headers: headers
+        method: 'get',
+        headers: headers,
+        cache: 'no-cache'
       })
-        .then(response => response.text())
-        .then(responseText => JSON.parse(responseText))
+        .then(response => response.json())
         .then(data => {
-          console.log(`Set ${data.text} to ${data.completed ? "complete" : "incomplete"}.`)
+          this.showItems(data);
+        })
+        .finally(() => {
+          this.loadingItems = false;
+
+          // keep going while the end of the list is still on screen, the observer only fires when that changes
+          this.$nextTick(() => this.loadMoreItems());
         })
     },
+    loadMoreItems: function () {
+      if (this.moreItemsVisible && this.nextItemsUrl && !this.loadingItems) {
+        this.loadItems(this.nextItemsUrl);
+      }
+    },
     deleteItem: function (item) {
       let url = `${todoItemListApiUrl}${item.pk}/`;
 
+      // nothing left to update once it's gone
+      delete this.pendingChanges[item.pk];
+
       fetch(url, {
         method: 'delete',
         body: JSON.stringify(item),
@@ -71,15 +187,28 @@ var app = new Vue({
     }
   },
   mounted: function () {
-    let url = `${todoItemListApiUrl}?todo_list=${todoListPk}`;
-
-    fetch(url, {
-      method: 'get',
-      headers: headers
-    })
-      .then(response => response.json())
-      .then(data => {
-        this.todoItems = data.results;
-      })
+    // the page comes with the first page of items, so there's nothing to fetch until the user scrolls past them
+    const initialItems = document.getElementById('id-initial-items');
+
+    if (initialItems) {
+      this.showItems(JSON.parse(initialItems.textContent));
+    } else {
+      // an empty cursor asks for the first page of cursor pagination, each page then links to the next one
+      this.loadItems(`${todoItemListApiUrl}?todo_list=${todoListPk}&cursor=`);
+    }
+
+    // send whatever is still waiting when the page gets hidden or closed, keepalive lets the request outlive the page
+    document.addEventListener('visibilitychange', () => {
+      if (document.visibilityState === 'hidden') {
+        this.sendChanges(true);
+      }
+    });
+
+    if ('IntersectionObserver' in window) {
+      new IntersectionObserver(entries => {
+        this.moreItemsVisible = entries.some(entry => entry.isIntersecting);
+        this.loadMoreItems();
+      }).observe(this.$refs.moreItems);
+    }
   }
 });
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Template tags for todo app
+"""
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Template tags for caching rendered table rows
+"""
+from typing import List
+
+from django import template
+from django.template.base import FilterExpression, NodeList, Parser, Token
+
+from todo.row_cache import get_row_cache, row_cache_key, stats
+
+register = template.Library()
+
+
+class CachedRowNode(template.Node):
+    """
+    Renders its contents once per version of an object, and serves them from the row cache after that
+    """
+
+    def __init__(self, nodelist: NodeList, obj: FilterExpression, vary_on: List[FilterExpression]) -> None:
+        self.nodelist = nodelist
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context: template.Context) -> str:
+        cache = get_row_cache()
+
+        if cache is None:
+            return self.nodelist.render(context)
+
+        key = row_cache_key(self.obj.resolve(context), [value.resolve(context) for value in self.vary_on])
+        content = cache.get(key)
+
+        stats.record(hit=content is not None)
+
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content)
+
+        return content
+
+
+@register.tag
+def cache_row(parser: Parser, token: Token) -> CachedRowNode:
+    """
+    Cache the markup of a table row, keyed by the object's pk and last_updated (plus the active language and time
+    zone). Anything else the markup depends on has to be passed in after the object.
+
+    Usage:
+        {% cache_row todo_list request.GET.name %}
+          ...
+        {% endcache_row %}
+    """
+    bits = token.split_contents()
+
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires the object the row is for.")
+
+    nodelist = parser.parse(('endcache_row',))
+    parser.delete_first_token()
+
+    return CachedRowNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
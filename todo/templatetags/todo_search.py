@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Template tags for todo list search
+"""
+from django import template
+
+from todo.search import snippet_html
+
+register = template.Library()
+
+
+@register.filter
+def search_snippet(headline: str, query: str) -> str:
+    """
+    Turn a full-text search headline into a highlighted html snippet
+    :param headline: headline annotation from full_text_search_lists
+    :param query: search query
+    :return: html snippet
+    """
+    return snippet_html(headline, query or '')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the route benchmark
+"""
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from todo.models import TodoListModel
+
+
+class BenchRoutesTest(TestCase):
+
+    def test_times_every_route_in_both_modes(self) -> None:
+        out = StringIO()
+        call_command('bench_routes', '--lists=2', '--items=2', '--requests=1', '--warmup=0', '--json=-', stdout=out)
+
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report['results']), {'CBV', 'FBV'})
+        self.assertIn('GET todo:list_and_filter_todo_lists', report['results']['CBV'])
+        self.assertNotIn('GET todo:list_and_filter_todo_lists', report['results']['FBV'])
+
+        for mode, endpoints in report['results'].items():
+            for label, result in endpoints.items():
+                self.assertTrue(all(status < 500 for status in result['status']), f'{mode} {label}')
+
+        self.assertIn('POST todo:items:todoitemmodel-bulk', report['results']['CBV'])
+        self.assertFalse(TodoListModel.objects.exists())
+
+    def test_restores_routes(self) -> None:
+        call_command('bench_routes', '--lists=1', '--requests=1', '--warmup=0', '--modes=FBV', stdout=StringIO())
+
+        if settings.VIEW_TYPES == 'CBV':
+            self.assertEqual(reverse('todo:list_and_filter_todo_lists'), '/todo/lists/')
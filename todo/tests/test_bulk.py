@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for bulk item operations
+"""
+import json
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.http import HttpResponse
+from django.test import TestCase
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from todo.bulk import BulkTodoItemOperations
+from todo.models import TodoItemModel, TodoListModel
+
+
+class TodoItemBulkTest(TestCase):
+    url = reverse_lazy('todo:items:todoitemmodel-bulk')
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='chores')
+        cls.dishes = TodoItemModel.objects.create(todo_list=cls.todo_list, text='dishes', completed=False)
+        cls.laundry = TodoItemModel.objects.create(todo_list=cls.todo_list, text='laundry', completed=False)
+
+    def post(self, operations: List[Dict[str, Any]]) -> HttpResponse:
+        return self.client.post(self.url, data=json.dumps({'operations': operations}),
+                                content_type='application/json')
+
+    def test_mixed_operations(self) -> None:
+        TodoListModel.objects.filter(pk=self.todo_list.pk).update(last_updated=timezone.now() - timedelta(days=1))
+
+        response = self.post([
+            {'op': 'create', 'data': {'todo_list': self.todo_list.pk, 'text': 'vacuum', 'completed': False}},
+            {'op': 'update', 'pk': self.dishes.pk, 'data': {'completed': True}},
+            {'op': 'delete', 'pk': self.laundry.pk},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 204])
+
+        vacuum = TodoItemModel.objects.get(text='vacuum')
+        self.assertEqual(results[0]['data'], {'pk': vacuum.pk, 'todo_list': self.todo_list.pk, 'text': 'vacuum',
+                                              'completed': False})
+        self.assertTrue(TodoItemModel.objects.get(pk=self.dishes.pk).completed)
+        self.assertFalse(TodoItemModel.objects.filter(pk=self.laundry.pk).exists())
+
+        self.todo_list.refresh_from_db()
+        self.assertGreater(self.todo_list.last_updated, timezone.now() - timedelta(minutes=1))
+        # vacuum and dishes are left, and dishes got completed
+        self.assertEqual((self.todo_list.item_count, self.todo_list.completed_count), (2, 1))
+
+    def test_query_count_does_not_grow_with_writes(self) -> None:
+        operations = [
+            {'op': 'update', 'pk': self.dishes.pk, 'data': {'completed': True}},
+            {'op': 'update', 'pk': self.laundry.pk, 'data': {'completed': True}},
+        ]
+
+        # load items, unique check, then the update and list touch in a savepoint
+        with self.assertNumQueries(6):
+            self.post(operations)
+
+    def test_unchanged_items_are_not_written(self) -> None:
+        operations = [
+            {'op': 'update', 'pk': self.dishes.pk, 'data': {'completed': False, 'text': 'dishes'}},
+            {'op': 'update', 'pk': self.laundry.pk, 'data': {'completed': False}},
+        ]
+
+        # load items, unique check, and a savepoint with nothing in it
+        with self.assertNumQueries(4):
+            response = self.post(operations)
+
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 200])
+
+    def test_lists_are_loaded_once(self) -> None:
+        errands = TodoListModel.objects.create(name='errands')
+        doomed = TodoListModel.objects.create(name='doomed')
+        doomed.mark_for_deletion()
+
+        bulk = BulkTodoItemOperations([
+            {'op': 'create', 'data': {'todo_list': errands.pk, 'text': 'bank', 'completed': False}},
+            {'op': 'create', 'data': {'todo_list': str(self.todo_list.pk), 'text': 'mop', 'completed': False}},
+            {'op': 'update', 'pk': self.dishes.pk, 'data': {'todo_list': errands.pk}},
+            {'op': 'create', 'data': {'todo_list': doomed.pk, 'text': 'dust', 'completed': False}},
+            {'op': 'create', 'data': {'todo_list': 'chores', 'text': 'sweep', 'completed': False}},
+        ])
+
+        # load items, load lists, unique check
+        with self.assertNumQueries(3):
+            self.assertFalse(bulk.is_valid())
+
+        self.assertEqual(bulk.results[:3], [None, None, None])
+        self.assertIn('does not exist', bulk.results[3]['errors']['todo_list'][0])
+        self.assertIn('Incorrect type', bulk.results[4]['errors']['todo_list'][0])
+
+    def test_invalid_batch_applies_nothing(self) -> None:
+        response = self.post([
+            {'op': 'delete', 'pk': self.laundry.pk},
+            {'op': 'create', 'data': {'todo_list': self.todo_list.pk, 'text': 'dishes', 'completed': False}},
+            {'op': 'update', 'pk': 0, 'data': {'completed': True}},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+
+        results = response.json()['results']
+        self.assertIsNone(results[0])
+        self.assertIn('non_field_errors', results[1]['errors'])
+        self.assertIn('pk', results[2]['errors'])
+        self.assertTrue(TodoItemModel.objects.filter(pk=self.laundry.pk).exists())
+
+    def test_pks_must_be_integers(self) -> None:
+        response = self.post([
+            {'op': 'update', 'pk': [self.dishes.pk], 'data': {}},
+            {'op': 'delete', 'pk': {'pk': self.dishes.pk}},
+            {'op': 'delete', 'pk': True},
+            {'op': 'delete', 'pk': str(self.laundry.pk)},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['errors'] for result in response.json()['results']], [{'pk': ['Not found.']}] * 4)
+
+    def test_duplicates_within_batch(self) -> None:
+        data = {'todo_list': self.todo_list.pk, 'text': 'mop', 'completed': False}
+
+        response = self.post([{'op': 'create', 'data': data}, {'op': 'create', 'data': data}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(response.json()['results'][0])
+        self.assertEqual(response.json()['results'][1]['status'], 400)
+
+    def test_operations_required(self) -> None:
+        response = self.post([])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('operations', response.json()['errors'])
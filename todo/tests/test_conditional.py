@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for conditional GETs of todo lists and items
+"""
+from django.test import TestCase
+from django.urls import reverse_lazy
+
+from todo.models import TodoItemModel, TodoListModel
+
+
+class TodoListConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='groceries')
+        TodoItemModel.objects.create(todo_list=cls.todo_list, text='milk', completed=False)
+        cls.url = reverse_lazy('todo:display_todo_list', kwargs={'pk': cls.todo_list.pk})
+
+    def test_unchanged_list_is_not_modified(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_item_change_invalidates(self) -> None:
+        etag = self.client.get(self.url)['ETag']
+
+        TodoItemModel.objects.create(todo_list=self.todo_list, text='eggs', completed=False)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self) -> None:
+        last_modified = self.client.get(self.url)['Last-Modified']
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+
+class TodoItemsConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='groceries')
+        cls.item = TodoItemModel.objects.create(todo_list=cls.todo_list, text='milk', completed=False)
+        cls.url = f"{reverse_lazy('todo:items:todoitemmodel-list')}?todo_list={cls.todo_list.pk}&cursor="
+
+    def test_unchanged_items_are_not_modified(self) -> None:
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_each_page_has_its_own_etag(self) -> None:
+        first = self.client.get(self.url)['ETag']
+        second = self.client.get(f'{self.url}&page_size=1')['ETag']
+
+        self.assertNotEqual(first, second)
+
+    def test_item_update_invalidates(self) -> None:
+        etag = self.client.get(self.url)['ETag']
+
+        self.item.completed = True
+        self.item.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['completed'])
+
+    def test_unfiltered_items_have_no_etag(self) -> None:
+        response = self.client.get(reverse_lazy('todo:items:todoitemmodel-list'))
+
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for deleting todo lists in the background
+"""
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+from todo.models import TodoItemModel, TodoListModel, TodoListSearchDocument
+
+
+class DeleteTodoListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='doomed')
+        for number in range(5):
+            TodoItemModel.objects.create(todo_list=cls.todo_list, text=f'item {number}', completed=False)
+
+    # the function-based delete view redirects to list_and_filter_todo_lists, which only class-based views route
+    @skipUnless(settings.VIEW_TYPES == 'CBV', 'only routed for class-based views')
+    def test_delete_hides_list_right_away(self) -> None:
+        response = self.client.post(reverse_lazy('todo:delete_todo_list', args=[self.todo_list.pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(TodoListModel.objects.filter(pk=self.todo_list.pk).exists())
+        self.assertTrue(TodoListModel.all_objects.filter(pk=self.todo_list.pk, pending_deletion=True).exists())
+        self.assertEqual(TodoItemModel.objects.filter(todo_list=self.todo_list).count(), 5)
+        self.assertEqual(Job.objects.get().get_kwargs(), {'pk': self.todo_list.pk})
+
+        # a fresh client, since the success message names the list
+        self.assertNotContains(self.client_class().get(reverse_lazy('todo:list_todo_lists')), 'doomed')
+
+        response = self.client.get(reverse_lazy('todo:items:todoitemmodel-list'), {'todo_list': self.todo_list.pk})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_bulk_operations_cant_reach_items_of_pending_lists(self) -> None:
+        self.todo_list.mark_for_deletion()
+        first, second = TodoItemModel.objects.filter(todo_list=self.todo_list)[:2]
+
+        response = self.client.post(reverse_lazy('todo:items:todoitemmodel-bulk'), content_type='application/json',
+                                    data={'operations': [{'op': 'update', 'pk': first.pk, 'data': {'completed': True}},
+                                                         {'op': 'delete', 'pk': second.pk}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['errors'] for result in response.json()['results']],
+                         [{'pk': ['Not found.']}, {'pk': ['Not found.']}])
+        self.assertEqual(TodoItemModel.objects.filter(todo_list=self.todo_list, completed=False).count(), 5)
+
+    def test_purge_deletes_items_in_chunks(self) -> None:
+        self.todo_list.mark_for_deletion()
+        kept = TodoListModel.objects.create(name='kept')
+        TodoItemModel.objects.create(todo_list=kept, text='kept item', completed=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_todo_lists', chunk_size=2, stdout=StringIO())
+
+        item_deletes = [query for query in queries
+                        if query['sql'].startswith(f'DELETE FROM "{TodoItemModel._meta.db_table}"')]
+
+        # three chunks, then the cascade from deleting the list, which finds nothing left
+        self.assertEqual(len(item_deletes), 4)
+        self.assertFalse(TodoListModel.all_objects.filter(pk=self.todo_list.pk).exists())
+        self.assertFalse(TodoItemModel.objects.filter(todo_list_id=self.todo_list.pk).exists())
+        self.assertFalse(TodoListSearchDocument.objects.filter(todo_list_id=self.todo_list.pk).exists())
+        self.assertEqual(TodoItemModel.objects.filter(todo_list=kept).count(), 1)
+
+    def test_queued_job_purges_list(self) -> None:
+        self.todo_list.mark_for_deletion()
+
+        self.assertEqual(run_job(claim_job('worker')), Job.SUCCEEDED)
+        self.assertFalse(TodoListModel.all_objects.filter(pk=self.todo_list.pk).exists())
+        self.assertFalse(TodoItemModel.objects.filter(todo_list_id=self.todo_list.pk).exists())
+
+    def test_name_stays_taken_until_purged(self) -> None:
+        self.todo_list.mark_for_deletion()
+
+        response = self.client.post(reverse_lazy('todo:create_todo_list'), {'name': 'doomed'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(TodoListModel.objects.filter(name='doomed').exists())
+
+        call_command('purge_todo_lists', stdout=StringIO())
+
+        response = self.client.post(reverse_lazy('todo:create_todo_list'), {'name': 'doomed'})
+
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for exporting todo lists
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse_lazy
+
+from todo.export import CSV_COLUMNS, export_todo_lists
+from todo.models import TodoItemModel, TodoListModel
+
+
+class ExportTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.groceries = TodoListModel.objects.create(name='groceries')
+        cls.items = [TodoItemModel.objects.create(todo_list=cls.groceries, text=text, completed=completed)
+                     for text, completed in (('milk', True), ('eggs, "large"', False), ('bread\nrye', False))]
+        cls.empty = TodoListModel.objects.create(name='empty')
+        TodoListModel.objects.create(name='deleted').mark_for_deletion()
+
+    def export(self, export_format: str, compress: bool = False) -> str:
+        data = b''.join(export_todo_lists(export_format, compress))
+
+        return (gzip.decompress(data) if compress else data).decode()
+
+    def test_jsonl(self) -> None:
+        lines = [json.loads(line) for line in self.export('jsonl').splitlines()]
+
+        self.assertEqual([(line['id'], line['name']) for line in lines],
+                         [(self.groceries.pk, 'groceries'), (self.empty.pk, 'empty')])
+        self.assertEqual(lines[0]['items'], [{'id': item.pk, 'text': item.text, 'completed': item.completed}
+                                             for item in self.items])
+        self.assertEqual(lines[1]['items'], [])
+        self.assertEqual(lines[0]['created'], self.groceries.created.isoformat())
+
+    def test_csv(self) -> None:
+        rows = list(csv.reader(io.StringIO(self.export('csv'))))
+
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        self.assertEqual([row[5] for row in rows[1:4]], [item.text for item in self.items])
+        self.assertEqual(rows[1][:2] + rows[1][4:], [str(self.groceries.pk), 'groceries', str(self.items[0].pk),
+                                                     'milk', 'True'])
+        self.assertEqual(rows[4][1:2] + rows[4][4:], ['empty', '', '', ''])
+        self.assertEqual(len(rows), 5)
+
+    def test_gzip(self) -> None:
+        self.assertEqual(self.export('jsonl', compress=True), self.export('jsonl'))
+
+    def test_one_query_in_small_pieces(self) -> None:
+        with patch('todo.export.EXPORT_BUFFER_SIZE', 10), self.assertNumQueries(1):
+            pieces = list(export_todo_lists('jsonl', chunk_size=2))
+
+        self.assertGreater(len(pieces), 5)
+        self.assertEqual(b''.join(pieces).decode(), self.export('jsonl'))
+
+    def test_download(self) -> None:
+        staff = get_user_model().objects.create_user(email='staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse_lazy('todo:export_todo_lists'), {'format': 'csv', 'compress': 'gzip'})
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="todo-lists.csv.gz"')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(), self.export('csv'))
+
+        response = self.client.get(reverse_lazy('todo:export_todo_lists'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_download_is_staff_only(self) -> None:
+        response = self.client.get(reverse_lazy('todo:export_todo_lists'))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_command(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.jsonl.gz')
+            call_command('export_todo_lists', gzip=True, output=path, stdout=io.StringIO())
+
+            with gzip.open(path, 'rt') as export_file:
+                self.assertEqual(export_file.read(), self.export('jsonl'))
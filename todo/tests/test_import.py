@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for importing todo lists
+"""
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+from todo.export import export_todo_lists
+from todo.jobs import refresh_stale_search_documents
+from todo.importer import TodoListImport
+from todo.models import TodoItemModel, TodoListModel, TodoListSearchDocument
+
+
+def jsonl(*records) -> str:
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class ImportTest(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_import(self, data: str, import_format: str = 'jsonl', **kwargs) -> dict:
+        return TodoListImport(import_format, **kwargs).run(io.StringIO(data))
+
+    def test_creates_lists_and_items(self) -> None:
+        groceries = TodoListModel.objects.create(name='groceries')
+        TodoItemModel.objects.create(todo_list=groceries, text='milk', completed=False)
+        refresh_stale_search_documents()
+
+        summary = self.run_import(jsonl(
+            {'name': 'groceries', 'items': [{'text': 'milk', 'completed': True}, {'text': 'eggs', 'completed': True}]},
+            {'name': 'chores', 'items': [{'text': 'dishes', 'completed': False},
+                                         {'text': 'dishes', 'completed': True}]},
+            {'name': 'empty', 'items': []},
+        ))
+
+        self.assertEqual(summary, {'rows': 3, 'lists_created': 2, 'items_created': 2, 'duplicates': 2, 'errors': 0})
+
+        chores = TodoListModel.objects.get(name='chores')
+        self.assertEqual(list(chores.todoitemmodel_set.values_list('text', 'completed')), [('dishes', False)])
+        self.assertEqual(TodoItemModel.objects.get(text='milk').completed, False)
+
+        groceries.refresh_from_db()
+        self.assertEqual((groceries.item_count, groceries.completed_count), (2, 1))
+
+        refresh_stale_search_documents()
+        self.assertEqual(TodoListSearchDocument.objects.get(todo_list=groceries).document, 'groceries\nmilk\neggs')
+        self.assertEqual(TodoListSearchDocument.objects.get(todo_list__name='empty').document, 'empty')
+
+    def test_reimports_exports(self) -> None:
+        groceries = TodoListModel.objects.create(name='groceries')
+        TodoItemModel.objects.create(todo_list=groceries, text='eggs, "large"\nbrown', completed=True)
+        TodoListModel.objects.create(name='empty')
+
+        for import_format in ('jsonl', 'csv'):
+            export = b''.join(export_todo_lists(import_format)).decode()
+            TodoListModel.objects.all().delete()
+
+            summary = self.run_import(export, import_format)
+
+            self.assertEqual((summary['lists_created'], summary['items_created'], summary['errors']), (2, 1, 0))
+            self.assertEqual(b''.join(export_todo_lists(import_format)).decode().count('\n'), export.count('\n'))
+            self.assertEqual(TodoItemModel.objects.get().text, 'eggs, "large"\nbrown')
+
+    def test_reports_invalid_rows(self) -> None:
+        TodoListModel.objects.create(name='doomed').mark_for_deletion()
+        errors_path = os.path.join(self.directory.name, 'errors.jsonl')
+
+        summary = self.run_import(
+            '{"name": \n' + jsonl(
+                {'items': []},
+                {'name': 'x' * 201},
+                {'name': 'groceries', 'items': [{'text': 'milk'}, {'text': None, 'completed': True},
+                                                {'text': 'eggs', 'completed': True}]},
+                {'name': 'doomed', 'items': []},
+            ),
+            errors_path=errors_path,
+        )
+
+        self.assertEqual(summary['errors'], 5)
+        self.assertEqual(list(TodoItemModel.objects.values_list('text', flat=True)), ['eggs'])
+
+        with open(errors_path) as errors_file:
+            errors = {error['row']: error['errors'] for error in map(json.loads, errors_file)}
+
+        self.assertEqual(list(errors), [1, 2, 3, 4, 5])
+        self.assertIn('line', errors[1])
+        self.assertEqual(errors[2], {'name': ['This field is required.']})
+        self.assertIn('at most 200 characters', errors[3]['name'][0])
+        self.assertEqual(errors[4], {'items[0].completed': ['This field is required.'],
+                                     'items[1].text': ['This field may not be null.']})
+        self.assertIn('being deleted', errors[5]['list_name'][0])
+
+    def test_list_deleted_while_being_created(self) -> None:
+        def bulk_create(lists, **kwargs) -> None:
+            # another request got to the name first, and its list is already on its way out
+            TodoListModel.objects.create(name='contested').mark_for_deletion()
+
+        with mock.patch.object(TodoListModel.objects, 'bulk_create', bulk_create):
+            summary = self.run_import(jsonl({'name': 'contested', 'items': [{'text': 'milk', 'completed': False}]}))
+
+        self.assertEqual((summary['lists_created'], summary['items_created'], summary['errors']), (0, 0, 1))
+        self.assertFalse(TodoItemModel.objects.exists())
+
+    def test_reports_invalid_csv_rows(self) -> None:
+        summary = self.run_import('list_name,item_text,item_completed\ngroceries,milk,maybe\n,eggs,True\n', 'csv')
+
+        self.assertEqual(summary['errors'], 2)
+        self.assertFalse(TodoListModel.objects.exists())
+
+    def test_resumes_from_checkpoint(self) -> None:
+        checkpoint_path = os.path.join(self.directory.name, 'checkpoint.json')
+        data = jsonl(*({'name': f'list {number}', 'items': []} for number in range(5)))
+
+        self.run_import(data, checkpoint_path=checkpoint_path, batch_size=2)
+
+        with open(checkpoint_path) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)['rows'], 5)
+
+        TodoListModel.objects.all().delete()
+
+        with open(checkpoint_path, 'w') as checkpoint_file:
+            json.dump({'rows': 3, 'lists_created': 3, 'items_created': 0, 'duplicates': 0, 'errors': 0},
+                      checkpoint_file)
+
+        summary = self.run_import(data, checkpoint_path=checkpoint_path, batch_size=2)
+
+        self.assertEqual((summary['rows'], summary['lists_created']), (5, 5))
+        self.assertEqual(sorted(TodoListModel.objects.values_list('name', flat=True)), ['list 3', 'list 4'])
+
+    def test_queries_per_batch_dont_grow_with_rows(self) -> None:
+        def import_queries(count: int) -> int:
+            TodoListModel.objects.all().delete()
+            data = jsonl({'name': 'list', 'items': [{'text': str(number), 'completed': False}
+                                                    for number in range(count)]})
+
+            with CaptureQueriesContext(connection) as context:
+                self.run_import(data)
+
+            return len(context.captured_queries)
+
+        self.assertEqual(import_queries(5), import_queries(50))
+
+    def test_command(self) -> None:
+        path = os.path.join(self.directory.name, 'lists.jsonl.gz')
+
+        with gzip.open(path, 'wt') as import_file:
+            import_file.write(jsonl({'name': 'groceries', 'items': [{'text': 'milk', 'completed': False}]}))
+
+        stdout = io.StringIO()
+        call_command('import_todo_lists', path, workers=0, stdout=stdout)
+
+        self.assertEqual(json.loads(stdout.getvalue())['items_created'], 1)
+        self.assertEqual(TodoItemModel.objects.get().todo_list.name, 'groceries')
+
+    def test_upload(self) -> None:
+        staff = get_user_model().objects.create_user(email='staff@example.com', is_staff=True)
+        self.client.force_login(staff)
+        upload = SimpleUploadedFile('lists.csv', b'list_name,item_text,item_completed\ngroceries,milk,False\n'
+                                                 b'groceries,eggs,\n')
+
+        with override_settings(IMPORT_DIR=self.directory.name, IMPORT_WORKERS=0):
+            response = self.client.post(reverse('todo:import_todo_lists'), {'file': upload})
+
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(Job.objects.get().get_kwargs()['import_format'], 'csv')
+
+            run_job(claim_job('worker'))
+
+            response = self.client.get(response['Location'])
+
+        self.assertEqual(response.data['status'], Job.SUCCEEDED)
+        self.assertEqual(response.data['summary']['items_created'], 1)
+        self.assertEqual(response.data['errors'],
+                         [{'row': 2, 'errors': {'item_completed': ['This field is required.']}}])
+
+    def test_upload_is_staff_only(self) -> None:
+        upload = SimpleUploadedFile('lists.csv', b'list_name\ngroceries\n')
+
+        response = self.client.post(reverse('todo:import_todo_lists'), {'file': upload})
+
+        self.assertEqual(response.status_code, 403)
+
+
+class ImportWorkersTest(TransactionTestCase):
+
+    def test_validates_in_worker_processes(self) -> None:
+        data = jsonl(*({'name': f'list {number}', 'items': [{'text': 'a', 'completed': False}, {'text': ''}]}
+                       for number in range(20)))
+
+        summary = TodoListImport('jsonl', workers=2, batch_size=3).run(io.StringIO(data))
+
+        self.assertEqual(summary, {'rows': 20, 'lists_created': 20, 'items_created': 20, 'duplicates': 0,
+                                   'errors': 20})
+        self.assertEqual(TodoListModel.objects.filter(item_count=1).count(), 20)
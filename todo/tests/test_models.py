@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for todo models
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from todo.models import TodoItemModel, TodoListModel, deferred_todo_list_touches
+
+
+class TodoListTouchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='errands')
+
+    def setUp(self) -> None:
+        self.yesterday = timezone.now() - timedelta(days=1)
+        TodoListModel.objects.filter(pk=self.todo_list.pk).update(last_updated=self.yesterday)
+
+    def assert_touched(self) -> None:
+        self.todo_list.refresh_from_db()
+        self.assertGreater(self.todo_list.last_updated, self.yesterday)
+
+    def test_item_save_touches_list_without_loading_it(self) -> None:
+        # Saving the whole list used to cost a SELECT for the list plus a full-row UPDATE on top of the INSERT. Now
+        # it's the INSERT and the touch, which marks the list's search document stale too.
+        with self.assertNumQueries(2):
+            TodoItemModel(todo_list_id=self.todo_list.pk, text='post office', completed=False).save()
+
+        self.assert_touched()
+
+    def test_item_update_touches_list(self) -> None:
+        item = TodoItemModel.objects.create(todo_list=self.todo_list, text='bank', completed=False)
+        TodoListModel.objects.filter(pk=self.todo_list.pk).update(last_updated=self.yesterday)
+        item = TodoItemModel.objects.get(pk=item.pk)
+
+        item.completed = True
+        with self.assertNumQueries(2):
+            item.save()
+
+        self.assert_touched()
+
+    def test_deferred_touches_are_merged(self) -> None:
+        with transaction.atomic():
+            # one INSERT per item, then a single touch for the list
+            with self.assertNumQueries(6):
+                with deferred_todo_list_touches():
+                    for number in range(5):
+                        TodoItemModel.objects.create(todo_list_id=self.todo_list.pk, text=f'stop {number}',
+                                                     completed=False)
+
+        self.assert_touched()
+
+    def test_nested_deferred_touches_flush_once(self) -> None:
+        with self.assertNumQueries(3):
+            with deferred_todo_list_touches():
+                TodoItemModel.objects.create(todo_list_id=self.todo_list.pk, text='gas', completed=False)
+
+                with deferred_todo_list_touches():
+                    TodoItemModel.objects.create(todo_list_id=self.todo_list.pk, text='car wash', completed=False)
+
+        self.assert_touched()
+
+    def test_deferred_touches_dropped_on_error(self) -> None:
+        with self.assertRaises(ValueError):
+            with deferred_todo_list_touches():
+                TodoItemModel.objects.create(todo_list_id=self.todo_list.pk, text='pharmacy', completed=False)
+                raise ValueError
+
+        self.todo_list.refresh_from_db()
+        self.assertEqual(self.todo_list.last_updated, self.yesterday)
+
+
+class TodoListCountersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='errands')
+        cls.other_list = TodoListModel.objects.create(name='chores')
+
+    def assert_counts(self, todo_list: TodoListModel, item_count: int, completed_count: int) -> None:
+        todo_list.refresh_from_db()
+        self.assertEqual((todo_list.item_count, todo_list.completed_count), (item_count, completed_count))
+
+    def test_create_update_and_delete(self) -> None:
+        item = TodoItemModel.objects.create(todo_list=self.todo_list, text='bank', completed=False)
+        TodoItemModel.objects.create(todo_list=self.todo_list, text='post office', completed=True)
+        self.assert_counts(self.todo_list, 2, 1)
+
+        item = TodoItemModel.objects.get(pk=item.pk)
+        item.completed = True
+        # the counters ride along in the touch
+        with self.assertNumQueries(2):
+            item.save()
+        self.assert_counts(self.todo_list, 2, 2)
+
+        item.delete()
+        self.assert_counts(self.todo_list, 1, 1)
+
+    def test_move_between_lists(self) -> None:
+        item = TodoItemModel.objects.create(todo_list=self.todo_list, text='mop', completed=True)
+
+        item = TodoItemModel.objects.get(pk=item.pk)
+        item.todo_list = self.other_list
+        item.save()
+
+        self.assert_counts(self.todo_list, 0, 0)
+        self.assert_counts(self.other_list, 1, 1)
+
+    def test_fields_left_out_of_update_fields_are_not_counted(self) -> None:
+        item = TodoItemModel.objects.create(todo_list=self.todo_list, text='vacuum', completed=False)
+
+        item = TodoItemModel.objects.get(pk=item.pk)
+        item.completed = True
+        item.text = 'vacuum upstairs'
+        item.save(update_fields=['text'])
+        self.assert_counts(self.todo_list, 1, 0)
+
+        item.save(update_fields=['completed'])
+        self.assert_counts(self.todo_list, 1, 1)
+
+    def test_deferred_changes_are_netted(self) -> None:
+        with deferred_todo_list_touches():
+            for number in range(3):
+                TodoItemModel.objects.create(todo_list=self.todo_list, text=f'stop {number}', completed=number == 0)
+
+            TodoItemModel.objects.get(text='stop 1').delete()
+
+        self.assert_counts(self.todo_list, 2, 1)
+
+    def test_repair_command(self) -> None:
+        TodoItemModel.objects.create(todo_list=self.todo_list, text='laundry', completed=True)
+        TodoListModel.objects.filter(pk=self.todo_list.pk).update(item_count=7, completed_count=0)
+
+        out = StringIO()
+        call_command('repair_todo_list_counts', '--check', stdout=out)
+        self.assertIn('1 lists have drifted counters.', out.getvalue())
+        self.assert_counts(self.todo_list, 7, 0)
+
+        call_command('repair_todo_list_counts', stdout=StringIO())
+        self.assert_counts(self.todo_list, 1, 1)
+        self.assert_counts(self.other_list, 0, 0)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for todo api pagination
+"""
+from django.test import TestCase
+from django.urls import reverse_lazy
+
+from todo.models import TodoItemModel, TodoListModel
+
+
+class TodoItemCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='groceries')
+        TodoItemModel.objects.bulk_create(
+            [TodoItemModel(todo_list=cls.todo_list, text=f'item {number}', completed=False) for number in range(45)]
+        )
+        cls.url = f"{reverse_lazy('todo:items:todoitemmodel-list')}?todo_list={cls.todo_list.pk}"
+
+    def test_page_number_mode_is_default(self) -> None:
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data['count'], 45)
+
+    def test_cursor_mode_skips_count(self) -> None:
+        # the list's last_updated, for the ETag, then the page itself
+        with self.assertNumQueries(2):
+            data = self.client.get(f'{self.url}&cursor=').json()
+
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        self.assertEqual(len(data['results']), 20)
+
+    def test_walk_forward_and_back(self) -> None:
+        first = self.client.get(f'{self.url}&cursor=').json()
+        second = self.client.get(first['next']).json()
+        third = self.client.get(second['next']).json()
+
+        texts = [item['text'] for page in (first, second, third) for item in page['results']]
+        self.assertEqual(texts, [f'item {number}' for number in range(45)])
+        self.assertIsNone(third['next'])
+
+        back = self.client.get(third['previous']).json()
+        self.assertEqual(back['results'], second['results'])
+
+        back = self.client.get(back['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_is_stable_across_inserts(self) -> None:
+        first = self.client.get(f'{self.url}&cursor=').json()
+
+        TodoItemModel.objects.create(todo_list=self.todo_list, text='new item', completed=False)
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual(second['results'][0]['text'], 'item 20')
+
+    def test_invalid_cursor(self) -> None:
+        response = self.client.get(f'{self.url}&cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, 404)
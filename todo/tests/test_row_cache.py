@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the todo list table row cache
+"""
+import json
+import os
+from unittest import skipUnless
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import translation
+
+from todo.models import TodoItemModel, TodoListModel
+from todo.row_cache import get_row_cache, stats
+
+
+class RowCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='errands')
+
+    def setUp(self) -> None:
+        get_row_cache().clear()
+        stats.reset()
+
+    def render(self) -> str:
+        todo_lists = list(TodoListModel.objects.all())
+        request = RequestFactory().get('/')
+
+        return render_to_string('todo/list_table.html', {'object_list': todo_lists, 'request': request})
+
+    def test_second_render_is_a_hit(self) -> None:
+        first = self.render()
+        second = self.render()
+
+        self.assertEqual(first, second)
+        self.assertEqual(stats.as_dict(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_list_change_invalidates(self) -> None:
+        self.render()
+
+        TodoItemModel.objects.create(todo_list=self.todo_list, text='bank', completed=False)
+
+        self.assertIn('1 item, 0 done', self.render())
+        self.assertEqual(stats.misses, 2)
+
+    def test_language_is_part_of_the_key(self) -> None:
+        self.render()
+
+        with translation.override('de'):
+            self.render()
+
+        self.assertEqual(stats.misses, 2)
+
+    @override_settings(TODO_ROW_CACHE=None)
+    def test_can_be_turned_off(self) -> None:
+        self.render()
+        self.render()
+
+        self.assertEqual(stats.as_dict(), {'hits': 0, 'misses': 0, 'hit_ratio': None})
+
+    @skipUnless(hasattr(os, 'register_at_fork'), 'needs os.fork')
+    def test_forked_processes_start_from_zero(self) -> None:
+        self.render()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.write(write_fd, json.dumps(stats.as_dict()).encode())
+            os._exit(0)
+
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+
+        with os.fdopen(read_fd) as child_stats:
+            self.assertEqual(json.load(child_stats), {'hits': 0, 'misses': 0, 'hit_ratio': None})
+
+        self.assertEqual(stats.misses, 1)
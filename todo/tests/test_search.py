@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for todo list search
+"""
+from typing import List
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse_lazy
+
+from jobs.models import Job
+from todo import models
+from todo.jobs import refresh_stale_search_documents
+from todo.models import TodoItemModel, TodoListModel, TodoListSearchDocument
+from todo.search import full_text_search_lists, search_lists_by_name, snippet_html
+
+
+class SearchListsByNameTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for name in ('weekend chores', 'chores', 'Chores for the garage', 'groceries'):
+            TodoListModel.objects.create(name=name)
+
+    def test_filters_by_substring(self) -> None:
+        names = {todo_list.name for todo_list in search_lists_by_name(TodoListModel.objects.all(), 'CHORE')}
+
+        self.assertEqual(names, {'weekend chores', 'chores', 'Chores for the garage'})
+
+    def test_best_matches_first(self) -> None:
+        results = search_lists_by_name(TodoListModel.objects.all(), 'chores')
+
+        self.assertEqual(results[0].name, 'chores')
+
+    @skipUnless(settings.VIEW_TYPES == 'CBV', 'only routed for class-based views')
+    def test_list_and_filter_view_uses_ranked_search(self) -> None:
+        response = self.client.get(reverse_lazy('todo:list_and_filter_todo_lists'), data={'name': 'chores'})
+
+        self.assertEqual([todo_list.name for todo_list in response.context['object_list']][0], 'chores')
+
+
+class FullTextSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.garden = TodoListModel.objects.create(name='garden')
+        TodoItemModel.objects.create(todo_list=cls.garden, text='plant tomatoes', completed=False)
+        TodoItemModel.objects.create(todo_list=cls.garden, text='water the lawn', completed=False)
+
+        cls.tomatoes = TodoListModel.objects.create(name='tomatoes')
+        TodoItemModel.objects.create(todo_list=cls.tomatoes, text='buy stakes', completed=False)
+
+        TodoListModel.objects.create(name='taxes')
+
+        refresh_stale_search_documents()
+
+    def search(self, query: str) -> List[str]:
+        refresh_stale_search_documents()
+
+        return [todo_list.name for todo_list in full_text_search_lists(TodoListModel.objects.all(), query)]
+
+    def test_matches_item_text(self) -> None:
+        self.assertEqual(self.search('lawn'), ['garden'])
+
+    def test_name_matches_rank_first(self) -> None:
+        self.assertEqual(self.search('tomatoes'), ['tomatoes', 'garden'])
+
+    def test_document_follows_item_changes(self) -> None:
+        item = TodoItemModel.objects.create(todo_list=self.garden, text='prune roses', completed=False)
+        self.assertEqual(self.search('roses'), ['garden'])
+
+        item = TodoItemModel.objects.get(pk=item.pk)
+        item.text = 'prune hedges'
+        item.save()
+        self.assertEqual(self.search('roses'), [])
+        self.assertEqual(self.search('hedges'), ['garden'])
+
+        item.delete()
+        self.assertEqual(self.search('hedges'), [])
+
+    def test_document_follows_rename(self) -> None:
+        self.garden.name = 'backyard'
+        self.garden.save()
+
+        self.assertEqual(self.search('backyard'), ['backyard'])
+
+    def test_document_follows_bulk_operations(self) -> None:
+        self.client.post(reverse_lazy('todo:items:todoitemmodel-bulk'), content_type='application/json', data={
+            'operations': [{'op': 'create', 'data': {'todo_list': self.garden.pk, 'text': 'rake leaves',
+                                                     'completed': False}}],
+        })
+
+        self.assertEqual(self.search('leaves'), ['garden'])
+
+    def test_snippet_is_highlighted_and_escaped(self) -> None:
+        TodoItemModel.objects.create(todo_list=self.garden, text='weed & feed <beds>', completed=False)
+        refresh_stale_search_documents()
+
+        todo_list = full_text_search_lists(TodoListModel.objects.all(), 'weed').get()
+        snippet = snippet_html(todo_list.headline, 'weed')
+
+        self.assertIn('<mark>weed</mark>', snippet)
+        self.assertNotIn('<beds>', snippet)
+        self.assertIn('&amp;', snippet)
+
+    @skipUnless(settings.VIEW_TYPES == 'CBV', 'only routed for class-based views')
+    def test_list_and_filter_view_searches_items(self) -> None:
+        response = self.client.get(reverse_lazy('todo:list_and_filter_todo_lists'),
+                                   data={'name': 'lawn', 'search_items': 'on'})
+
+        self.assertEqual([todo_list.name for todo_list in response.context['object_list']], ['garden'])
+        self.assertContains(response, '<mark>lawn</mark>')
+
+    def test_api(self) -> None:
+        response = self.client.get(reverse_lazy('todo:search_lists_api'), data={'q': 'tomatoes'})
+
+        results = response.json()['results']
+        self.assertEqual([result['name'] for result in results], ['tomatoes', 'garden'])
+        self.assertEqual(results[1]['url'], self.garden.get_absolute_url())
+        self.assertIn('<mark>', results[1]['snippet'])
+
+    def test_api_requires_query(self) -> None:
+        response = self.client.get(reverse_lazy('todo:search_lists_api'))
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchRefreshTest(TestCase):
+
+    def test_edits_mark_documents_stale_until_refreshed(self) -> None:
+        garden = TodoListModel.objects.create(name='garden')
+        TodoItemModel.objects.create(todo_list=garden, text='plant tomatoes', completed=False)
+
+        garden.refresh_from_db()
+        self.assertTrue(garden.search_stale)
+        self.assertFalse(TodoListSearchDocument.objects.exists())
+
+        self.assertEqual(refresh_stale_search_documents(), 1)
+
+        garden.refresh_from_db()
+        self.assertFalse(garden.search_stale)
+        self.assertEqual(TodoListSearchDocument.objects.get(todo_list=garden).document, 'garden\nplant tomatoes')
+        self.assertEqual(refresh_stale_search_documents(), 0)
+
+    def test_refresh_is_queued_once_per_delay(self) -> None:
+        with mock.patch.object(models, '_search_refresh_queued_at', None):
+            models._queue_search_refresh()
+            models._queue_search_refresh()
+
+            self.assertEqual(Job.objects.filter(name='todo.refresh_search_documents').count(), 1)
+
+            with override_settings(SEARCH_REFRESH_DELAY=0):
+                models._queue_search_refresh()
+
+        self.assertEqual(Job.objects.filter(name='todo.refresh_search_documents').count(), 2)
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for todo views
+"""
+import json
+import tracemalloc
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from todo.models import TodoItemModel, TodoListModel
+from todo.serializers import TodoItemSerializer
+from todo.views import ListTodoListsView, TodoItemViewSet
+
+
+@skipUnless(settings.VIEW_TYPES == 'CBV', 'only routed for class-based views')
+class ListAndFilterTodoListsViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        TodoListModel.objects.bulk_create([TodoListModel(name=f'list {number:03}') for number in range(120)])
+        cls.url = reverse_lazy('todo:list_and_filter_todo_lists')
+
+    def test_first_visit_defers_lists(self) -> None:
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertTrue(response.context['queryset_deferred'])
+        self.assertContains(response, 'data-deferred-list="#id-todo-lists"')
+        self.assertNotContains(response, 'list 000')
+
+    def test_load_pages_without_counting(self) -> None:
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{self.url}?load=1')
+
+        self.assertEqual([todo_list.name for todo_list in response.context['object_list']],
+                         [f'list {number:03}' for number in range(50)])
+        self.assertContains(response, '?load=1&amp;page=2')
+
+        response = self.client.get(f'{self.url}?load=1&page=3')
+
+        self.assertEqual(len(response.context['object_list']), 20)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_page_links_keep_search(self) -> None:
+        response = self.client.get(f'{self.url}?name=list+0&page=2')
+
+        self.assertFalse(response.context['queryset_deferred'])
+        self.assertEqual(response.context['form'].cleaned_data['name'], 'list 0')
+        self.assertEqual(len(response.context['object_list']), 50)
+        self.assertContains(response, '?name=list+0&amp;page=1')
+
+    def test_page_past_the_end(self) -> None:
+        response = self.client.get(f'{self.url}?load=1&page=4')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ListTodoListsViewTest(TestCase):
+    url = reverse_lazy('todo:list_todo_lists')
+
+    @staticmethod
+    def create_lists(start: int, stop: int) -> None:
+        TodoListModel.objects.bulk_create([TodoListModel(name=f'list {number:05}') for number in range(start, stop)])
+
+    def stream_peak_memory(self) -> int:
+        tracemalloc.start()
+
+        try:
+            response = self.client.get(self.url)
+
+            for _chunk in response.streaming_content:
+                pass
+
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_streams_rows(self) -> None:
+        self.create_lists(0, 3)
+
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertLess(content.index('<tbody>'), content.index('list 00000'))
+        self.assertLess(content.index('list 00002'), content.index('</tbody>'))
+        self.assertTrue(content.rstrip().endswith('</html>'))
+
+    def test_no_lists(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.streaming)
+        self.assertContains(response, 'No todo lists were found.')
+
+    # cached rows would stay in memory on purpose
+    @override_settings(TODO_ROW_CACHE=None)
+    @patch('todo.views.STREAM_CHUNK_SIZE', 100)
+    @patch.object(ListTodoListsView, 'stream_chunk_size', 100)
+    def test_peak_memory_does_not_grow_with_rows(self) -> None:
+        self.create_lists(0, 300)
+        # first one loads templates and such
+        self.stream_peak_memory()
+        small_peak = self.stream_peak_memory()
+
+        self.create_lists(300, 3000)
+        large_peak = self.stream_peak_memory()
+
+        # 10x the rows, but only ever one chunk of them in memory
+        self.assertLess(large_peak, small_peak * 2)
+
+
+class DisplayTodoListViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='groceries')
+        TodoItemModel.objects.bulk_create(
+            [TodoItemModel(todo_list=cls.todo_list, text=f'item {number}', completed=False) for number in range(25)]
+        )
+        cls.url = reverse_lazy('todo:display_todo_list', kwargs={'pk': cls.todo_list.pk})
+
+    def test_embeds_first_page_of_items(self) -> None:
+        response = self.client.get(self.url)
+
+        embedded = response.context['initial_items']
+        api_page = self.client.get(f"{reverse_lazy('todo:items:todoitemmodel-list')}?todo_list={self.todo_list.pk}"
+                                   f"&cursor=").json()
+
+        self.assertEqual(embedded, api_page)
+        self.assertEqual(len(embedded['results']), 20)
+        self.assertContains(response, '<script id="id-initial-items" type="application/json">')
+
+    def test_next_page_link_continues_from_embedded_page(self) -> None:
+        embedded = self.client.get(self.url).context['initial_items']
+
+        next_page = self.client.get(embedded['next']).json()
+
+        self.assertEqual([item['text'] for item in next_page['results']],
+                         [f'item {number}' for number in range(20, 25)])
+        self.assertIsNone(next_page['next'])
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='timed')
+        TodoItemModel.objects.bulk_create([
+            TodoItemModel(todo_list=cls.todo_list, text=f'item {number}', completed=False) for number in range(3)
+        ])
+
+    def test_items_api_records_serializing(self) -> None:
+        with self.assertLogs('common.middleware', 'INFO') as logs:
+            response = self.client.get(reverse_lazy('todo:items:todoitemmodel-list'),
+                                       {'todo_list': self.todo_list.pk})
+
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertEqual(record['serialize_count'], 3)
+        self.assertEqual(record['sql_count'], 3)
+
+
+class TodoItemRowsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        lists = [TodoListModel.objects.create(name=name) for name in ('first', 'second')]
+        texts = ['plain', 'quote " and \\ backslash', 'new\nline\ttab', 'unicode ünïcödé ✓ 😀', '<b>&amp;</b>']
+        cls.items = TodoItemModel.objects.bulk_create([
+            TodoItemModel(todo_list=lists[number % 2], text=f'{texts[number % len(texts)]} {number}',
+                          completed=number % 3 == 0)
+            for number in range(45)
+        ])
+        cls.todo_list = lists[0]
+
+    def get_both(self, url: str, params: dict = None) -> tuple:
+        with patch.object(TodoItemSerializer, 'to_representation', side_effect=AssertionError('serializer used')):
+            rows = self.client.get(url, params)
+
+        with patch.object(TodoItemViewSet, 'read_rows', False):
+            serialized = self.client.get(url, params)
+
+        return rows, serialized
+
+    def test_rows_match_serializer_output(self) -> None:
+        list_url = reverse_lazy('todo:items:todoitemmodel-list')
+        item = TodoItemModel.objects.order_by('id').last()
+        cursor = self.client.get(list_url, {'cursor': ''}).json()['next'].split('cursor=')[1]
+
+        for url, params in ((list_url, {}), (list_url, {'page': 2}), (list_url, {'todo_list': self.todo_list.pk}),
+                            (list_url, {'cursor': ''}), (list_url, {'cursor': cursor}),
+                            (list_url, {'fields': 'completed,pk', 'cursor': cursor}),
+                            (list_url, {'fields': 'text', 'completed': 'true', 'ordering': '-text', 'page': 2}),
+                            (reverse_lazy('todo:items:todoitemmodel-detail', args=[item.pk]), {}),
+                            (reverse_lazy('todo:items:todoitemmodel-detail', args=[item.pk]), {'fields': 'pk'}),
+                            (reverse_lazy('todo:items:todoitemmodel-detail', args=[0]), {}),
+                            (reverse_lazy('todo:items:todoitemmodel-detail', args=['x']), {})):
+            with self.subTest(url=url, params=params):
+                rows, serialized = self.get_both(url, params)
+
+                self.assertEqual(rows.status_code, serialized.status_code)
+                self.assertEqual(rows.content, serialized.content)
+
+    def test_browsable_api_uses_serializer(self) -> None:
+        with patch.object(TodoItemViewSet, 'get_rows') as get_rows:
+            response = self.client.get(reverse_lazy('todo:items:todoitemmodel-list'), HTTP_ACCEPT='text/html')
+
+        self.assertContains(response, 'unicode ünïcödé')
+        get_rows.assert_not_called()
+
+
+class TodoItemQueryParamsTest(TestCase):
+    url = reverse_lazy('todo:items:todoitemmodel-list')
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='params')
+        TodoItemModel.objects.bulk_create([
+            TodoItemModel(todo_list=cls.todo_list, text=text, completed=completed)
+            for text, completed in (('b', True), ('a', False), ('c', True), ('a2', True))
+        ])
+        TodoListModel.objects.filter(pk=cls.todo_list.pk).recount()
+        cls.items = list(TodoItemModel.objects.order_by('id'))
+
+    def get(self, **params) -> dict:
+        response = self.client.get(self.url, {'todo_list': self.todo_list.pk, **params})
+
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return response.json()['results']
+
+    def test_fields_restrict_output_and_columns(self) -> None:
+        for read_rows in (True, False):
+            with self.subTest(read_rows=read_rows), patch.object(TodoItemViewSet, 'read_rows', read_rows), \
+                    CaptureQueriesContext(connection) as queries:
+                results = self.get(fields='completed, pk', cursor='')
+
+            self.assertEqual(results[0], {'pk': self.items[0].pk, 'completed': True})
+            self.assertNotIn('"text"', queries.captured_queries[-1]['sql'])
+
+    def test_fields_dont_restrict_writes(self) -> None:
+        response = self.client.patch(f"{reverse_lazy('todo:items:todoitemmodel-detail', args=[self.items[0].pk])}"
+                                     '?fields=pk', {'completed': False}, content_type='application/json')
+
+        self.assertEqual(response.json()['text'], 'b')
+
+    def test_completed_filter(self) -> None:
+        self.assertEqual([item['text'] for item in self.get(completed='false')], ['a'])
+        self.assertEqual(len(self.get(completed='1')), 3)
+
+    def test_ordering(self) -> None:
+        self.assertEqual([item['text'] for item in self.get(ordering='-completed,text')], ['a2', 'b', 'c', 'a'])
+        self.assertEqual([item['text'] for item in self.get(ordering='-id')], ['a2', 'c', 'a', 'b'])
+
+    def test_invalid_params(self) -> None:
+        for params in ({'fields': 'pk,secret'}, {'fields': ','}, {'completed': 'maybe'},
+                       {'ordering': 'todo_list__name'}, {'ordering': 'text', 'cursor': ''}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), [next(iter(params))])
+
+
+class TodoItemUpdateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.todo_list = TodoListModel.objects.create(name='updates')
+        cls.item = TodoItemModel.objects.create(todo_list=cls.todo_list, text='milk', completed=False)
+        TodoItemModel.objects.create(todo_list=cls.todo_list, text='eggs', completed=False)
+
+    def patch(self, data: dict) -> tuple:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse_lazy('todo:items:todoitemmodel-detail', args=[self.item.pk]), data,
+                                         content_type='application/json')
+
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_writes_only_changed_columns(self) -> None:
+        response, queries = self.patch({'completed': True, 'text': 'milk'})
+
+        self.assertEqual(response.json()['completed'], True)
+        # load the item, update it, touch its list
+        self.assertEqual(len(queries), 3, queries)
+        self.assertNotIn('"text"', queries[1])
+
+        self.todo_list.refresh_from_db()
+        self.assertEqual(self.todo_list.completed_count, 1)
+
+    def test_unchanged_values_write_nothing(self) -> None:
+        response, queries = self.patch({'completed': False})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1, queries)
+
+    def test_text_changes_are_checked_for_uniqueness(self) -> None:
+        response, queries = self.patch({'text': 'eggs'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs the replica database from gcbv_demo.test_settings')
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReadReplicaTest(TestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        # the replica hasn't caught up with the rename, or the item, yet
+        cls.todo_list = TodoListModel.objects.create(name='renamed')
+        TodoListModel.objects.using('replica').create(pk=cls.todo_list.pk, name='lagging')
+        cls.item = TodoItemModel.objects.create(todo_list=cls.todo_list, text='on the primary', completed=False)
+
+    def test_pages_read_from_replica(self) -> None:
+        response = self.client.get(reverse_lazy('todo:display_todo_list', args=[self.todo_list.pk]))
+
+        self.assertContains(response, 'lagging')
+        self.assertNotContains(response, 'on the primary')
+        self.assertNotContains(self.client.get(reverse_lazy('todo:list_todo_lists')), 'renamed')
+
+    def test_api_reads_from_replica(self) -> None:
+        response = self.client.get(reverse_lazy('todo:items:todoitemmodel-list'), {'todo_list': self.todo_list.pk})
+
+        self.assertEqual(response.json()['results'], [])
+
+    def test_writers_read_their_writes(self) -> None:
+        response = self.client.post(reverse_lazy('todo:create_todo_list'), {'name': 'new'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(TodoListModel.objects.filter(name='new').exists())
+        self.assertContains(self.client.get(reverse_lazy('todo:list_todo_lists')), 'new')
+
+    def test_api_writers_read_their_writes(self) -> None:
+        url = reverse_lazy('todo:items:todoitemmodel-detail', args=[self.item.pk])
+
+        response = self.client.patch(url, {'completed': True}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.client.get(url).json()['completed'])
@@ -8,9 +8,10 @@ from django.views.generic import RedirectView, TemplateView
 from rest_framework import routers
 
 from todo.views import CreateTodoListView, DeleteTodoListView, DisplayTodoListView, ListAndFilterTodoListsView, \
-    ListTodoListsView, SearchListsView, TodoItemViewSet, UpdateTodoListView, create_todo_list_view, \
-    delete_todo_list_view, display_todo_list_view, home_view, list_todo_lists_view, redirect_to_list_todo_lists_view, \
-    search_lists_view, update_todo_list_view
+    ListTodoListsView, SearchListsView, TodoItemViewSet, TodoListImportStatusView, TodoListImportView, \
+    TodoListSearchView, UpdateTodoListView, create_todo_list_view, delete_todo_list_view, display_todo_list_view, \
+    home_view, list_todo_lists_view, export_todo_lists_view, redirect_to_list_todo_lists_view, search_lists_view, \
+    update_todo_list_view
 
 app_name = 'todo'
 
@@ -49,4 +50,8 @@ router.register(r'items', TodoItemViewSet)
 
 urlpatterns.extend([
     path('api/', include((router.urls, 'items'), namespace='items')),
+    path('api/search/', TodoListSearchView.as_view(), name='search_lists_api'),
+    path('api/imports/', TodoListImportView.as_view(), name='import_todo_lists'),
+    path('api/imports/<int:pk>/', TodoListImportStatusView.as_view(), name='todo_list_import'),
+    path('export/', export_todo_lists_view, name='export_todo_lists'),
 ])
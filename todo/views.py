@@ -2,22 +2,49 @@
 """
 Views for todo app
 """
+import os
 from copy import deepcopy
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
+from uuid import uuid4
 
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import IntegrityError
 from django.db.models import QuerySet
-from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect
-from django.shortcuts import redirect, render
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, \
+    HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.decorators import classonlymethod, method_decorator
 from django.utils.translation import ugettext_lazy as _
+from django.views.decorators.http import require_GET
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
-from rest_framework import viewsets
-
+from rest_framework import generics, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.db.routers import get_read_db
+from common.mixins import ReadReplicaMixin
+from common.pagination import HasNextPaginator
+from common.streaming import STREAM_CHUNK_SIZE, StreamingListMixin, render_streaming
 from common.views import FormListView, GetFormView
+from jobs.models import Job
+from jobs.queue import enqueue
+from todo.bulk import BulkTodoItemOperations
+from todo.conditional import todo_items_condition, todo_list_condition
+from todo.export import EXPORT_FORMATS, export_todo_lists
 from todo.forms import SearchListsForm, TodoItemForm, TodoListForm
+from todo.importer import IMPORT_FORMATS, get_import_format, read_progress
 from todo.models import TodoItemModel, TodoListModel
-from todo.serializers import TodoItemSerializer
+from todo.pagination import TodoItemPagination
+from todo.search import full_text_search_lists, search_lists
+from todo.serializers import TODO_ITEM_ROW_COLUMNS, TodoItemSerializer, TodoListSearchResultSerializer, \
+    serialize_todo_item_rows
 
 
 def home_view(request: HttpRequest) -> HttpResponse:
@@ -73,12 +100,14 @@ def search_lists_view(request: HttpRequest) -> Union[HttpResponse, HttpResponseR
     return render(request, 'todo/search_lists.html', context)
 
 
-class ListTodoListsView(ListView):
+class ListTodoListsView(ReadReplicaMixin, StreamingListMixin, ListView):
     """
-    View to list TodoLists
+    View to list TodoLists. Rows are streamed, so listing every list doesn't need the whole page in memory.
     """
     model = TodoListModel
     template_name = 'todo/list_todo_lists.html'
+    stream_row_template_name = 'todo/list_table_row.html'
+    stream_row_name = 'todo_list'
 
     def get_queryset(self) -> Union[QuerySet, List[TodoListModel]]:
         """
@@ -88,25 +117,28 @@ class ListTodoListsView(ListView):
         queryset = super().get_queryset()
 
         if 'name' in self.request.GET:
-            queryset = queryset.filter(name__icontains=self.request.GET['name'])
+            queryset = search_lists(queryset, self.request.GET['name'], 'search_items' in self.request.GET)
 
         return queryset
 
 
 def list_todo_lists_view(request: HttpRequest) -> HttpResponse:
     """
-    View to list TodoLists
+    View to list TodoLists, streaming the rows
     :param request: wsgi request
     :return: template with todo lists
     """
-    queryset = TodoListModel.objects.all()
+    queryset = TodoListModel.objects.using(get_read_db(request))
     if 'name' in request.GET:
-        queryset = queryset.filter(name__icontains=request.GET['name'])
+        queryset = search_lists(queryset, request.GET['name'], 'search_items' in request.GET)
 
     context = {
         'object_list': queryset
     }
-    return render(request, 'todo/list_todo_lists.html', context)
+    rows = queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+    return render_streaming(request, 'todo/list_todo_lists.html', context, rows, 'todo/list_table_row.html',
+                            'todo_list', chunk_size=STREAM_CHUNK_SIZE)
 
 
 def redirect_to_list_todo_lists_view(request: HttpRequest) -> HttpResponseRedirect:
@@ -118,13 +150,19 @@ def redirect_to_list_todo_lists_view(request: HttpRequest) -> HttpResponseRedire
     return redirect(to='todo:list_todo_lists')
 
 
-class ListAndFilterTodoListsView(FormListView):
+class ListAndFilterTodoListsView(ReadReplicaMixin, FormListView):
     """
-    List and possibly filter todo lists
+    List and possibly filter todo lists. Lists are paged without counting them, and the unfiltered listing only gets
+    loaded once the user scrolls to it or asks for it.
     """
     form_class = SearchListsForm
     model = TodoListModel
     template_name = 'todo/list_and_filter_todo_lists.html'
+    retrieve_queryset_first_time = False
+    # name is unique, so its index gives a stable order that's cheap to page through
+    ordering = ('name',)
+    paginate_by = 50
+    paginator_class = HasNextPaginator
 
     def filter_queryset(self) -> QuerySet:
         """
@@ -135,7 +173,7 @@ class ListAndFilterTodoListsView(FormListView):
 
         list_name = self.form.cleaned_data.get('name')
 
-        return queryset.filter(name__icontains=list_name)
+        return search_lists(queryset, list_name, self.form.cleaned_data.get('search_items'))
 
 
 class CreateTodoListView(CreateView):
@@ -167,7 +205,31 @@ def create_todo_list_view(request: HttpRequest) -> Union[HttpResponse, HttpRespo
             return render(request, 'todo/create_todo_list.html', {'form': form})
 
 
-class DisplayTodoListView(DetailView):
+def get_initial_items(request: HttpRequest, todo_list_pk: int) -> Dict[str, Any]:
+    """
+    Build the first page of a list's items, exactly as the items api would return it in cursor mode, so pages can
+    embed it rather than making the browser ask for it. Only for pages that only read, since the items are read from a
+    replica (see common.db.routers).
+    :param request: wsgi request
+    :param todo_list_pk: pk of todo list
+    :return: first cursor page of items, with a link to the next one
+    """
+    paginator = TodoItemPagination()
+    base_url = request.build_absolute_uri(
+        f"{reverse('todo:items:todoitemmodel-list')}?todo_list={todo_list_pk}&{paginator.cursor_query_param}="
+    )
+
+    queryset = TodoItemModel.objects.using(get_read_db(request)).filter(todo_list_id=todo_list_pk)
+    items = paginator.paginate_keyset(queryset, '', base_url)
+
+    return {
+        'next': paginator.get_next_link(),
+        'previous': None,
+        'results': TodoItemSerializer(items, many=True).data,
+    }
+
+
+class DisplayTodoListView(ReadReplicaMixin, DetailView):
     """
     View to show detailed view of todo list
     """
@@ -175,21 +237,34 @@ class DisplayTodoListView(DetailView):
     model = TodoListModel
     context_object_name = 'todo_list'
 
+    @classonlymethod
+    def as_view(cls, **initkwargs) -> Callable[[HttpRequest, Any, Any], HttpResponse]:
+        """
+        Wrap function that as_view produces so conditional GETs for unchanged lists get a 304 before anything renders.
+        :param initkwargs: kwargs to pass to view __init__
+        :return: function to represent view, wrapped by decorator
+        """
+        view = super().as_view(**initkwargs)
+
+        return todo_list_condition(view)
+
     def get_context_data(self, **kwargs) -> Dict[str, Any]:
         """
-        Add new item form to context
+        Add new item form and the first page of items to context
         :param kwargs: kwargs for template context
-        :return: kwargs for template context with form added
+        :return: kwargs for template context with form and items added
         """
         initial = {
             'todo_list': self.kwargs.get('pk')
         }
 
         kwargs['form'] = TodoItemForm(initial=initial)
+        kwargs['initial_items'] = get_initial_items(self.request, self.object.pk)
 
         return super().get_context_data(**kwargs)
 
 
+@todo_list_condition
 def display_todo_list_view(request: HttpRequest, pk: int) -> HttpResponse:
     """
     view to show detailed view of todo list
@@ -197,9 +272,14 @@ def display_todo_list_view(request: HttpRequest, pk: int) -> HttpResponse:
     :param pk: pk of todo list
     :return: template with list details
     """
-    todo_list = TodoListModel.objects.get(id=pk)
+    todo_list = TodoListModel.objects.using(get_read_db(request)).get(id=pk)
+
+    context = {
+        'todo_list': todo_list,
+        'initial_items': get_initial_items(request, todo_list.pk),
+    }
 
-    return render(request, 'todo/display_todo_list.html', {'todo_list': todo_list})
+    return render(request, 'todo/display_todo_list.html', context)
 
 
 class UpdateTodoListView(UpdateView):
@@ -243,7 +323,7 @@ def update_todo_list_view(request: HttpRequest, pk: int) -> Union[HttpResponse,
 
 class DeleteTodoListView(DeleteView):
     """
-    View to delete a todo list
+    View to delete a todo list. The list is hidden right away, and deleted by a background job.
     """
     template_name = 'todo/delete_todo_list.html'
     model = TodoListModel
@@ -252,15 +332,15 @@ class DeleteTodoListView(DeleteView):
 
     def delete(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
-        Call the delete() method on the fetched object and then redirect to the
-        success URL. Overriding to add a message.
+        Mark the fetched object for deletion and then redirect to the success URL. Overriding to add a message, and
+        to leave deleting the list and its items to a background job.
         :param request: wsgi request
         """
         self.object = self.get_object()
         success_url = self.get_success_url()
         success_message = _(f'Successfully deleted todo list: {self.object}')
 
-        self.object.delete()
+        self.object.mark_for_deletion()
 
         messages.success(request=request, message=success_message)
 
@@ -269,7 +349,7 @@ class DeleteTodoListView(DeleteView):
 
 def delete_todo_list_view(request: HttpRequest, pk: int) -> HttpResponseRedirect:
     """
-    delete a todo list
+    delete a todo list, leaving deleting it and its items to a background job
     :param request: wsgi request
     :param pk: pk of todo list
     :return: redirect to full listing page
@@ -281,30 +361,307 @@ def delete_todo_list_view(request: HttpRequest, pk: int) -> HttpResponseRedirect
     elif request.method == 'POST':
         success_message = _(f'Successfully deleted todo list: {todo_list}')
 
-        todo_list.delete()
+        todo_list.mark_for_deletion()
 
         messages.success(request=request, message=success_message)
 
         return redirect(reverse_lazy('todo:list_and_filter_todo_lists'))
 
 
-class TodoItemViewSet(viewsets.ModelViewSet):
+class TodoItemViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     """
-    API endpoint that allows todo items to be viewed or edited
+    API endpoint that allows todo items to be viewed or edited. Items are listed and retrieved from a replica.
     """
     queryset = TodoItemModel.objects.all()
     serializer_class = TodoItemSerializer
+    pagination_class = TodoItemPagination
+    # list and retrieve JSON straight from values_list rows, see serialize_todo_item_rows
+    read_rows = True
+    # fields the ordering query param can sort by, ties are broken by id
+    ordering_fields = ('id', 'text', 'completed')
 
     def get_queryset(self) -> QuerySet:
         """
-        Enable filtering of todo items queryset by todo_list query param.
-        :return: filtered queryset, if todo_list is in query params
+        Enable filtering of todo items queryset by todo_list and completed query params, and sorting by the ordering
+        query param (comma separated fields from ordering_fields, each optionally prefixed with - to reverse it).
+        Reads with the fields query param only load the columns they need.
+        :return: filtered queryset
         """
-        queryset = super().get_queryset()
+        # items of lists pending deletion are on their way out with their list
+        queryset = super().get_queryset().filter(todo_list__pending_deletion=False)
+        query_params = self.request.query_params
 
-        todo_list = self.request.query_params.get('todo_list', None)
+        todo_list = query_params.get('todo_list', None)
 
         if todo_list is not None:
             queryset = queryset.filter(todo_list=todo_list)
 
+        completed = query_params.get('completed', None)
+
+        if completed is not None:
+            try:
+                queryset = queryset.filter(completed=serializers.BooleanField().to_internal_value(completed))
+            except ValidationError as error:
+                raise ValidationError({'completed': error.detail})
+
+        ordering = query_params.get('ordering', None)
+
+        if ordering is not None:
+            queryset = queryset.order_by(*self.get_ordering(ordering))
+
+        if self.get_fields() is not None:
+            queryset = queryset.only(*self.get_columns())
+
         return queryset
+
+    def get_ordering(self, ordering: str) -> List[str]:
+        """
+        Parse the ordering query param
+        :param ordering: query param value
+        :return: order_by args
+        """
+        if self.paginator is not None and self.paginator.cursor_query_param in self.request.query_params:
+            raise ValidationError({'ordering': [_('Cursor pages are always in list and item order.')]})
+
+        terms = [term.strip() for term in ordering.split(',') if term.strip()]
+        unknown = [term for term in terms if term.lstrip('-') not in self.ordering_fields]
+
+        if unknown:
+            raise ValidationError({'ordering': [
+                _(f"Unknown ordering {', '.join(unknown)}, use any of: {', '.join(self.ordering_fields)}")
+            ]})
+
+        if not any(term.lstrip('-') == 'id' for term in terms):
+            terms.append('id')
+
+        return terms
+
+    def get_fields(self) -> Optional[List[str]]:
+        """
+        Parse the fields query param, a comma separated sparse fieldset. Only reads are projected, writes always get
+        the whole item back.
+        :return: serializer fields to send, in the serializer's order, or None for all of them
+        """
+        fields = self.request.query_params.get('fields', None)
+
+        if fields is None or self.action not in ('list', 'retrieve'):
+            return None
+
+        fields = {field.strip() for field in fields.split(',') if field.strip()}
+        unknown = fields - set(TODO_ITEM_ROW_COLUMNS)
+
+        if unknown or not fields:
+            raise ValidationError({'fields': [
+                _(f"Unknown fields {', '.join(sorted(unknown))}, use any of: {', '.join(TODO_ITEM_ROW_COLUMNS)}")
+            ]})
+
+        return [field for field in TODO_ITEM_ROW_COLUMNS if field in fields]
+
+    def get_columns(self) -> List[str]:
+        """
+        Columns to read for the requested fields. Keyset columns get read too, after the rest, for cursor pages.
+        :return: column names
+        """
+        fields = self.get_fields()
+
+        if fields is None:
+            return list(TODO_ITEM_ROW_COLUMNS.values())
+
+        columns = [TODO_ITEM_ROW_COLUMNS[field] for field in fields]
+
+        return columns + [column for column in TodoItemPagination.keyset_fields if column not in columns]
+
+    def get_serializer(self, *args, **kwargs) -> TodoItemSerializer:
+        kwargs.setdefault('fields', self.get_fields())
+
+        return super().get_serializer(*args, **kwargs)
+
+    @method_decorator(todo_items_condition)
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """
+        List items. When they're filtered by todo_list, conditional GETs get a 304 if the list hasn't changed, without
+        running the query or the serializer.
+        :param request: drf request
+        :return: page of items
+        """
+        if not self.reads_rows():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            return self.get_paginated_response(serialize_todo_item_rows(page, self.get_fields()))
+
+        return Response(serialize_todo_item_rows(queryset, self.get_fields()))
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Retrieve an item. The api has no object permissions, so there's nothing to check on the row.
+        :param request: drf request
+        :return: item
+        """
+        if not self.reads_rows():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = generics.get_object_or_404(self.get_rows(self.filter_queryset(self.get_queryset())),
+                                         **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        return Response(serialize_todo_item_rows([row], self.get_fields())[0])
+
+    def reads_rows(self) -> bool:
+        """
+        Whether to skip building model instances and serializers for a read. The browsable api renders its forms from
+        the serializer, so that still gets the full path.
+        :return: whether to read rows
+        """
+        return self.read_rows and self.request.accepted_renderer.format == 'json'
+
+    def get_rows(self, queryset: QuerySet) -> QuerySet:
+        """
+        Read items as rows. They're named, so keyset pagination can get at their keyset fields.
+        :param queryset: items
+        :return: rows of get_columns
+        """
+        return queryset.values_list(*self.get_columns(), named=True)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request: Request) -> Response:
+        """
+        Create, update and delete many items in one request. Takes {"operations": [...]}, see BulkTodoItemOperations
+        for the format of each operation. Either the whole batch gets applied or none of it does.
+        :param request: drf request
+        :return: result of each operation, in the order they were sent
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        bulk = BulkTodoItemOperations(operations, context=self.get_serializer_context())
+
+        if not bulk.is_valid():
+            return Response({'errors': bulk.errors, 'results': bulk.results}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            bulk.save()
+        except IntegrityError:
+            # Something else changed the same rows while the batch was being applied.
+            errors = {'operations': [_('The batch conflicted with another change, please try again.')]}
+
+            return Response({'errors': errors, 'results': None}, status=status.HTTP_409_CONFLICT)
+
+        return Response({'errors': None, 'results': bulk.results})
+
+
+class TodoListSearchView(generics.ListAPIView):
+    """
+    API endpoint for full-text search across list names and item text. Takes the query in q, and returns matching
+    lists best match first, each with a highlighted snippet.
+    """
+    queryset = TodoListModel.objects.all()
+    serializer_class = TodoListSearchResultSerializer
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Search lists for the query
+        :return: matching lists, best match first
+        """
+        query = self.request.query_params.get('q', '').strip()
+
+        if not query:
+            raise ValidationError({'q': [_('A search query is required.')]})
+
+        return full_text_search_lists(super().get_queryset(), query)
+
+    def get_serializer_context(self) -> Dict[str, Any]:
+        """
+        Pass the query along, for building snippets.
+        :return: serializer context
+        """
+        context = super().get_serializer_context()
+        context['query'] = self.request.query_params.get('q', '')
+
+        return context
+
+
+@staff_member_required
+@require_GET
+def export_todo_lists_view(request: HttpRequest) -> HttpResponse:
+    """
+    Download every list and its items, streamed as they're read. Takes format (jsonl, the default, or csv), and
+    compress=gzip to gzip the export on the fly. See todo.export.
+    :param request: wsgi request
+    :return: export, as an attachment
+    """
+    export_format = request.GET.get('format', 'jsonl')
+
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(_(f"Unknown format, use one of: {', '.join(EXPORT_FORMATS)}"))
+
+    compress = request.GET.get('compress') == 'gzip'
+    content_type = 'application/gzip' if compress else f'{EXPORT_FORMATS[export_format]}; charset=utf-8'
+    filename = f"todo-lists.{export_format}{'.gz' if compress else ''}"
+
+    response = StreamingHttpResponse(export_todo_lists(export_format, compress, using=get_read_db(request)),
+                                     content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+class TodoListImportView(APIView):
+    """
+    API endpoint to import lists and items from a file, in the background. Takes a multipart upload, with the file in
+    file, and optionally its format (jsonl or csv, otherwise told from the file name). Files ending in .gz get
+    gunzipped. Answers with the job importing it, see TodoListImportStatusView and todo.importer.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request: Request) -> Response:
+        """
+        Save the upload and queue its import
+        :param request: drf request
+        :return: job id, and where to check on it
+        """
+        upload = request.FILES.get('file')
+
+        if upload is None:
+            raise ValidationError({'file': [_('A file to import is required.')]})
+
+        import_format = request.data.get('format') or get_import_format(upload.name)
+
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({'format': [_(f"Unknown format, use one of: {', '.join(IMPORT_FORMATS)}")]})
+
+        os.makedirs(settings.IMPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.IMPORT_DIR,
+                            f"{uuid4().hex}.{import_format}{'.gz' if upload.name.endswith('.gz') else ''}")
+
+        with open(path, 'wb') as import_file:
+            for chunk in upload.chunks():
+                import_file.write(chunk)
+
+        job = enqueue('todo.import_todo_lists', path=path, import_format=import_format)
+        status_url = reverse('todo:todo_list_import', kwargs={'pk': job.pk})
+
+        return Response({'job': job.pk, 'status': job.status, 'url': request.build_absolute_uri(status_url)},
+                        status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+class TodoListImportStatusView(APIView):
+    """
+    API endpoint to check on an import: its job's status, the summary as of its last saved batch, and its first
+    invalid rows.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, pk: int) -> Response:
+        """
+        Report how far an import got
+        :param request: drf request
+        :param pk: pk of the import's job
+        :return: import status
+        """
+        job = get_object_or_404(Job, pk=pk, name='todo.import_todo_lists')
+
+        return Response({'job': job.pk, 'status': job.status, 'last_error': job.last_error,
+                         **read_progress(job.get_kwargs()['path'])})